@@ -0,0 +1,128 @@
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlparse
+from ReportPipeline import ImportAggregator, ReportPipeline
+
+
+def repository_key(repo):
+    # "owner/name", from the API's full_name or else from the clone URL
+    if repo.get('full_name'):
+        return repo['full_name'].lower()
+    parts = urlparse(repo['clone_url']).path.rstrip('/').split('/')
+    name = parts[-1][:-4] if parts[-1].endswith('.git') else parts[-1]
+    return f"{parts[-2] if len(parts) > 1 and parts[-2] else '_'}/{name}".lower()
+
+
+def key_directory(key):
+    # Single path component for snapshots/ (catalog names keep the slash)
+    return key.replace('/', '__')
+
+
+class BatchReport:
+    # Several users in one run over one clone and snapshot cache keyed by
+    # repository ("owner/name"). A repository listed for more than one user is
+    # cloned and snapshotted once. A fork is cloned with --reference-if-able
+    # pointing at an already cloned repository of the same name, so objects it
+    # shares with its parent are copied locally instead of fetched again.
+    # Checkouts with the same tree id (an unchanged fork, a mirror) are
+    # snapshotted once and every copy reuses the result. Each repository's
+    # imports are added to the aggregator of every user who owns it.
+
+    def __init__(self, cloner, snapshot_repo, source_code_dir, exclude_substrings=(), clone_workers=1, snapshot_workers=1, queue_size=None):
+        # snapshot_repo(result) returns (programming_language, {import_name: count}) for a
+        # cloner result whose 'repo' is the repository key
+        self.cloner = cloner
+        self.snapshot_repo = snapshot_repo
+        self.source_code_dir = source_code_dir
+        self.exclude_substrings = exclude_substrings
+        self.clone_workers = clone_workers
+        self.snapshot_workers = snapshot_workers
+        self.queue_size = queue_size
+        self.lock = threading.Lock()
+        self.repositories = {}
+        self.owners = {}
+        self.aggregators = {}
+        self.cloned_by_name = {}
+        self.snapshots_by_tree = {}
+        self.reused_snapshots = 0
+
+    def list_users(self, usernames):
+        listing_client = self.cloner.listing_client
+        with ThreadPoolExecutor(max_workers=max(min(len(usernames), listing_client.max_workers), 1)) as executor:
+            listings = list(executor.map(listing_client.list_repositories, usernames))
+        listing_client.save_cache()
+
+        for username, repos in zip(usernames, listings):
+            self.aggregators[username] = ImportAggregator(self.exclude_substrings)
+            for repo in repos:
+                key = repository_key(repo)
+                self.repositories.setdefault(key, repo)
+                self.owners.setdefault(key, [])
+                if username not in self.owners[key]:
+                    self.owners[key].append(username)
+        listed = sum(len(repos) for repos in listings)
+        print(f"Listed {listed} repositories for {len(usernames)} users, {len(self.repositories)} distinct "
+              f"({listing_client.requests_made} requests, {listing_client.not_modified} not modified)")
+
+    def clone(self, key):
+        repo = self.repositories[key]
+        owner, name = key.split('/', 1)
+        reference = None
+        if repo.get('fork'):
+            with self.lock:
+                reference = self.cloned_by_name.get(name)
+        result = self.cloner.clone_or_update_repo(repo['clone_url'], os.path.join(self.source_code_dir, owner), reference)
+        # The pipeline and the aggregators identify repositories by their key
+        result['repo'] = key
+        if result['status'] != 'failed':
+            # Only finished clones are offered as references
+            with self.lock:
+                self.cloned_by_name.setdefault(name, result['path'])
+        return result
+
+    def snapshot(self, result):
+        tree_id = self.cloner.tree_id(result['path'])
+        if tree_id is None:
+            return self.snapshot_repo(result)
+        with self.lock:
+            future = self.snapshots_by_tree.get(tree_id)
+            first = future is None
+            if first:
+                future = self.snapshots_by_tree[tree_id] = Future()
+        if not first:
+            # Same contents as a repository already snapshotted (or being snapshotted)
+            snapshot = future.result()
+            print(f"Repository {result['repo']} has the same tree as an earlier one, reusing its snapshot")
+            with self.lock:
+                self.reused_snapshots += 1
+            return snapshot
+        try:
+            snapshot = self.snapshot_repo(result)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        future.set_result(snapshot)
+        return snapshot
+
+    def add(self, key, programming_language, imports):
+        for username in self.owners.get(key, []):
+            self.aggregators[username].add(key, programming_language, imports)
+
+    def run(self, usernames):
+        # Returns {username: ImportAggregator}
+        self.list_users(usernames)
+        # Forks go last, so the repositories they can borrow objects from are usually cloned already
+        keys = sorted(self.repositories, key=lambda key: bool(self.repositories[key].get('fork')))
+        pipeline = ReportPipeline(
+            self.clone,
+            self.snapshot,
+            self,
+            clone_workers=self.clone_workers,
+            snapshot_workers=self.snapshot_workers,
+            queue_size=self.queue_size,
+        )
+        pipeline.run(keys)
+        if self.reused_snapshots:
+            print(f"Reused {self.reused_snapshots} snapshots of identical trees")
+        return self.aggregators
@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import argparse
+from SnapshotWriter import (
+    SnapshotWriter, COMPRESSION_SUFFIXES, resolve_compression, compress_frame, decompress_frame, open_snapshot,
+)
+
+SNAPSHOT_SUFFIXES = (".json", ".json.gz", ".json.zst")
+# Blobs younger than this are never collected: a snapshot that is still being
+# written has stored its blobs but not yet the document that references them
+DEFAULT_GC_MIN_AGE = 3600
+
+
+def content_digest(content):
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+class BlobStore:
+    # Content-addressed store for source files shared by every snapshot. A blob
+    # lives at objects/<first two hex digits>/<rest of the SHA-1>[.gz|.zst] and
+    # is written once: snapshots of unchanged files, forks and vendored copies
+    # all reference the same object. Snapshot documents keep the usual schema,
+    # except that each file has a "Source_Blob" digest instead of "Source_Code".
+
+    def __init__(self, root, compression='auto'):
+        self.root = root
+        self.compression = resolve_compression(compression)
+        self.suffix = COMPRESSION_SUFFIXES.get(self.compression, '')
+
+    def object_path(self, digest, suffix=None):
+        return os.path.join(self.root, 'objects', digest[:2], digest[2:] + (self.suffix if suffix is None else suffix))
+
+    def find(self, digest):
+        # Blobs written with another compression setting stay readable
+        for suffix in dict.fromkeys((self.suffix, '', '.zst', '.gz')):
+            path = self.object_path(digest, suffix)
+            if os.path.exists(path):
+                return path, suffix
+        return None, None
+
+    def has(self, digest):
+        return self.find(digest)[0] is not None
+
+    def put(self, content, digest=None):
+        digest = digest or content_digest(content)
+        if self.has(digest):
+            return digest
+        path = self.object_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = content.encode('utf-8')
+        if self.compression:
+            data = compress_frame(data, self.compression)
+        # Unique temporary name, so concurrent writers of the same blob do not collide
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return digest
+
+    def get(self, digest):
+        path, suffix = self.find(digest)
+        if path is None:
+            raise KeyError(f"Blob {digest} is missing from {self.root}")
+        with open(path, 'rb') as f:
+            data = f.read()
+        compression = {value: key for key, value in COMPRESSION_SUFFIXES.items()}.get(suffix)
+        if compression:
+            data = decompress_frame(data, compression)
+        return data.decode('utf-8')
+
+    def objects(self):
+        # (digest, path) for every stored blob
+        objects_dir = os.path.join(self.root, 'objects')
+        if not os.path.isdir(objects_dir):
+            return
+        for prefix in sorted(os.listdir(objects_dir)):
+            prefix_dir = os.path.join(objects_dir, prefix)
+            for name in sorted(os.listdir(prefix_dir)):
+                if name.endswith('.tmp'):
+                    continue
+                yield prefix + name.split('.')[0], os.path.join(prefix_dir, name)
+
+    def resolve_record(self, source_data):
+        # The original record, with Source_Code read back from the store
+        file_data = source_data['file']
+        if 'Source_Blob' not in file_data:
+            return source_data
+        resolved = {key: value for key, value in file_data.items() if key != 'Source_Blob'}
+        resolved['Source_Code'] = self.get(file_data['Source_Blob'])
+        return {'file': resolved}
+
+    def load_snapshot(self, snapshot_path):
+        # The full JSON view of a deduplicated snapshot
+        with open_snapshot(snapshot_path) as f:
+            data = json.load(f)
+        data['project_sources'] = [self.resolve_record(source_data) for source_data in data['project_sources']]
+        return data
+
+    def materialize(self, snapshot_path, output_file, compact=False, compression=None):
+        # Writes a self-contained snapshot with every source inlined again
+        with open_snapshot(snapshot_path) as f:
+            data = json.load(f)
+        with SnapshotWriter(output_file, compact=compact, compression=compression) as writer:
+            writer.begin(data['project_name'])
+            for source_data in data['project_sources']:
+                writer.write_source(self.resolve_record(source_data))
+            writer.finish(data['programming_language'], data['project_tree_structure'], data['external_libraries'], data['observations'])
+        return writer.path
+
+    def gc(self, snapshot_roots, min_age=DEFAULT_GC_MIN_AGE, dry_run=False):
+        # Removes blobs no snapshot document under snapshot_roots refers to
+        referenced = set()
+        for snapshot_root in snapshot_roots:
+            for root, dirs, files in os.walk(snapshot_root):
+                for file in files:
+                    if not file.endswith(SNAPSHOT_SUFFIXES):
+                        continue
+                    snapshot_path = os.path.join(root, file)
+                    try:
+                        with open_snapshot(snapshot_path) as f:
+                            data = json.load(f)
+                    except (OSError, ValueError) as e:
+                        # Collecting with an unreadable snapshot around could delete its blobs
+                        raise ValueError(f"Cannot read {snapshot_path}, refusing to collect garbage: {e}")
+                    for source_data in data.get('project_sources', []):
+                        digest = source_data.get('file', {}).get('Source_Blob')
+                        if digest:
+                            referenced.add(digest)
+
+        removed = 0
+        freed = 0
+        kept = 0
+        cutoff = time.time() - min_age
+        for digest, path in list(self.objects()):
+            if digest in referenced:
+                kept += 1
+                continue
+            info = os.stat(path)
+            if info.st_mtime > cutoff:
+                kept += 1
+                continue
+            removed += 1
+            freed += info.st_size
+            if not dry_run:
+                os.remove(path)
+        action = "Would remove" if dry_run else "Removed"
+        print(f"{action} {removed} unreferenced blobs ({freed / (1024 * 1024):.1f} MB), kept {kept}")
+        return removed, freed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the shared blob store of deduplicated snapshots.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    gc_parser = subparsers.add_parser("gc", help="Remove blobs that no snapshot refers to")
+    gc_parser.add_argument("--store", required=True, help="Blob store directory")
+    gc_parser.add_argument("--snapshots", required=True, help="Comma separated directories holding the snapshots that use the store")
+    gc_parser.add_argument("--min-age", type=int, default=DEFAULT_GC_MIN_AGE, help="Only remove blobs older than this many seconds")
+    gc_parser.add_argument("--dry-run", type=int, choices=[0, 1], default=0, help="Only report what would be removed (0 or 1)")
+
+    materialize_parser = subparsers.add_parser("materialize", help="Rebuild a self-contained JSON snapshot")
+    materialize_parser.add_argument("--store", required=True, help="Blob store directory")
+    materialize_parser.add_argument("snapshot", help="Deduplicated snapshot")
+    materialize_parser.add_argument("output", help="Snapshot with every source inlined")
+    materialize_parser.add_argument("--compact", type=int, choices=[0, 1], default=0, help="Write compact JSON (0 or 1)")
+
+    args = parser.parse_args()
+    store = BlobStore(args.store)
+    if args.command == "gc":
+        store.gc(args.snapshots.split(','), min_age=args.min_age, dry_run=args.dry_run)
+    else:
+        print(f"Snapshot rebuilt at: {store.materialize(args.snapshot, args.output, compact=args.compact)}")
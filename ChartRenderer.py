@@ -0,0 +1,160 @@
+import os
+import json
+import glob
+import hashlib
+from Metrics import METRICS
+
+CHART_FORMATS = ('png', 'svg', 'pdf')
+DEFAULT_TOP_N = 20
+OTHER_LABEL = 'other'
+# Bump when the drawing code changes so cached charts are redrawn
+CHART_RENDERER_VERSION = 1
+
+
+def top_libraries(libraries_used, top_n=DEFAULT_TOP_N):
+    # The top_n most imported libraries, with the remaining ones summed into a single "other" slice
+    ranked = sorted(libraries_used, key=lambda item: item['times_imported'], reverse=True)
+    if not top_n or len(ranked) <= top_n:
+        return ranked
+    rest = sum(item['times_imported'] for item in ranked[top_n:])
+    return ranked[:top_n] + [{'library_name': OTHER_LABEL, 'times_imported': rest}]
+
+
+def draw_pie_chart(data, title, file_path):
+    import matplotlib.pyplot as plt
+
+    labels = [item['library_name'] for item in data]
+    sizes = [item['times_imported'] for item in data]
+
+    plt.figure(figsize=(10, 6))
+    plt.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=140)
+    plt.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
+    plt.title(title)
+    plt.savefig(file_path, format=os.path.splitext(file_path)[1][1:] or None)
+    plt.close()
+
+
+def draw_bar_chart(data, title, file_path):
+    import matplotlib.pyplot as plt
+
+    labels = [item['library_name'] for item in data]
+    sizes = [item['times_imported'] for item in data]
+
+    plt.figure(figsize=(12, 8))
+    plt.bar(labels, sizes, color='skyblue')
+    plt.xlabel('Libraries')
+    plt.ylabel('Number of Imports')
+    plt.title(title)
+    plt.xticks(rotation=90)
+    plt.tight_layout()
+    plt.savefig(file_path, format=os.path.splitext(file_path)[1][1:] or None)
+    plt.close()
+
+
+CHART_DRAWERS = {'pie': draw_pie_chart, 'bar': draw_bar_chart}
+
+
+def render_chart(kind, data, title, file_path):
+    # Draw into a temporary name first so an interrupted run never leaves a
+    # truncated chart behind that would later be taken for a cached one
+    root, extension = os.path.splitext(file_path)
+    tmp_path = f"{root}.tmp{extension}"
+    CHART_DRAWERS[kind](data, title, tmp_path)
+    os.replace(tmp_path, file_path)
+    return file_path
+
+
+class ChartRenderer:
+    # Renders the per-language pie and bar charts of the PDF report. Charts are
+    # named after a hash of what they plot, so a language whose libraries did
+    # not change reuses the file from the previous run, and the missing ones are
+    # drawn in a process pool (matplotlib is CPU bound and not thread safe).
+
+    def __init__(self, output_dir='./tmp', chart_format='png', top_n=DEFAULT_TOP_N, workers=None):
+        if chart_format not in CHART_FORMATS:
+            raise ValueError(f"Unsupported chart format {chart_format}; expected one of {', '.join(CHART_FORMATS)}")
+        self.output_dir = output_dir
+        self.chart_format = chart_format
+        self.top_n = top_n
+        self.workers = workers
+        self.reused = 0
+        self.rendered = 0
+
+    def chart_path(self, kind, language, data, title):
+        payload = json.dumps([CHART_RENDERER_VERSION, kind, title, data], sort_keys=True).encode('utf-8')
+        digest = hashlib.sha1(payload).hexdigest()[:16]
+        return os.path.join(self.output_dir, f"{kind}_chart_{language}_{digest}.{self.chart_format}")
+
+    def remove_stale(self, kind, language, keep):
+        for path in glob.glob(os.path.join(glob.escape(self.output_dir), f"{glob.escape(kind)}_chart_{glob.escape(language)}_*.{self.chart_format}")):
+            if path != keep:
+                os.remove(path)
+
+    def render(self, languages):
+        # languages is a list of (language, libraries_used); returns {language: (pie_path, bar_path)}
+        os.makedirs(self.output_dir, exist_ok=True)
+        charts = {}
+        jobs = []
+        for language, libraries_used in languages:
+            data = top_libraries(libraries_used, self.top_n)
+            title = f"Library Usage for {language}"
+            paths = []
+            for kind in ('pie', 'bar'):
+                path = self.chart_path(kind, language, data, title)
+                paths.append(path)
+                if os.path.exists(path):
+                    self.reused += 1
+                else:
+                    jobs.append((kind, data, title, path))
+                self.remove_stale(kind, language, path)
+            charts[language] = tuple(paths)
+
+        with METRICS.timer('charts'):
+            if len(jobs) > 1 and self.workers != 1:
+                from concurrent.futures import ProcessPoolExecutor
+                with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                    for future in [executor.submit(render_chart, *job) for job in jobs]:
+                        future.result()
+            else:
+                for job in jobs:
+                    render_chart(*job)
+        self.rendered += len(jobs)
+        METRICS.count('charts', 'rendered', len(jobs))
+        METRICS.count('charts', 'reused', len(languages) * 2 - len(jobs))
+        METRICS.add_bytes('charts', written=sum(os.path.getsize(job[3]) for job in jobs) if METRICS.enabled else 0)
+
+        print(f"Charts: {self.rendered} rendered, {self.reused} reused from {self.output_dir}")
+        return charts
+
+
+def draw_chart_on_canvas(pdf, chart_path, x, y, width, height):
+    # PNG charts are placed as images. SVG and PDF charts stay vector graphics
+    # and need svglib or pdfrw respectively.
+    extension = os.path.splitext(chart_path)[1]
+    if extension == '.svg':
+        try:
+            from svglib.svglib import svg2rlg
+            from reportlab.graphics import renderPDF
+        except ImportError:
+            raise ValueError("Embedding SVG charts requires the svglib package (pip install svglib)")
+        drawing = svg2rlg(chart_path)
+        pdf.saveState()
+        pdf.translate(x, y)
+        pdf.scale(width / drawing.width, height / drawing.height)
+        renderPDF.draw(drawing, pdf, 0, 0)
+        pdf.restoreState()
+    elif extension == '.pdf':
+        try:
+            from pdfrw import PdfReader
+            from pdfrw.buildxobj import pagexobj
+            from pdfrw.toreportlab import makerl
+        except ImportError:
+            raise ValueError("Embedding PDF charts requires the pdfrw package (pip install pdfrw)")
+        page = pagexobj(PdfReader(chart_path).pages[0])
+        pdf.saveState()
+        pdf.translate(x, y)
+        pdf.scale(width / page.BBox[2], height / page.BBox[3])
+        pdf.doForm(makerl(pdf, page))
+        pdf.restoreState()
+    else:
+        pdf.drawImage(chart_path, x, y, width=width, height=height)
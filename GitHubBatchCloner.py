@@ -1,50 +1,117 @@
-import requests
 import subprocess
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from GitHubListingClient import GitHubListingClient
+from Metrics import METRICS
 
 class GitHubBatchCloner:
 
-    def __init__(self) -> None:
-        pass
+    def __init__(self, max_workers=1, depth=None, blob_filter=None, listing_client=None, bare=False) -> None:
+        # max_workers bounds how many git processes run at once; depth enables
+        # shallow clones and blob_filter partial clones (e.g. "blob:none"). bare
+        # clones (<name>.git) skip the working tree, for snapshots read from git objects.
+        self.max_workers = max_workers or 1
+        self.depth = depth
+        self.blob_filter = blob_filter
+        self.bare = bare
+        self.listing_client = listing_client or GitHubListingClient()
 
     def get_list_of_repositories_for_usernames(self, usernames):
-        all_repos = []
-        for username in usernames:
-            repos = []
-            page = 1
-            while True:
-                url = f"https://api.github.com/users/{username}/repos?page={page}&per_page=100"
-                response = requests.get(url)
-                if response.status_code != 200:
-                    print(f"Failed to fetch repositories for user {username}. HTTP Status code: {response.status_code}")
-                    break
-                page_repos = response.json()
-                if not page_repos:
-                    break
-                repos.extend(page_repos)
-                page += 1
-            all_repos.extend(repos)
-        return all_repos
+        return self.listing_client.list_repositories_for_usernames(usernames)
 
     def get_github_repos(self, usernames):
         repos = self.get_list_of_repositories_for_usernames(usernames)
         clone_urls = [repo['clone_url'] for repo in repos]
         return len(clone_urls), clone_urls
 
-    def clone_or_update_repo(self, repo_url, dest_dir):
+    def run_git(self, args):
+        # Never wait on a credential prompt from a worker thread
+        env = dict(os.environ, GIT_TERMINAL_PROMPT='0')
+        return subprocess.run(['git'] + args, capture_output=True, text=True, env=env)
+
+    def head_revision(self, repo_path):
+        result = self.run_git(['-C', repo_path, 'rev-parse', 'HEAD'])
+        return result.stdout.strip() if result.returncode == 0 else None
+
+    def directory_size(self, path):
+        total = 0
+        for root, dirs, files in os.walk(path):
+            for file in files:
+                try:
+                    total += os.lstat(os.path.join(root, file)).st_size
+                except OSError:
+                    pass
+        return total
+
+    def tree_id(self, repo_path):
+        # Object id of the checked-out tree: identical contents share it, whatever the repository
+        result = self.run_git(['-C', repo_path, 'rev-parse', 'HEAD^{tree}'])
+        return result.stdout.strip() if result.returncode == 0 else None
+
+    def clone_or_update_repo(self, repo_url, dest_dir, reference=None):
+        # reference is an existing clone (e.g. a fork's parent) whose objects a new
+        # clone copies instead of fetching them again
         repo_name = repo_url.split('/')[-1].replace('.git', '')
-        repo_path = os.path.join(dest_dir, repo_name)
+        repo_path = os.path.join(dest_dir, repo_name + ('.git' if self.bare else ''))
+        git_dir = repo_path if self.bare else os.path.join(repo_path, '.git')
+        started = time.perf_counter()
+
         if not os.path.exists(repo_path):
             print(f"Cloning {repo_url} into {repo_path}...")
-            subprocess.run(['git', 'clone', repo_url, repo_path])
+            size_before = 0
+            depth_args = [f'--depth={self.depth}'] if self.depth else []
+            filter_args = [f'--filter={self.blob_filter}'] if self.blob_filter else []
+            reference_args = ['--reference-if-able', reference, '--dissociate'] if reference else []
+            bare_args = ['--bare'] if self.bare else []
+            result = self.run_git(['clone', '--quiet'] + bare_args + depth_args + filter_args + reference_args + [repo_url, repo_path])
+            status = 'cloned'
+            head_before = None
         else:
-            print(f"Repository {repo_name} already exists. Pulling updates in {repo_path}...")
-            subprocess.run(['git', '-C', repo_path, 'fetch'])
-            subprocess.run(['git', '-C', repo_path, 'pull'])
+            print(f"Repository {repo_name} already exists. {'Fetching' if self.bare else 'Pulling'} updates in {repo_path}...")
+            size_before = self.directory_size(git_dir)
+            head_before = self.head_revision(repo_path)
+            # pull fetches on its own, so no separate fetch round-trip; shallow clones
+            # stay shallow because the fetch stops at their existing shallow boundary.
+            # Bare clones have nothing to merge into and fetch their branches directly.
+            if self.bare:
+                result = self.run_git(['-C', repo_path, 'fetch', '--quiet', 'origin', '+refs/heads/*:refs/heads/*'])
+            else:
+                result = self.run_git(['-C', repo_path, 'pull', '--quiet'])
+            status = 'updated'
+
+        if result.returncode != 0:
+            status = 'failed'
+            print(f"Git failed for {repo_url}: {result.stderr.strip()}")
+        elif head_before is not None and self.head_revision(repo_path) == head_before:
+            status = 'up_to_date'
+
+        bytes_on_disk = self.directory_size(git_dir) if os.path.exists(repo_path) else 0
+        duration = time.perf_counter() - started
+        fetched_bytes = max(bytes_on_disk - size_before, 0)
+        METRICS.add_time('clone', duration, repo_name)
+        METRICS.add_bytes('clone', written=fetched_bytes, project=repo_name)
+        METRICS.count('clone', status, project=repo_name)
+        return {
+            'repo': repo_name,
+            'url': repo_url,
+            'path': repo_path,
+            'status': status,
+            'duration': duration,
+            'bytes': fetched_bytes,
+            'error': result.stderr.strip() if status == 'failed' else None,
+        }
 
     def clone_repos(self, clone_urls, dest_dir):
         if not os.path.exists(dest_dir):
             os.makedirs(dest_dir)
-        for url in clone_urls:
-            self.clone_or_update_repo(url, dest_dir)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(lambda url: self.clone_or_update_repo(url, dest_dir), clone_urls))
 
+        counts = {}
+        for result in results:
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+        summary = ', '.join(f"{count} {status}" for status, count in sorted(counts.items()))
+        print(f"Processed {len(results)} repositories in {time.perf_counter() - started:.1f}s ({summary})")
+        return results
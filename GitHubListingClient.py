@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import threading
+from urllib.parse import urlparse, parse_qs
+from concurrent.futures import ThreadPoolExecutor
+from Metrics import METRICS
+
+DEFAULT_BASE_URL = "https://api.github.com"
+# Wait for a rate limit that gives no usable Retry-After or reset time (GitHub asks for at least a minute)
+DEFAULT_RETRY_WAIT = 60
+
+
+def retry_after_seconds(value):
+    # Retry-After is either a number of seconds or an HTTP-date (RFC 9110); None when it is neither
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    # Only needed for the rarely sent date form, so not loaded at startup
+    from datetime import timezone
+    from email.utils import parsedate_to_datetime
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return retry_at.timestamp() - time.time()
+
+
+class GitHubListingClient:
+    # Lists a user's repositories over one pooled session. Page 1 is fetched
+    # first; once its Link header reveals the last page, the remaining pages are
+    # fetched in parallel. Responses are cached with their ETag (persisted to
+    # cache_file when given), so an unchanged listing is answered with a 304.
+    # Rate-limited responses are retried after the reset time the API reports.
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, cache_file=None, max_workers=8, token=None, max_retries=3, max_wait=300):
+        self.base_url = base_url.rstrip('/')
+        self.cache_file = cache_file
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+        self.cache = {}
+        self.lock = threading.Lock()
+        self.requests_made = 0
+        self.not_modified = 0
+
+        # requests (and urllib3) are only loaded once a listing is needed
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['Accept'] = 'application/vnd.github+json'
+        token = token or os.environ.get('GITHUB_TOKEN')
+        if token:
+            self.session.headers['Authorization'] = f"Bearer {token}"
+
+        self.load_cache()
+
+    def load_cache(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                self.cache = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable GitHub listing cache {self.cache_file}: {e}")
+
+    def save_cache(self):
+        if not self.cache_file:
+            return
+        tmp_file = f"{self.cache_file}.tmp"
+        with self.lock:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.cache, f)
+        os.replace(tmp_file, self.cache_file)
+
+    def page_url(self, username, page):
+        return f"{self.base_url}/users/{username}/repos?page={page}&per_page=100"
+
+    def rate_limit_wait(self, response):
+        # Seconds to wait before retrying, or None when the response is not a rate limit
+        if response.status_code not in (403, 429):
+            return None
+        retry_after = response.headers.get('Retry-After')
+        wait = retry_after_seconds(retry_after) if retry_after is not None else None
+        if wait is not None:
+            return min(max(wait, 0), self.max_wait)
+        exhausted = response.headers.get('X-RateLimit-Remaining') == '0'
+        if exhausted:
+            try:
+                reset = float(response.headers.get('X-RateLimit-Reset', time.time()))
+                return min(max(reset - time.time(), 1), self.max_wait)
+            except (TypeError, ValueError):
+                pass
+        if exhausted or retry_after is not None:
+            # A Retry-After or reset time that cannot be parsed still marks a rate limit
+            return min(DEFAULT_RETRY_WAIT, self.max_wait)
+        return None
+
+    def last_page(self, response):
+        last = response.links.get('last', {}).get('url')
+        if not last:
+            return 1
+        return int(parse_qs(urlparse(last).query).get('page', ['1'])[0])
+
+    def get(self, url):
+        with self.lock:
+            cached = self.cache.get(url)
+        headers = {'If-None-Match': cached['etag']} if cached and cached.get('etag') else {}
+
+        for attempt in range(self.max_retries + 1):
+            response = self.session.get(url, headers=headers)
+            with self.lock:
+                self.requests_made += 1
+            wait = self.rate_limit_wait(response)
+            if wait is None or attempt == self.max_retries:
+                break
+            print(f"Rate limited by GitHub, retrying {url} in {wait:.0f}s")
+            time.sleep(wait)
+
+        if response.status_code == 304 and cached:
+            with self.lock:
+                self.not_modified += 1
+            return cached
+        if response.status_code != 200:
+            return {'status_code': response.status_code}
+
+        entry = {'etag': response.headers.get('ETag'), 'body': response.json(), 'last_page': self.last_page(response)}
+        with self.lock:
+            self.cache[url] = entry
+        return entry
+
+    def list_repositories(self, username):
+        first = self.get(self.page_url(username, 1))
+        if 'body' not in first:
+            print(f"Failed to fetch repositories for user {username}. HTTP Status code: {first['status_code']}")
+            return []
+
+        repos = list(first['body'])
+        if first['last_page'] > 1:
+            urls = [self.page_url(username, page) for page in range(2, first['last_page'] + 1)]
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                pages = list(executor.map(self.get, urls))
+            for url, page in zip(urls, pages):
+                if 'body' not in page:
+                    print(f"Failed to fetch {url}. HTTP Status code: {page['status_code']}")
+                    continue
+                repos.extend(page['body'])
+        return repos
+
+    def list_repositories_for_usernames(self, usernames):
+        all_repos = []
+        for username in usernames:
+            requests_before, not_modified_before = self.requests_made, self.not_modified
+            with METRICS.timer('github_listing', username):
+                all_repos.extend(self.list_repositories(username))
+            METRICS.count('github_listing', 'requests', self.requests_made - requests_before, username)
+            METRICS.count('github_listing', 'not_modified', self.not_modified - not_modified_before, username)
+        self.save_cache()
+        print(f"Listed {len(all_repos)} repositories with {self.requests_made} requests ({self.not_modified} not modified)")
+        return all_repos
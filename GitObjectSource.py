@@ -0,0 +1,92 @@
+import os
+import subprocess
+
+# Tree entry modes that are not regular files: symlinks hold their target's
+# path and gitlinks (submodules) point at another repository's commit
+SYMLINK_MODE = '120000'
+GITLINK_MODE = '160000'
+
+
+class GitError(RuntimeError):
+    pass
+
+
+def run_git(repo_path, args):
+    # Never wait on a credential prompt (a partial clone may fetch missing blobs)
+    env = dict(os.environ, GIT_TERMINAL_PROMPT='0')
+    result = subprocess.run(['git', '-C', repo_path] + args, capture_output=True, env=env)
+    if result.returncode != 0:
+        raise GitError(f"git {' '.join(args)} failed in {repo_path}: {result.stderr.decode('utf-8', 'replace').strip()}")
+    return result.stdout
+
+
+class GitObjectSource:
+    # Reads one commit's files straight from a repository's object database,
+    # so a bare or --no-checkout clone can be snapshotted without a working
+    # tree. The tree is listed once with ls-tree; blob contents come from a
+    # single long-running `git cat-file --batch` process that is started on
+    # the first read. Blob ids double as cache keys: a file whose id did not
+    # change since the last snapshot has the same contents. Only used from the
+    # thread that walks the tree.
+
+    def __init__(self, repo_path, ref='HEAD'):
+        self.repo_path = repo_path
+        self.ref = ref
+        self.git_dir = run_git(repo_path, ['rev-parse', '--absolute-git-dir']).decode('utf-8', 'surrogateescape').strip()
+        self.commit = run_git(repo_path, ['rev-parse', '--verify', f'{ref}^{{commit}}']).decode('ascii').strip()
+        self.tree_id = run_git(repo_path, ['rev-parse', f'{self.commit}^{{tree}}']).decode('ascii').strip()
+        # Blobs have no mtime; every file gets the commit's time instead
+        self.commit_time = int(run_git(repo_path, ['log', '-1', '--format=%ct', self.commit]).decode('ascii').strip())
+        self.process = None
+        self.blobs_read = 0
+        self.bytes_read = 0
+
+    def entries(self):
+        # (relative path, mode, blob id, size) of every file in the commit, in git's tree order
+        output = run_git(self.repo_path, ['ls-tree', '-r', '-z', '-l', '--full-tree', self.commit])
+        entries = []
+        for item in output.split(b'\0'):
+            if not item:
+                continue
+            meta, path = item.split(b'\t', 1)
+            mode, kind, oid, size = meta.decode('ascii').split()
+            if kind != 'blob' or mode in (SYMLINK_MODE, GITLINK_MODE):
+                continue
+            entries.append((path.decode('utf-8', 'surrogateescape'), mode, oid, int(size)))
+        return entries
+
+    def start(self):
+        self.process = subprocess.Popen(
+            ['git', '-C', self.repo_path, 'cat-file', '--batch'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            env=dict(os.environ, GIT_TERMINAL_PROMPT='0'),
+        )
+
+    def read_blob(self, oid):
+        if self.process is None:
+            self.start()
+        self.process.stdin.write(oid.encode('ascii') + b'\n')
+        self.process.stdin.flush()
+        header = self.process.stdout.readline().split()
+        if len(header) != 3:
+            raise GitError(f"Object {oid} is missing from {self.repo_path}")
+        size = int(header[2])
+        data = self.process.stdout.read(size)
+        # Every object is followed by a newline
+        self.process.stdout.read(1)
+        self.blobs_read += 1
+        self.bytes_read += size
+        return data
+
+    def close(self):
+        if self.process is not None:
+            self.process.stdin.close()
+            self.process.wait()
+            self.process.stdout.close()
+            self.process = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,185 @@
+import os
+import re
+
+GITIGNORE_FILE = '.gitignore'
+# git never looks inside its own directory
+GIT_DIR = '.git'
+
+
+def translate_glob(pattern):
+    # gitignore glob -> regular expression over a '/' separated relative path
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == '*':
+            at_segment_start = i == 0 or pattern[i - 1] == '/'
+            if pattern.startswith('**', i) and at_segment_start:
+                if pattern.startswith('**/', i):
+                    # "**/" matches any number of leading directories, including none
+                    out.append('(?:.*/)?')
+                    i += 3
+                    continue
+                if i + 2 == n:
+                    # a trailing "/**" matches everything inside
+                    out.append('.*')
+                    i += 2
+                    continue
+            while i + 1 < n and pattern[i + 1] == '*':
+                i += 1
+            out.append('[^/]*')
+        elif c == '?':
+            out.append('[^/]')
+        elif c == '[':
+            j = i + 1
+            if j < n and pattern[j] in '!^':
+                j += 1
+            if j < n and pattern[j] == ']':
+                j += 1
+            j = pattern.find(']', j)
+            if j == -1:
+                out.append(re.escape(c))
+            else:
+                members = pattern[i + 1:j].replace('\\', '\\\\').replace('[', '\\[')
+                if members[0] in '!^':
+                    members = '^' + members[1:]
+                out.append(f'[{members}]')
+                i = j
+        elif c == '\\' and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return ''.join(out)
+
+
+def parse_pattern(line, base=''):
+    # One gitignore line -> (regex source, negate, directory_only), or None for
+    # blank lines and comments. base is the root-relative directory of the
+    # .gitignore file the line comes from ('' for the root).
+    line = line.rstrip('\r\n')
+    while line.endswith(' ') and not line.endswith('\\ '):
+        line = line[:-1]
+    if not line or line.startswith('#'):
+        return None
+    negate = line.startswith('!')
+    if negate:
+        line = line[1:]
+    directory_only = line.endswith('/')
+    if directory_only:
+        line = line.rstrip('/')
+    if not line:
+        return None
+    # A slash anywhere but at the end anchors the pattern to its .gitignore's directory
+    anchored = '/' in line
+    line = line.lstrip('/')
+    source = (re.escape(base) + '/' if base else '') + ('' if anchored else '(?:.*/)?') + translate_glob(line)
+    return source, negate, directory_only
+
+
+def parse_patterns(lines, base=''):
+    rules = []
+    for line in lines:
+        rule = parse_pattern(line, base)
+        if rule is not None:
+            rules.append(rule)
+    return rules
+
+
+class IgnoreRules:
+    # The rules in force in one directory: the user patterns, then every
+    # .gitignore from the root down to that directory, with later rules
+    # winning as in git. Without negations all of them are compiled into two
+    # alternations (files, directories), so a check is a single regex match.
+
+    def __init__(self, rules, key):
+        self.rules = rules
+        self.key = key
+        if any(negate for source, negate, directory_only in rules):
+            self.ordered = [(re.compile(source), negate, directory_only) for source, negate, directory_only in reversed(rules)]
+            self.file_regex = self.directory_regex = None
+        else:
+            self.ordered = None
+            self.file_regex = combine([source for source, negate, directory_only in rules if not directory_only])
+            self.directory_regex = combine([source for source, negate, directory_only in rules])
+        # Lets walkers skip per-file checks when only directories can be ignored
+        self.ignores_files = self.ordered is not None or self.file_regex is not None
+
+    def ignored(self, relative_path, is_dir):
+        # relative_path is relative to the matcher's root and uses '/' separators
+        if self.ordered is None:
+            regex = self.directory_regex if is_dir else self.file_regex
+            return regex is not None and regex.fullmatch(relative_path) is not None
+        for regex, negate, directory_only in self.ordered:
+            if directory_only and not is_dir:
+                continue
+            if regex.fullmatch(relative_path):
+                return not negate
+        return False
+
+
+def combine(sources):
+    if not sources:
+        return None
+    return re.compile('|'.join(f'(?:{source})' for source in sources))
+
+
+class IgnoreMatcher:
+    # Decides which files and directories a walk skips. Directories are
+    # checked before they are descended into, so an ignored subtree is never
+    # listed. Patterns use .gitignore syntax; with use_gitignore the root's
+    # .git/info/exclude and every nested .gitignore apply as well, and .git
+    # itself is skipped. Walkers keep one IgnoreRules per directory: they
+    # start from base_rules() and call child_rules() for every directory they
+    # list, the root included.
+
+    def __init__(self, patterns=(), use_gitignore=True):
+        self.patterns = list(patterns)
+        self.use_gitignore = use_gitignore
+
+    def settings(self):
+        return [self.patterns, bool(self.use_gitignore)]
+
+    def base_rules(self, root_dir, git_dir=None):
+        # git_dir defaults to root_dir/.git; bare repositories pass their own path
+        lines = list(self.patterns)
+        if self.use_gitignore:
+            lines.append(GIT_DIR + '/')
+            lines.extend(read_lines(os.path.join(git_dir or os.path.join(root_dir, GIT_DIR), 'info', 'exclude')))
+        return IgnoreRules(parse_patterns(lines), rules_key('\n'.join(lines)))
+
+    def child_rules(self, rules, directory, relative_dir, has_gitignore=True):
+        # The rules for `directory`: its parent's, plus its own .gitignore if it has one.
+        # Callers that already listed the directory pass has_gitignore to skip the open().
+        if not self.use_gitignore or not has_gitignore:
+            return rules
+        return self.rules_with_lines(rules, relative_dir, read_lines(os.path.join(directory, GITIGNORE_FILE)))
+
+    def rules_with_lines(self, rules, relative_dir, lines):
+        # Same as child_rules, for a .gitignore whose lines were read elsewhere (e.g. from a git blob)
+        if not self.use_gitignore:
+            return rules
+        added = parse_patterns(lines, relative_dir)
+        if not added:
+            return rules
+        return IgnoreRules(rules.rules + added, rules_key(rules.key, relative_dir, '\n'.join(lines)))
+
+
+def rules_key(*parts):
+    # Identifies a set of rules, so journals can tell whether a listing was filtered the same way.
+    # hashlib is imported here to keep it out of the scanner's startup time
+    import hashlib
+    return hashlib.sha1('\0'.join(parts).encode('utf-8', 'surrogateescape')).hexdigest()
+
+
+def read_lines(path):
+    try:
+        with open(path, 'r', encoding='utf-8', errors='surrogateescape') as f:
+            return f.read().splitlines()
+    except OSError:
+        return []
+
+
+def relative_child(relative_dir, name):
+    return f"{relative_dir}/{name}" if relative_dir else name
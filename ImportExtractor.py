@@ -0,0 +1,94 @@
+import re
+
+# Bump whenever patterns change so cached per-file imports are recomputed
+IMPORT_EXTRACTOR_VERSION = 4
+
+
+class ImportExtractor:
+    # One compiled import pattern plus an optional "header end" pattern. The
+    # header end matches the first line where a file's body starts (the first
+    # class/function definition and so on). Only the text before it is scanned
+    # for imports, and a file with no such line is scanned in full. Languages
+    # that allow imports inside functions or after code (Python, Ruby, PHP,
+    # Perl, Lua, Scala, C and C++) get no header end, so they are always
+    # scanned in full and find the same imports as --full-import-scan 1.
+
+    def __init__(self, pattern, header_end=None):
+        self.regex = re.compile(pattern, re.MULTILINE)
+        self.header_end = re.compile(header_end, re.MULTILINE) if header_end else None
+
+    def header(self, content):
+        if self.header_end is None:
+            return content
+        match = self.header_end.search(content)
+        return content[:match.start()] if match else content
+
+    def extract(self, content, full_scan=False):
+        if not full_scan:
+            content = self.header(content)
+        return self.regex.findall(content)
+
+
+IMPORT_EXTRACTORS = {}
+
+
+def register_import_extractor(extensions, pattern, header_end=None):
+    extractor = ImportExtractor(pattern, header_end)
+    for extension in extensions:
+        IMPORT_EXTRACTORS[extension] = extractor
+    return extractor
+
+
+def find_imports(content, extension, full_scan=False):
+    extractor = IMPORT_EXTRACTORS.get(extension)
+    if extractor is None:
+        return []
+    return extractor.extract(content, full_scan)
+
+
+JS_IMPORT = r"^\s*import\s+.*?\s+from\s+['\"]([\w\-\/]+)['\"]"
+JS_BODY = r"^(?:export\s+(?:default\s+)?)?(?:async\s+)?(?:function\*?|class)\s"
+C_INCLUDE = r"^\s*#\s*include\s*<([\w\.\/]+)>"
+# Annotations are not a header end: @file:JvmName, package annotations and
+# Swift's @testable import all sit above or among the imports
+JVM_BODY = (
+    r"^(?:(?:(?:public|private|protected|internal|abstract|final|sealed|static|open|data|inline|value|case|implicit)\s+)*"
+    r"(?:class|interface|enum|record|object|trait|fun)\s)"
+)
+
+register_import_extractor([".py"], r"^\s*(?:import|from)\s+([\w\.]+)")
+register_import_extractor([".js", ".mjs", ".jsx", ".vue", ".svelte"], JS_IMPORT, JS_BODY)
+register_import_extractor([".ts", ".tsx"], JS_IMPORT, JS_BODY)
+register_import_extractor([".java"], r"^\s*import\s+([\w\.]+)", JVM_BODY)
+register_import_extractor([".kt", ".kts"], r"^\s*import\s+([\w\.]+)", JVM_BODY)
+register_import_extractor([".scala", ".sc"], r"^\s*import\s+([\w\.]+)")
+register_import_extractor([".groovy", ".gvy", ".gy", ".gsh"], r"^\s*import\s+([\w\.]+)", JVM_BODY)
+register_import_extractor([".cpp", ".hpp", ".cc", ".h"], C_INCLUDE)
+register_import_extractor([".c"], C_INCLUDE)
+register_import_extractor(
+    [".cs"], r"^\s*using\s+([\w\.]+)",
+    r"^\s*(?:\[|(?:(?:public|private|protected|internal|abstract|sealed|static|partial|unsafe)\s+)*(?:class|interface|enum|struct|record)\s)",
+)
+register_import_extractor([".rb", ".erb", ".rake"], r"^\s*require\s+['\"]([\w\/]+)['\"]")
+register_import_extractor([".php", ".phtml", ".php3", ".php4", ".php5", ".phps"], r"^\s*use\s+([\w\\]+)")
+register_import_extractor([".go"], r"^\s*import\s+['\"]([\w\/]+)['\"]", r"^(?:func|type|var|const)\s")
+register_import_extractor(
+    [".rs"], r"^\s*extern\s+crate\s+([\w_]+)",
+    r"^(?:pub(?:\([^)\n]*\))?\s+)?(?:(?:async|unsafe|const)\s+)*(?:fn|struct|enum|impl|trait)\b",
+)
+register_import_extractor(
+    [".dart"], r"^\s*import\s+['\"]([\w\/]+)['\"]",
+    r"^(?:(?:abstract|sealed|base|final)\s+)*(?:class|mixin|enum|extension|typedef)\s|^void\s+main\b",
+)
+register_import_extractor(
+    [".swift"], r"^\s*(?:@\w+\s+)?import\s+([\w]+)",
+    r"^(?:(?:public|private|fileprivate|internal|open|final)\s+)*(?:class|struct|enum|protocol|extension|func|actor)\s",
+)
+register_import_extractor([".pl", ".pm"], r"^\s*(?:use|require)\s+([A-Za-z][\w:]*)")
+register_import_extractor([".R", ".r"], r"^\s*(?:library|require)\(\s*['\"]?([\w\.]+)['\"]?\s*\)")
+register_import_extractor([".lua"], r"^.*?\brequire\s*\(?\s*['\"]([\w\.\-\/]+)['\"]")
+register_import_extractor([".hs", ".lhs"], r"^>?\s*import\s+(?:qualified\s+)?([\w\.]+)", r"^(?:data|type|newtype|class|instance)\s|^[a-z_][\w']*\s*::")
+register_import_extractor([".ex", ".exs"], r"^\s*(?:import|alias|use|require)\s+([\w\.]+)")
+register_import_extractor([".jl"], r"^\s*(?:using|import)\s+([\w\.]+)", r"^(?:function|struct|mutable\s+struct|macro)\s")
+register_import_extractor([".fs", ".fsi", ".fsx"], r"^\s*open\s+([\w\.]+)", r"^(?:let|type)\s")
+register_import_extractor([".erl", ".hrl"], r"^-include(?:_lib)?\(\s*\"([\w\.\/]+)\"\s*\)", r"^[a-z]\w*\(")
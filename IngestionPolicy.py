@@ -0,0 +1,97 @@
+import io
+import codecs
+import hashlib
+
+DEFAULT_MAX_FILE_BYTES = 1024 * 1024
+SNIFF_BYTES = 8192
+# Average characters per line in the sniffed prefix above which a file counts as minified
+MINIFIED_LINE_LENGTH = 300
+OVERSIZE_POLICIES = ('truncate', 'hash')
+
+
+class BinaryContentError(ValueError):
+    pass
+
+
+def decode_prefix(data):
+    # Strict UTF-8 decode that tolerates a multi-byte character cut off at the end
+    return codecs.getincrementaldecoder('utf-8')().decode(data, final=False)
+
+
+def normalize_newlines(text):
+    # Same newline translation as reading the file in text mode
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+
+class IngestionPolicy:
+    # Decides how much of a file goes into a snapshot. A prefix of every file
+    # is read first: files with NUL bytes or invalid UTF-8 are skipped as
+    # binary, and long files with very few newlines are treated as minified.
+    # Files over max_file_bytes, minified files and files past the project's
+    # byte budget get a placeholder record instead of their full source:
+    # "truncate" keeps the first max_file_bytes (cut at a line break), "hash"
+    # keeps only a SHA-1 of the content. Files past the project budget are not
+    # read at all.
+
+    def __init__(self, max_file_bytes=DEFAULT_MAX_FILE_BYTES, max_project_bytes=None, oversize='truncate', skip_minified=True, sniff_bytes=SNIFF_BYTES):
+        if oversize not in OVERSIZE_POLICIES:
+            raise ValueError(f"Unsupported oversize policy {oversize}; expected one of {', '.join(OVERSIZE_POLICIES)}")
+        self.max_file_bytes = max_file_bytes or None
+        self.max_project_bytes = max_project_bytes or None
+        self.oversize = oversize
+        self.skip_minified = skip_minified
+        self.sniff_bytes = sniff_bytes
+
+    def settings(self):
+        return [self.max_file_bytes, self.max_project_bytes, self.oversize, bool(self.skip_minified), self.sniff_bytes]
+
+    def admitted_bytes(self, size):
+        # Bytes a file counts against the project budget
+        return min(size, self.max_file_bytes) if self.max_file_bytes else size
+
+    def is_minified(self, prefix_text, size):
+        if size <= self.sniff_bytes or not prefix_text:
+            return False
+        return len(prefix_text) / (prefix_text.count('\n') + 1) > MINIFIED_LINE_LENGTH
+
+    def read(self, file_path, size, over_budget=False, data=None):
+        # Returns (content, ingestion); ingestion is None for a complete file, or a
+        # dict with the placeholder status, the rule that applied and the reason.
+        # Binary files raise UnicodeDecodeError, or BinaryContentError for NUL bytes.
+        # data, when given, holds the file's bytes (e.g. a git blob) and nothing is opened.
+        if over_budget:
+            return '', {'status': 'omitted', 'rule': 'max_project_bytes', 'reason': f"project byte budget of {self.max_project_bytes} bytes exhausted"}
+
+        with (io.BytesIO(data) if data is not None else open(file_path, 'rb')) as f_in:
+            prefix = f_in.read(self.sniff_bytes)
+            if b'\x00' in prefix:
+                raise BinaryContentError("binary content (NUL bytes)")
+            prefix_text = decode_prefix(prefix)
+
+            if self.skip_minified and self.is_minified(prefix_text, size):
+                return self.hashed(f_in, prefix, prefix_text, 'minified', "minified content")
+
+            if self.max_file_bytes and size > self.max_file_bytes:
+                reason = f"{size} bytes exceeds the {self.max_file_bytes} byte limit"
+                if self.oversize == 'hash':
+                    return self.hashed(f_in, prefix, prefix_text, 'max_file_bytes', reason)
+                data = prefix + f_in.read(max(self.max_file_bytes - len(prefix), 0))
+                data = data[:self.max_file_bytes]
+                cut = data.rfind(b'\n')
+                if cut > 0:
+                    data = data[:cut + 1]
+                content = normalize_newlines(decode_prefix(data))
+                return content, {'status': 'truncated', 'rule': 'max_file_bytes', 'reason': reason, 'kept_bytes': len(data)}
+
+            data = prefix + f_in.read()
+        return normalize_newlines(data.decode('utf-8')), None
+
+    def hashed(self, f_in, prefix, prefix_text, rule, reason):
+        # Streams the rest of the file through SHA-1; only the prefix text is
+        # returned so imports at the top of the file are still found
+        digest = hashlib.sha1(prefix)
+        newlines = prefix.count(b'\n')
+        for block in iter(lambda: f_in.read(1024 * 1024), b''):
+            digest.update(block)
+            newlines += block.count(b'\n')
+        return normalize_newlines(prefix_text), {'status': 'hashed', 'rule': rule, 'reason': reason, 'sha1': digest.hexdigest(), 'newlines': newlines}
@@ -0,0 +1,250 @@
+import os
+import json
+import argparse
+from functools import lru_cache
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = None
+    sparse = None
+
+VOCABULARY_VERSION = 1
+# Vocabulary shared by every matrix tech_report.py writes, in its working directory
+DEFAULT_VOCABULARY_FILE = 'library_vocabulary.json'
+# Imports of a library that count as full use of it when scoring; fewer count on a log scale
+DEFAULT_SATURATION = 20
+# First segments of reverse-domain package names (Java, Kotlin, Scala...), which keep two segments
+REVERSE_DOMAIN_PREFIXES = {'com', 'org', 'net', 'io', 'edu', 'gov', 'co', 'dev', 'me', 'uk', 'de', 'fr', 'ai'}
+
+
+def require_numpy():
+    if np is None:
+        raise ValueError("Library matrices require numpy and scipy (pip install numpy scipy)")
+
+
+@lru_cache(maxsize=None)
+def normalize_import(name):
+    # Library an import name belongs to, lowercased, or None for relative imports:
+    # os.path -> os, org.springframework.boot.SpringApplication -> org.springframework,
+    # @angular/core/testing -> @angular/core, github.com/user/repo/pkg -> github.com/user/repo,
+    # boost/asio.hpp -> boost, Symfony\Component\Yaml -> symfony, Data::Dumper -> data
+    name = name.strip().lower()
+    if not name or name.startswith('.'):
+        return None
+    for separator in ('\\', '::'):
+        if separator in name:
+            return name.split(separator)[0] or None
+    if '/' in name:
+        parts = name.split('/')
+        if parts[0].startswith('@'):
+            return '/'.join(parts[:2])
+        if '.' in parts[0]:
+            return '/'.join(parts[:3])
+        return parts[0]
+    parts = name.split('.')
+    if parts[0] in REVERSE_DOMAIN_PREFIXES and len(parts) > 1:
+        return '.'.join(parts[:2])
+    return parts[0]
+
+
+class LibraryVocabulary:
+    # Persistent, append-only mapping of normalized library names to matrix
+    # columns. Columns never move, so a matrix saved by an earlier run stays
+    # valid and only needs padding to the current vocabulary size.
+
+    def __init__(self, path=None):
+        self.path = path
+        self.libraries = []
+        self.columns = {}
+        self.added = 0
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != VOCABULARY_VERSION:
+                raise ValueError(f"{path} is a version {data.get('version')} vocabulary, expected {VOCABULARY_VERSION}")
+            self.libraries = data['libraries']
+            self.columns = {library: column for column, library in enumerate(self.libraries)}
+
+    def __len__(self):
+        return len(self.libraries)
+
+    def column(self, library, add=True):
+        column = self.columns.get(library)
+        if column is None and add:
+            column = self.columns[library] = len(self.libraries)
+            self.libraries.append(library)
+            self.added += 1
+        return column
+
+    def save(self):
+        if not self.path or not self.added:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': VOCABULARY_VERSION, 'libraries': self.libraries}, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+        self.added = 0
+
+
+class LibraryMatrix:
+    # Sparse rows x libraries matrix of import counts (rows are repositories or
+    # users). Counts of imports that normalize to the same library are summed.
+    # Scoring works on the whole matrix at once: every row is matched against
+    # every job spec with one sparse product, with no loop over rows.
+
+    def __init__(self, rows, matrix, vocabulary):
+        require_numpy()
+        self.rows = list(rows)
+        self.vocabulary = vocabulary
+        self.matrix = sparse.csr_matrix(matrix, dtype=np.float64)
+        # A vocabulary that grew since the matrix was built only adds empty columns
+        if self.matrix.shape[1] < len(vocabulary):
+            self.matrix.resize((self.matrix.shape[0], len(vocabulary)))
+
+    @classmethod
+    def from_counts(cls, rows, vocabulary, exclude_substrings=()):
+        # rows is an iterable of (row name, {import name: count})
+        require_numpy()
+        names = []
+        row_indices = []
+        columns = []
+        counts = []
+        for row, imports in rows:
+            for name, count in imports.items():
+                if any(substring in name for substring in exclude_substrings):
+                    continue
+                library = normalize_import(name)
+                if library is None or count <= 0:
+                    continue
+                row_indices.append(len(names))
+                columns.append(vocabulary.column(library))
+                counts.append(count)
+            names.append(row)
+        matrix = sparse.coo_matrix(
+            (np.asarray(counts, dtype=np.float64), (np.asarray(row_indices, dtype=np.int64), np.asarray(columns, dtype=np.int64))),
+            shape=(len(names), len(vocabulary)),
+        ).tocsr()
+        # coo -> csr sums the duplicates left by normalization (os and os.path in one repo)
+        matrix.sum_duplicates()
+        return cls(names, matrix, vocabulary)
+
+    def group(self, groups):
+        # groups maps a new row name (e.g. a user) to the rows it adds up (their
+        # repositories); returns the grouped matrix, built as one sparse product
+        positions = {row: position for position, row in enumerate(self.rows)}
+        names = []
+        group_indices = []
+        members = []
+        for name, rows in groups.items():
+            for row in rows:
+                if row in positions:
+                    group_indices.append(len(names))
+                    members.append(positions[row])
+            names.append(name)
+        indicator = sparse.csr_matrix(
+            (np.ones(len(members)), (np.asarray(group_indices, dtype=np.int64), np.asarray(members, dtype=np.int64))),
+            shape=(len(names), len(self.rows)),
+        )
+        return LibraryMatrix(names, indicator @ self.matrix, self.vocabulary)
+
+    def spec_weights(self, specs):
+        # specs maps a spec name to {library: weight} (or a list of libraries, weight 1).
+        # Returns the names, a libraries x specs weight matrix and every spec's total
+        # weight. Libraries nobody imports still count towards the total.
+        names = list(specs)
+        spec_indices = []
+        columns = []
+        weights = []
+        totals = np.zeros(len(names))
+        for position, name in enumerate(names):
+            libraries = specs[name]
+            if not isinstance(libraries, dict):
+                libraries = {library: 1 for library in libraries}
+            merged = {}
+            for library, weight in libraries.items():
+                if weight <= 0:
+                    raise ValueError(f"Job spec {name}: weight of {library} must be positive")
+                normalized = normalize_import(library)
+                if normalized is not None:
+                    merged[normalized] = merged.get(normalized, 0) + weight
+            for library, weight in merged.items():
+                totals[position] += weight
+                column = self.vocabulary.column(library, add=False)
+                if column is not None:
+                    spec_indices.append(position)
+                    columns.append(column)
+                    weights.append(weight)
+        matrix = sparse.csc_matrix(
+            (np.asarray(weights, dtype=np.float64), (np.asarray(columns, dtype=np.int64), np.asarray(spec_indices, dtype=np.int64))),
+            shape=(self.matrix.shape[1], len(names)),
+        )
+        return names, matrix, totals
+
+    def score(self, specs, saturation=DEFAULT_SATURATION):
+        # rows x specs array of weighted coverage in [0, 1]: each spec library adds
+        # its weight times log1p(imports) / log1p(saturation), capped at 1
+        names, weights, totals = self.spec_weights(specs)
+        evidence = self.matrix.copy()
+        evidence.data = np.minimum(np.log1p(evidence.data) / np.log1p(saturation), 1.0)
+        scores = np.asarray((evidence @ weights).todense())
+        return names, scores / np.where(totals > 0, totals, 1.0)
+
+    def rank(self, specs, top_k=10, saturation=DEFAULT_SATURATION):
+        # {spec name: [{'name': row, 'score': score}, ...]} with each spec's top_k rows, best
+        # first; rows that import none of a spec's libraries are left out
+        names, scores = self.score(specs, saturation)
+        top_k = min(top_k or len(self.rows), len(self.rows))
+        if not top_k:
+            return {name: [] for name in names}
+        top = np.argpartition(-scores, top_k - 1, axis=0)[:top_k]
+        ranked = {}
+        for position, name in enumerate(names):
+            best = top[:, position][np.argsort(-scores[top[:, position], position], kind='stable')]
+            ranked[name] = [{'name': self.rows[row], 'score': round(float(scores[row, position]), 4)}
+                            for row in best if scores[row, position] > 0]
+        return ranked
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        matrix = self.matrix.tocsr()
+        # np.savez adds .npz to names without it, so the temporary file keeps the suffix
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(tmp_path, data=matrix.data, indices=matrix.indices, indptr=matrix.indptr,
+                            shape=np.asarray(matrix.shape), rows=np.asarray(self.rows, dtype=str))
+        os.replace(tmp_path, path)
+        self.vocabulary.save()
+        print(f"Library matrix ({matrix.shape[0]} rows x {matrix.shape[1]} libraries, {matrix.nnz} non-zero) saved in {path}")
+
+    @classmethod
+    def load(cls, path, vocabulary):
+        require_numpy()
+        with np.load(path, allow_pickle=False) as data:
+            matrix = sparse.csr_matrix((data['data'], data['indices'], data['indptr']), shape=tuple(data['shape']))
+            rows = [str(row) for row in data['rows']]
+        return cls(rows, matrix, vocabulary)
+
+
+def load_job_specs(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank the rows of a saved library matrix against job specs.")
+    parser.add_argument("matrix", help="Library matrix (.npz) written by tech_report.py")
+    parser.add_argument("specs", help="JSON file mapping each job spec to {library: weight} or a list of libraries")
+    parser.add_argument("--vocabulary", default=DEFAULT_VOCABULARY_FILE, help="Library vocabulary the matrix was built with")
+    parser.add_argument("--top", type=int, default=10, help="Rows listed per job spec")
+    parser.add_argument("--saturation", type=int, default=DEFAULT_SATURATION, help="Imports of a library that count as full use of it")
+    args = parser.parse_args()
+
+    vocabulary = LibraryVocabulary(args.vocabulary)
+    ranking = LibraryMatrix.load(args.matrix, vocabulary).rank(load_job_specs(args.specs), args.top, args.saturation)
+    print(json.dumps(ranking, indent=4))
@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import threading
+from datetime import datetime
+
+PROMETHEUS_PREFIX = "code_snapshot"
+
+
+class NullTimer:
+    # Shared no-op context manager handed out while metrics are disabled
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_TIMER = NullTimer()
+
+
+class PhaseTimer:
+    def __init__(self, metrics, phase, project):
+        self.metrics = metrics
+        self.phase = phase
+        self.project = project
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.add_time(self.phase, time.perf_counter() - self.started, self.project)
+        return False
+
+
+class Metrics:
+    # Timers, counters and bytes read/written per (phase, project). Everything
+    # is a no-op until enable() is called: timer() returns a shared null context
+    # manager and the other methods return before taking the lock, so leaving
+    # the calls in hot paths costs next to nothing.
+
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.started_at = None
+        self.started = None
+
+    def enable(self):
+        self.enabled = True
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+        self.started = time.perf_counter()
+
+    def entry(self, phase, project):
+        key = (phase, project or '')
+        entry = self.stats.get(key)
+        if entry is None:
+            entry = self.stats[key] = {'seconds': 0.0, 'calls': 0, 'bytes_read': 0, 'bytes_written': 0, 'counters': {}}
+        return entry
+
+    def timer(self, phase, project=None):
+        if not self.enabled:
+            return NULL_TIMER
+        return PhaseTimer(self, phase, project)
+
+    def add_time(self, phase, seconds, project=None):
+        if not self.enabled:
+            return
+        with self.lock:
+            entry = self.entry(phase, project)
+            entry['seconds'] += seconds
+            entry['calls'] += 1
+
+    def add_bytes(self, phase, read=0, written=0, project=None):
+        if not self.enabled:
+            return
+        with self.lock:
+            entry = self.entry(phase, project)
+            entry['bytes_read'] += read
+            entry['bytes_written'] += written
+
+    def count(self, phase, name, value=1, project=None):
+        if not self.enabled:
+            return
+        with self.lock:
+            counters = self.entry(phase, project)['counters']
+            counters[name] = counters.get(name, 0) + value
+
+    def timed_iter(self, phase, iterable, project=None):
+        # Charges the time spent producing each item (e.g. a directory walk that
+        # feeds a pipeline) to `phase`, excluding the consumer's time
+        if not self.enabled:
+            return iterable
+        return self._timed_iter(phase, iterable, project)
+
+    def _timed_iter(self, phase, iterable, project):
+        iterator = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_time(phase, time.perf_counter() - started, project)
+                return
+            self.add_time(phase, time.perf_counter() - started, project)
+            yield item
+
+    def summary(self):
+        with self.lock:
+            phases = [
+                {'phase': phase, 'project': project, **{key: value for key, value in entry.items()}}
+                for (phase, project), entry in sorted(self.stats.items())
+            ]
+        return {
+            'started_at': self.started_at,
+            'duration_seconds': time.perf_counter() - self.started if self.started is not None else 0.0,
+            'phases': phases,
+        }
+
+    def write_json(self, path):
+        write_atomically(path, json.dumps(self.summary(), indent=4))
+        print(f"Metrics saved in {path}")
+
+    def write_prometheus(self, path):
+        # Textfile collector format; the file is replaced atomically so the node
+        # exporter never scrapes a half-written file
+        summary = self.summary()
+        families = {
+            'phase_seconds_total': ('counter', "Wall time spent in each phase", 'seconds'),
+            'phase_calls_total': ('counter', "Number of times each phase ran", 'calls'),
+            'phase_bytes_read_total': ('counter', "Bytes read in each phase", 'bytes_read'),
+            'phase_bytes_written_total': ('counter', "Bytes written in each phase", 'bytes_written'),
+        }
+        lines = []
+        for name, (kind, help_text, key) in families.items():
+            lines.append(f"# HELP {PROMETHEUS_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name} {kind}")
+            for phase in summary['phases']:
+                labels = prometheus_labels(phase=phase['phase'], project=phase['project'])
+                lines.append(f"{PROMETHEUS_PREFIX}_{name}{{{labels}}} {phase[key]}")
+
+        lines.append(f"# HELP {PROMETHEUS_PREFIX}_events_total Events counted in each phase")
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_events_total counter")
+        for phase in summary['phases']:
+            for event, value in sorted(phase['counters'].items()):
+                labels = prometheus_labels(phase=phase['phase'], project=phase['project'], event=event)
+                lines.append(f"{PROMETHEUS_PREFIX}_events_total{{{labels}}} {value}")
+
+        lines.append(f"# HELP {PROMETHEUS_PREFIX}_run_duration_seconds Duration of the last run")
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_run_duration_seconds gauge")
+        lines.append(f"{PROMETHEUS_PREFIX}_run_duration_seconds {summary['duration_seconds']}")
+        lines.append(f"# HELP {PROMETHEUS_PREFIX}_run_finished_timestamp_seconds Unix time the last run finished")
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_run_finished_timestamp_seconds gauge")
+        lines.append(f"{PROMETHEUS_PREFIX}_run_finished_timestamp_seconds {time.time():.0f}")
+        write_atomically(path, '\n'.join(lines) + '\n')
+        print(f"Prometheus metrics saved in {path}")
+
+    def export(self, json_path=None, prometheus_path=None):
+        if not self.enabled:
+            return
+        if json_path:
+            self.write_json(json_path)
+        if prometheus_path:
+            self.write_prometheus(prometheus_path)
+
+
+def prometheus_labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{key}="{escape(value)}"' for key, value in labels.items())
+
+
+def write_atomically(path, text):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+# Process-wide instance the modules report to; the CLIs enable it on request
+METRICS = Metrics()
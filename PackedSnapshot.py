@@ -0,0 +1,233 @@
+import os
+import json
+import argparse
+import mmap
+import shutil
+import struct
+from SnapshotWriter import SnapshotWriter, open_snapshot
+from ImportExtractor import find_imports
+
+# Layout of a packed snapshot:
+#   magic (8 bytes)
+#   section table: (offset, length) as little-endian uint64 for every name in SECTIONS
+#   meta, index, tree and imports sections (compact JSON)
+#   blobs section: the raw UTF-8 source of every file, back to back
+# Index entries hold each file's blob offset/length (relative to the blobs
+# section), its metadata and the imports found in it, so a reader can mmap the
+# file and pull out one source, the tree or the import table on its own.
+MAGIC = b'BBPACK01'
+SECTIONS = ('meta', 'index', 'tree', 'imports', 'blobs')
+SECTION_TABLE = struct.Struct('<' + 'QQ' * len(SECTIONS))
+PRELUDE_SIZE = len(MAGIC) + SECTION_TABLE.size
+PACKED_SUFFIX = '.pack'
+
+
+class PackedSnapshotWriter:
+    # Same begin/write_source/finish interface as SnapshotWriter. Blobs are
+    # streamed to a temporary file while the index is collected, then the
+    # header sections are written in front of them. The file always gets the
+    # .pack suffix (snapshot.json -> snapshot.pack), which is how readers tell
+    # it from JSON.
+
+    def __init__(self, output_file):
+        self.output_file = output_file
+        self.path = os.path.splitext(output_file)[0] + PACKED_SUFFIX
+        self.sources_written = 0
+        self.bytes_written = 0
+        self.project_name = None
+        self.entries = []
+        self._blob_file = f"{self.path}.blobs.tmp"
+        self._tmp_file = f"{self.path}.tmp"
+        self._blobs = None
+        self._blob_offset = 0
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+
+    def open(self):
+        self._blobs = open(self._blob_file, 'wb')
+        return self
+
+    def begin(self, project_name):
+        self.project_name = project_name
+
+    def write_source(self, source_data, imports=None):
+        metadata = dict(source_data['file'])
+        blob = metadata.pop('Source_Code').encode('utf-8')
+        self._blobs.write(blob)
+        self.entries.append({
+            'path': metadata['Relative Path'],
+            'offset': self._blob_offset,
+            'length': len(blob),
+            'file': metadata,
+            'imports': list(imports or []),
+        })
+        self._blob_offset += len(blob)
+        self.sources_written += 1
+
+    def finish(self, programming_language, tree, external_libraries, observations):
+        self._blobs.close()
+        self._blobs = None
+        meta = {
+            'project_name': self.project_name,
+            'programming_language': programming_language,
+            'observations': observations,
+            'file_count': len(self.entries),
+        }
+        sections = [
+            json.dumps(value, separators=(',', ':')).encode('utf-8')
+            for value in (meta, self.entries, tree, external_libraries)
+        ]
+
+        table = []
+        offset = PRELUDE_SIZE
+        for section in sections:
+            table.extend((offset, len(section)))
+            offset += len(section)
+        table.extend((offset, self._blob_offset))
+
+        with open(self._tmp_file, 'wb') as f_out:
+            f_out.write(MAGIC)
+            f_out.write(SECTION_TABLE.pack(*table))
+            for section in sections:
+                f_out.write(section)
+            with open(self._blob_file, 'rb') as blobs:
+                shutil.copyfileobj(blobs, f_out, 1024 * 1024)
+            self.bytes_written = f_out.tell()
+        os.remove(self._blob_file)
+        os.replace(self._tmp_file, self.path)
+
+    def abort(self):
+        if self._blobs is not None:
+            self._blobs.close()
+            self._blobs = None
+        for leftover in (self._blob_file, self._tmp_file):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+
+class PackedSnapshotReader:
+    # Random access to a packed snapshot through mmap. Each section is decoded
+    # only when first asked for, and sources are sliced straight out of the map.
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{path} is not a packed snapshot")
+        if self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a packed snapshot")
+        values = SECTION_TABLE.unpack_from(self._map, len(MAGIC))
+        self.sections = {name: (values[2 * i], values[2 * i + 1]) for i, name in enumerate(SECTIONS)}
+        self._cache = {}
+        self._by_path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def _section(self, name):
+        if name not in self._cache:
+            offset, length = self.sections[name]
+            self._cache[name] = json.loads(self._map[offset:offset + length])
+        return self._cache[name]
+
+    def meta(self):
+        return self._section('meta')
+
+    def tree(self):
+        return self._section('tree')
+
+    def imports(self):
+        return self._section('imports')
+
+    def files(self):
+        return self._section('index')
+
+    def paths(self):
+        return [entry['path'] for entry in self.files()]
+
+    def entry(self, relative_path):
+        if self._by_path is None:
+            self._by_path = {entry['path']: entry for entry in self.files()}
+        return self._by_path[relative_path]
+
+    def source_bytes(self, relative_path):
+        entry = self.entry(relative_path)
+        start = self.sections['blobs'][0] + entry['offset']
+        return self._map[start:start + entry['length']]
+
+    def source(self, relative_path):
+        return self.source_bytes(relative_path).decode('utf-8')
+
+    def source_record(self, entry):
+        start = self.sections['blobs'][0] + entry['offset']
+        file_data = dict(entry['file'])
+        file_data['Source_Code'] = self._map[start:start + entry['length']].decode('utf-8')
+        return {'file': file_data}
+
+    def to_dict(self):
+        meta = self.meta()
+        return {
+            'project_name': meta['project_name'],
+            'programming_language': meta['programming_language'],
+            'project_tree_structure': self.tree(),
+            'project_sources': [self.source_record(entry) for entry in self.files()],
+            'external_libraries': self.imports(),
+            'observations': meta['observations'],
+        }
+
+
+def json_to_packed(json_path, packed_path):
+    # Per-file imports are not part of the JSON schema, so they are re-extracted here
+    with open_snapshot(json_path) as f:
+        data = json.load(f)
+    with PackedSnapshotWriter(packed_path) as writer:
+        writer.begin(data['project_name'])
+        for source_data in data['project_sources']:
+            file_data = source_data['file']
+            imports = find_imports(file_data['Source_Code'], os.path.splitext(file_data['File'])[1])
+            writer.write_source(source_data, imports)
+        writer.finish(data['programming_language'], data['project_tree_structure'], data['external_libraries'], data['observations'])
+    return writer.path
+
+
+def packed_to_json(packed_path, json_path, compact=False, compression=None):
+    with PackedSnapshotReader(packed_path) as reader:
+        meta = reader.meta()
+        with SnapshotWriter(json_path, compact=compact, compression=compression) as writer:
+            writer.begin(meta['project_name'])
+            for entry in reader.files():
+                writer.write_source(reader.source_record(entry))
+            writer.finish(meta['programming_language'], reader.tree(), reader.imports(), meta['observations'])
+    return writer.path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert snapshots between the JSON and packed formats.")
+    parser.add_argument("input", help="Snapshot to convert (.pack, .json, .json.gz or .json.zst)")
+    parser.add_argument("output", help="Converted snapshot")
+    parser.add_argument("--compact", type=int, choices=[0, 1], default=0, help="Write compact JSON when unpacking (0 or 1)")
+    args = parser.parse_args()
+
+    if args.input.endswith(PACKED_SUFFIX):
+        print(f"Converted to JSON: {packed_to_json(args.input, args.output, compact=args.compact)}")
+    else:
+        print(f"Converted to packed snapshot: {json_to_packed(args.input, args.output)}")
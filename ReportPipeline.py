@@ -0,0 +1,152 @@
+import os
+import time
+import queue
+import threading
+from Metrics import METRICS
+
+
+class ImportAggregator:
+    # In-memory version of SnapshotCatalog.aggregate_imports: every repo adds
+    # its language and import counts as soon as it has been snapshotted, and
+    # summary() returns the same per-language structure as the catalog query.
+
+    def __init__(self, exclude_substrings=()):
+        self.exclude_substrings = list(exclude_substrings)
+        self.lock = threading.Lock()
+        self.repos = {}
+
+    def add(self, repo, programming_language, imports):
+        # imports maps import name -> count; adding a repo again replaces it
+        with self.lock:
+            self.repos[repo] = ((programming_language or '').lower(), dict(imports))
+
+    def import_counts(self):
+        # {repo: {import_name: count}}, e.g. for LibraryMatrix.from_counts
+        with self.lock:
+            return {repo: imports for repo, (language, imports) in self.repos.items()}
+
+    def is_excluded(self, name):
+        return any(substring in name for substring in self.exclude_substrings)
+
+    def summary(self, top_n=None):
+        with self.lock:
+            repos = list(self.repos.values())
+        totals = {}
+        repo_counts = {}
+        for language, imports in repos:
+            if not language:
+                continue
+            repo_counts[language] = repo_counts.get(language, 0) + 1
+            language_totals = totals.setdefault(language, {})
+            for name, count in imports.items():
+                if not self.is_excluded(name):
+                    language_totals[name] = language_totals.get(name, 0) + count
+
+        overall_data = []
+        for language in sorted(repo_counts):
+            ranked = sorted(totals[language].items(), key=lambda item: (-item[1], item[0]))
+            if top_n is not None:
+                ranked = ranked[:top_n]
+            if ranked:
+                overall_data.append({
+                    'programming_language': language,
+                    'libraries_used': [{'library_name': name, 'times_imported': count} for name, count in ranked],
+                    'file_count': repo_counts[language],
+                })
+        overall_data.sort(key=lambda x: x['file_count'], reverse=True)
+        return overall_data
+
+
+class ReportPipeline:
+    # clone -> snapshot -> aggregate, with every stage running at once. Clone
+    # threads hand each finished repo to the snapshot threads through a
+    # bounded queue (so cloning stops running ahead when snapshotting falls
+    # behind), and each snapshot's import counts go straight into the
+    # aggregator. A repo that fails at any stage is recorded in `errors` and
+    # the others carry on.
+
+    def __init__(self, clone_repo, snapshot_repo, aggregator, clone_workers=1, snapshot_workers=1, queue_size=None):
+        # clone_repo(url) returns a GitHubBatchCloner result dict; snapshot_repo(result)
+        # returns (programming_language, {import_name: count}), or None to leave the repo out
+        self.clone_repo = clone_repo
+        self.snapshot_repo = snapshot_repo
+        self.aggregator = aggregator
+        self.clone_workers = max(clone_workers or 1, 1)
+        self.snapshot_workers = max(snapshot_workers or 1, 1)
+        self.queue_size = queue_size or 2 * self.snapshot_workers
+        self.lock = threading.Lock()
+        self.clone_results = []
+        self.snapshotted = 0
+        self.errors = []
+
+    def error(self, repo, stage, message):
+        print(f"Pipeline: {stage} failed for {repo}: {message}")
+        with self.lock:
+            self.errors.append({'repo': repo, 'stage': stage, 'error': str(message)})
+        METRICS.count('pipeline', f"{stage}_errors")
+
+    def clone_worker(self, urls, cloned):
+        while True:
+            try:
+                url = urls.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                result = self.clone_repo(url)
+            except Exception as e:
+                self.error(url, 'clone', e)
+                continue
+            with self.lock:
+                self.clone_results.append(result)
+            # A failed pull still leaves the previous checkout to snapshot
+            if result['status'] == 'failed' and not os.path.isdir(result['path']):
+                self.error(result['repo'], 'clone', result['error'])
+                continue
+            started = time.perf_counter()
+            cloned.put(result)
+            METRICS.add_time('pipeline_backpressure', time.perf_counter() - started)
+
+    def snapshot_worker(self, cloned):
+        while True:
+            result = cloned.get()
+            if result is None:
+                return
+            try:
+                with METRICS.timer('snapshot', result['repo']):
+                    snapshot = self.snapshot_repo(result)
+            except Exception as e:
+                self.error(result['repo'], 'snapshot', e)
+                continue
+            if snapshot is None:
+                continue
+            programming_language, imports = snapshot
+            self.aggregator.add(result['repo'], programming_language, imports)
+            with self.lock:
+                self.snapshotted += 1
+
+    def run(self, clone_urls):
+        started = time.perf_counter()
+        urls = queue.Queue()
+        for url in clone_urls:
+            urls.put(url)
+        cloned = queue.Queue(maxsize=self.queue_size)
+
+        snapshot_threads = [threading.Thread(target=self.snapshot_worker, args=(cloned,)) for _ in range(self.snapshot_workers)]
+        clone_threads = [threading.Thread(target=self.clone_worker, args=(urls, cloned)) for _ in range(self.clone_workers)]
+        for thread in snapshot_threads + clone_threads:
+            thread.start()
+        for thread in clone_threads:
+            thread.join()
+        # One stop marker per snapshot thread, queued behind the last repo
+        for _ in snapshot_threads:
+            cloned.put(None)
+        for thread in snapshot_threads:
+            thread.join()
+
+        statuses = {}
+        for result in self.clone_results:
+            statuses[result['status']] = statuses.get(result['status'], 0) + 1
+        summary = ', '.join(f"{count} {status}" for status, count in sorted(statuses.items()))
+        print(f"Pipeline: {len(self.clone_results)} repositories processed ({summary}), {self.snapshotted} snapshotted, "
+              f"{len(self.errors)} errors in {time.perf_counter() - started:.1f}s")
+        return self.clone_results
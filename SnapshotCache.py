@@ -0,0 +1,82 @@
+import os
+import json
+
+CACHE_VERSION = 2
+
+
+class SnapshotCache:
+    # Persistent per-file cache for a project's snapshots. Each entry records the
+    # file's size/mtime (and optionally a content hash) together with its line
+    # count and extracted imports, so unchanged files skip decoding and the
+    # import regexes on the next run. The project fingerprint lets callers skip
+    # a project entirely when nothing changed since the last snapshot.
+
+    def __init__(self, cache_file, settings=None):
+        self.cache_file = cache_file
+        self.settings = settings
+        self.entries = {}
+        self.fingerprint = None
+        self.snapshot_dir = None
+        self.new_entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable snapshot cache {self.cache_file}: {e}")
+            return
+        # Entries computed with other settings (or an older format) are not reusable
+        if data.get('version') != CACHE_VERSION or data.get('settings') != self.settings:
+            return
+        self.entries = data.get('files', {})
+        self.fingerprint = data.get('fingerprint')
+        self.snapshot_dir = data.get('snapshot_dir')
+
+    def get(self, relative_path):
+        return self.entries.get(relative_path)
+
+    def record(self, relative_path, entry):
+        self.new_entries[relative_path] = entry
+        cached = self.entries.get(relative_path)
+        hit = cached is not None and (
+            (cached['size'] == entry['size'] and cached['mtime_ns'] == entry['mtime_ns'])
+            or ('sha1' in entry and cached.get('sha1') == entry['sha1'])
+            or ('oid' in entry and cached.get('oid') == entry['oid'])
+        )
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def is_current(self, fingerprint):
+        return (
+            self.fingerprint is not None
+            and self.fingerprint == fingerprint
+            and self.snapshot_dir is not None
+            and os.path.isdir(self.snapshot_dir)
+        )
+
+    def save(self, fingerprint, snapshot_dir):
+        # Only files seen in this run are kept, so deleted files drop out of the cache
+        self.entries = self.new_entries
+        self.new_entries = {}
+        self.fingerprint = fingerprint
+        self.snapshot_dir = snapshot_dir
+        data = {
+            'version': CACHE_VERSION,
+            'settings': self.settings,
+            'fingerprint': fingerprint,
+            'snapshot_dir': snapshot_dir,
+            'files': self.entries,
+        }
+        os.makedirs(os.path.dirname(self.cache_file) or '.', exist_ok=True)
+        tmp_file = f"{self.cache_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_file, self.cache_file)
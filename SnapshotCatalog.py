@@ -0,0 +1,237 @@
+import os
+import json
+import sqlite3
+from datetime import datetime
+from SnapshotWriter import open_snapshot
+from PackedSnapshot import PackedSnapshotReader
+
+CATALOG_FILENAME = "catalog.db"
+SNAPSHOT_SUFFIXES = (".json", ".json.gz", ".json.zst", ".pack")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS repos (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    root_dir TEXT,
+    latest_snapshot_id INTEGER
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    repo_id INTEGER NOT NULL REFERENCES repos(id),
+    snapshot_dir TEXT NOT NULL UNIQUE,
+    snapshot_file TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    programming_language TEXT NOT NULL,
+    file_count INTEGER NOT NULL,
+    total_lines INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_by_repo ON snapshots (repo_id, created_at);
+CREATE TABLE IF NOT EXISTS files (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots(id),
+    path TEXT NOT NULL,
+    size INTEGER,
+    lines INTEGER,
+    PRIMARY KEY (snapshot_id, path)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS imports (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots(id),
+    import_name TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (snapshot_id, import_name)
+) WITHOUT ROWID;
+"""
+
+
+def find_snapshot_file(snapshot_dir):
+    # The snapshot itself, which splitting moves into a *_parts directory next to its parts
+    for root, dirs, files in os.walk(snapshot_dir):
+        dirs.sort()
+        for file in sorted(files):
+            if file.endswith(SNAPSHOT_SUFFIXES):
+                return os.path.join(root, file)
+    return None
+
+
+def snapshot_time(name, snapshot_file):
+    # tech_report names snapshot directories after the time they were taken
+    try:
+        taken = datetime.strptime(name, "%Y%m%d%H%M")
+    except ValueError:
+        taken = datetime.fromtimestamp(os.path.getmtime(snapshot_file))
+    return taken.isoformat(timespec='seconds')
+
+
+def read_snapshot_summary(snapshot_file):
+    if snapshot_file.endswith(".pack"):
+        with PackedSnapshotReader(snapshot_file) as reader:
+            meta = reader.meta()
+            files = [(entry['path'], entry['file'].get('Size'), entry['file'].get('Lines')) for entry in reader.files()]
+            return meta['project_name'], meta['programming_language'], files, reader.imports()
+    with open_snapshot(snapshot_file) as f:
+        data = json.load(f)
+    files = [
+        (source['file']['Relative Path'], source['file'].get('Size'), source['file'].get('Lines'))
+        for source in data.get('project_sources', [])
+    ]
+    return data.get('project_name'), data.get('programming_language', ''), files, data.get('external_libraries', [])
+
+
+class SnapshotCatalog:
+    # SQLite index of every snapshot taken: one row per repo, per snapshot, per
+    # file and per (snapshot, import). Each repo points at its latest snapshot,
+    # so reports aggregate with a single indexed query instead of re-reading
+    # every snapshot document that has piled up under snapshots/.
+
+    def __init__(self, catalog_file):
+        self.catalog_file = catalog_file
+        directory = os.path.dirname(catalog_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(catalog_file, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def has_snapshot(self, snapshot_dir):
+        row = self.connection.execute(
+            "SELECT 1 FROM snapshots WHERE snapshot_dir = ?", (os.path.abspath(snapshot_dir),)
+        ).fetchone()
+        return row is not None
+
+    def record_snapshot(self, project_name, snapshot_file, programming_language, files, external_libraries, root_dir=None, snapshot_dir=None, created_at=None):
+        # files holds (relative_path, size, lines) tuples. Recording the same
+        # snapshot directory again replaces what was stored for it.
+        snapshot_dir = os.path.abspath(snapshot_dir or os.path.dirname(snapshot_file))
+        created_at = created_at or datetime.now().isoformat(timespec='seconds')
+        imports = {}
+        for lib in external_libraries:
+            if isinstance(lib, dict) and 'import_name' in lib and 'count' in lib:
+                imports[lib['import_name']] = imports.get(lib['import_name'], 0) + lib['count']
+            else:
+                print(f"Skipping malformed library entry in snapshot {snapshot_dir}: {lib}")
+
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO repos (name, root_dir) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET root_dir = COALESCE(excluded.root_dir, repos.root_dir)",
+                (project_name, root_dir),
+            )
+            repo_id = self.connection.execute("SELECT id FROM repos WHERE name = ?", (project_name,)).fetchone()[0]
+            self.delete_snapshot(snapshot_dir)
+
+            snapshot_id = self.connection.execute(
+                "INSERT INTO snapshots (repo_id, snapshot_dir, snapshot_file, created_at, programming_language, file_count, total_lines) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (repo_id, snapshot_dir, os.path.abspath(snapshot_file), created_at, (programming_language or '').lower(),
+                 len(files), sum(lines or 0 for _, _, lines in files)),
+            ).lastrowid
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO files (snapshot_id, path, size, lines) VALUES (?, ?, ?, ?)",
+                [(snapshot_id, path, size, lines) for path, size, lines in files],
+            )
+            self.connection.executemany(
+                "INSERT INTO imports (snapshot_id, import_name, count) VALUES (?, ?, ?)",
+                [(snapshot_id, name, count) for name, count in imports.items()],
+            )
+            self.update_latest(repo_id)
+        return snapshot_id
+
+    def delete_snapshot(self, snapshot_dir):
+        row = self.connection.execute("SELECT id, repo_id FROM snapshots WHERE snapshot_dir = ?", (snapshot_dir,)).fetchone()
+        if row is None:
+            return
+        for table in ("files", "imports"):
+            self.connection.execute(f"DELETE FROM {table} WHERE snapshot_id = ?", (row[0],))
+        self.connection.execute("DELETE FROM snapshots WHERE id = ?", (row[0],))
+        self.update_latest(row[1])
+
+    def update_latest(self, repo_id):
+        self.connection.execute(
+            "UPDATE repos SET latest_snapshot_id = ("
+            "SELECT id FROM snapshots WHERE repo_id = ? ORDER BY created_at DESC, id DESC LIMIT 1"
+            ") WHERE id = ?",
+            (repo_id, repo_id),
+        )
+
+    def sync(self, snapshots_dir):
+        # Catalog snapshots written before the catalog existed (or by runs without
+        # it). Only directories the catalog has not seen are opened, so this is a
+        # directory listing once everything is cataloged.
+        added = 0
+        if not os.path.isdir(snapshots_dir):
+            return added
+        for project in sorted(os.listdir(snapshots_dir)):
+            project_dir = os.path.join(snapshots_dir, project)
+            if not os.path.isdir(project_dir):
+                continue
+            for entry in sorted(os.listdir(project_dir)):
+                snapshot_dir = os.path.join(project_dir, entry)
+                if not os.path.isdir(snapshot_dir) or self.has_snapshot(snapshot_dir):
+                    continue
+                snapshot_file = find_snapshot_file(snapshot_dir)
+                if snapshot_file is None:
+                    continue
+                try:
+                    project_name, programming_language, files, external_libraries = read_snapshot_summary(snapshot_file)
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"Skipping unreadable snapshot {snapshot_dir}: {e}")
+                    continue
+                created_at = snapshot_time(entry, snapshot_file)
+                self.record_snapshot(project_name or project, snapshot_file, programming_language, files, external_libraries,
+                                     snapshot_dir=snapshot_dir, created_at=created_at)
+                added += 1
+        if added:
+            print(f"Cataloged {added} existing snapshots from {snapshots_dir}")
+        return added
+
+    def latest_imports(self, project_name):
+        # (programming_language, {import_name: count}) of a repo's latest snapshot, or None
+        row = self.connection.execute(
+            "SELECT s.id, s.programming_language FROM repos r JOIN snapshots s ON s.id = r.latest_snapshot_id WHERE r.name = ?",
+            (project_name,),
+        ).fetchone()
+        if row is None:
+            return None
+        imports = self.connection.execute("SELECT import_name, count FROM imports WHERE snapshot_id = ?", (row[0],)).fetchall()
+        return row[1], dict(imports)
+
+    def aggregate_imports(self, exclude_substrings=(), top_n=None):
+        # Same shape as tech_report's overall summary, computed from the latest
+        # snapshot of every repo: file_count is the number of repos per language
+        # and libraries_used holds each language's top_n imports (all when None).
+        exclusions = ''.join(" AND instr(i.import_name, ?) = 0" for _ in exclude_substrings)
+        rows = self.connection.execute(
+            "SELECT programming_language, import_name, total FROM ("
+            " SELECT s.programming_language, i.import_name, SUM(i.count) AS total,"
+            " ROW_NUMBER() OVER (PARTITION BY s.programming_language ORDER BY SUM(i.count) DESC, i.import_name) AS rank"
+            " FROM repos r JOIN snapshots s ON s.id = r.latest_snapshot_id JOIN imports i ON i.snapshot_id = s.id"
+            f" WHERE s.programming_language != ''{exclusions}"
+            " GROUP BY s.programming_language, i.import_name"
+            ") WHERE ? IS NULL OR rank <= ? ORDER BY programming_language, rank",
+            (*exclude_substrings, top_n, top_n),
+        ).fetchall()
+        counts = self.connection.execute(
+            "SELECT s.programming_language, COUNT(*) FROM repos r JOIN snapshots s ON s.id = r.latest_snapshot_id"
+            " WHERE s.programming_language != '' GROUP BY s.programming_language"
+        ).fetchall()
+
+        libraries = {}
+        for lang, name, total in rows:
+            libraries.setdefault(lang, []).append({'library_name': name, 'times_imported': total})
+        overall_data = [
+            {'programming_language': lang, 'libraries_used': libraries[lang], 'file_count': count}
+            for lang, count in counts if lang in libraries
+        ]
+        overall_data.sort(key=lambda x: x['file_count'], reverse=True)
+        return overall_data
@@ -1,21 +1,182 @@
 import os
-import re
+import time
+import hashlib
 from datetime import datetime
 import json
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from SnapshotWriter import SnapshotWriter, DEFAULT_FRAME_SIZE
+from SnapshotSplitter import SnapshotSplitter
+from PackedSnapshot import PackedSnapshotWriter
+from SnapshotCache import SnapshotCache
+from SnapshotCatalog import SnapshotCatalog
+from ImportExtractor import find_imports, IMPORT_EXTRACTOR_VERSION
+from BlobStore import BlobStore
+from IngestionPolicy import IngestionPolicy, BinaryContentError, DEFAULT_MAX_FILE_BYTES
+from Metrics import METRICS
+from IgnoreMatcher import IgnoreMatcher, GITIGNORE_FILE, relative_child
+from GitObjectSource import GitObjectSource
+
+def build_source_record(root_dir, file_path, file, file_info, content, lines):
+    return {
+        'file': {
+            'File': file,
+            'Full Path': file_path,
+            'Relative Path': os.path.relpath(file_path, root_dir),
+            'Size': file_info.st_size,
+            'Last Modified': datetime.fromtimestamp(file_info.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
+            'Lines': lines,
+            'Source_Code': content
+        }
+    }
+
+
+class GitFileInfo:
+    # The stat fields build_source_record uses, for a file read from a git blob
+    def __init__(self, size, mtime):
+        self.st_size = size
+        self.st_mtime = mtime
+
+
+def same_file(cached, entry):
+    # Files read from git are identified by their blob id, files on disk by size and mtime
+    if 'oid' in entry:
+        return cached.get('oid') == entry['oid']
+    return cached['size'] == entry['size'] and cached['mtime_ns'] == entry['mtime_ns']
+
+
+def cache_answer(cached, entry, blob_store=None, over_budget=False):
+    # 'error' or 'blob' when the cache entry of an unchanged file answers for it
+    # without reading the file, None when it has to be read
+    if cached is None or cached.get('ingestion') == 'omitted' or not same_file(cached, entry):
+        return None
+    if cached.get('error'):
+        return 'error'
+    # With a blob store, an unchanged file whose blob is still stored is not read at all
+    if blob_store is not None and not over_budget and 'ingestion' not in cached and cached.get('blob') and blob_store.has(cached['blob']):
+        return 'blob'
+    return None
+
+
+def ingest_source_file(root_dir, root, file, cached=None, hash_files=False, full_import_scan=False, policy=None, over_budget=False, blob_store=None, timed=False, git_blob=None):
+    # Runs inside pool workers, so it only returns data:
+    # (source_data, imports, error message, cache entry).
+    # With timed set, the read and import scan times travel back in the entry
+    # under "timings", since process workers cannot report to METRICS themselves.
+    # git_blob ({'oid', 'size', 'mtime', 'data'}) stands in for the file on disk
+    # when snapshotting from git; data is None when cache_answer said it is not needed.
+    file_path = os.path.join(root, file)
+    policy = policy or IngestionPolicy()
+    entry = None
+    try:
+        if git_blob is None:
+            file_info = os.stat(file_path)
+            entry = {'size': file_info.st_size, 'mtime_ns': file_info.st_mtime_ns}
+        else:
+            file_info = GitFileInfo(git_blob['size'], git_blob['mtime'])
+            entry = {'size': git_blob['size'], 'mtime_ns': git_blob['mtime'] * 1000000000, 'oid': git_blob['oid']}
+        # A file left out only because of the project budget has nothing worth reusing
+        reusable = cached is not None and cached.get('ingestion') != 'omitted'
+        unchanged = reusable and same_file(cached, entry)
+        answer = cache_answer(cached, entry, blob_store, over_budget)
+        if answer == 'error':
+            return None, [], cached['error'], cached
+
+        if answer == 'blob':
+            source_data = build_source_record(root_dir, file_path, file, file_info, None, cached['lines'])
+            del source_data['file']['Source_Code']
+            source_data['file']['Source_Blob'] = cached['blob']
+            return source_data, cached['imports'], None, dict(cached)
+
+        started = time.perf_counter() if timed else 0.0
+        content, ingestion = policy.read(file_path, file_info.st_size, over_budget, git_blob['data'] if git_blob else None)
+        if timed:
+            read_done = time.perf_counter()
+            entry['timings'] = {'read': read_done - started, 'imports': 0.0}
+
+        if hash_files:
+            entry['sha1'] = ingestion['sha1'] if ingestion and 'sha1' in ingestion else hashlib.sha1(content.encode('utf-8')).hexdigest()
+            unchanged = unchanged or (reusable and cached.get('sha1') == entry['sha1'])
+
+        # Unchanged files reuse their cached line count and imports
+        if unchanged:
+            lines = cached['lines']
+            matches = cached['imports']
+        else:
+            lines = ingestion['newlines'] if ingestion and 'newlines' in ingestion else len(content.splitlines())
+            matches = find_imports(content, os.path.splitext(file)[1], full_import_scan)
+            if timed:
+                entry['timings']['imports'] = time.perf_counter() - read_done
+        entry['lines'] = lines
+        entry['imports'] = matches
+
+        # Hashed placeholders only read a prefix for the imports; none of the source is kept
+        source_data = build_source_record(root_dir, file_path, file, file_info, '' if ingestion and ingestion['status'] == 'hashed' else content, lines)
+        if ingestion:
+            source_data['file']['Ingestion'] = ingestion
+            entry['ingestion'] = ingestion['status']
+        if blob_store is not None:
+            entry['blob'] = blob_store.put(source_data['file'].pop('Source_Code'))
+            source_data['file']['Source_Blob'] = entry['blob']
+        return source_data, matches, None, entry
+    except (UnicodeDecodeError, BinaryContentError) as e:
+        error = f"Skipping file {file_path} due to decoding error: {e}"
+        skipped = 'binary'
+    except Exception as e:
+        error = f"Skipping file {file_path} due to an unexpected error: {e}"
+        skipped = 'unreadable'
+    if entry is not None:
+        entry['error'] = error
+        entry['skipped'] = skipped
+    return None, [], error, entry
+
 
 class SnapshotGenerator:
     def __init__(self, config):
         self.root_dir = config['root_dir']
         self.avoid_folders = config['avoid_folders']
+        # avoid_folders only ever named directories; ignore_patterns use .gitignore syntax for files and directories
+        self.ignore_patterns = config.get('ignore_patterns') or []
+        self.ignore = IgnoreMatcher(
+            [folder if folder.endswith('/') else folder + '/' for folder in self.avoid_folders] + self.ignore_patterns,
+            use_gitignore=config.get('use_gitignore', True),
+        )
         self.include_extensions = set(config['include_extensions'])
         self.key_files = config['key_files']
         self.output_file = config['output_file']
         self.compress = config['compress']
         self.amount_of_chunks = config['amount_of_chunks']
         self.size_of_chunk = config['size_of_chunk']
+        self.compact = config.get('compact', False)
+        self.output_format = config.get('output_format', 'json')
+        # Packed snapshots store raw blobs so they can be memory-mapped; compression only applies to JSON
+        self.compression = (config.get('compression') or 'auto') if self.compress and self.output_format == 'json' else None
+        # Keep frames no larger than a part so every part can hold at least one whole frame
+        self.frame_size = min(self.size_of_chunk or DEFAULT_FRAME_SIZE, DEFAULT_FRAME_SIZE)
+        self.snapshot_file = self.output_file
+        self.workers = config.get('workers', 1) or 1
+        self.worker_mode = config.get('worker_mode', 'thread')
+        self.hash_files = config.get('hash_files', False)
+        self.full_import_scan = config.get('full_import_scan', False)
+        self.policy = IngestionPolicy(
+            max_file_bytes=config.get('max_file_bytes', DEFAULT_MAX_FILE_BYTES),
+            max_project_bytes=config.get('max_project_bytes'),
+            oversize=config.get('oversize_policy', 'truncate'),
+            skip_minified=config.get('skip_minified', True),
+        )
+        self.project_bytes = 0
+        # Deduplicated snapshots reference their sources in a shared blob store (JSON format only)
+        self.blob_store = BlobStore(config['blob_store']) if config.get('blob_store') and self.output_format == 'json' else None
         self.imports = defaultdict(int)
-        self.project_name = os.path.basename(self.root_dir)
+        # With git_ref, root_dir is a repository (a bare or --no-checkout clone works) and the
+        # snapshot is read from that ref's tree and blobs instead of the files on disk
+        self.git_source = GitObjectSource(self.root_dir, config['git_ref']) if config.get('git_ref') else None
+        # path -> (blob id, size) of the files in the git tree, filled in by the walk
+        self.git_files = {}
+        default_name = os.path.basename(os.path.normpath(self.root_dir))
+        if self.git_source is not None and default_name.endswith('.git'):
+            default_name = default_name[:-len('.git')]
+        self.project_name = config.get('project_name') or default_name
         self.language_extensions = {
             'python': ['.py'],
             'javascript': ['.js', '.mjs', '.jsx'],
@@ -67,148 +228,370 @@ class SnapshotGenerator:
             'cicd': ['.travis.yml', 'Jenkinsfile', '.circleci/config.yml', '.gitlab-ci.yml', 'azure-pipelines.yml']
         }
         self.detected_language = None
+        self._include_suffixes = tuple(self.include_extensions)
+        self._key_files = set(self.key_files)
+        self._language_by_suffix, self._language_other_suffixes = self.build_language_index()
+        self.cache = SnapshotCache(config['cache_file'], self.settings()) if config.get('cache_file') else None
+        self.catalog_file = config.get('catalog_file')
+
+    def settings(self):
+        # Everything besides file contents that changes what a snapshot contains
+        return [
+            sorted(self.include_extensions), sorted(self.key_files), sorted(self.avoid_folders),
+            bool(self.compact), self.compression, self.output_format, bool(self.full_import_scan), IMPORT_EXTRACTOR_VERSION,
+            self.policy.settings(), self.blob_store is not None, self.ignore.settings(),
+        ]
+
+    def build_language_index(self):
+        # Maps each dotted extension to (position of its language, language) so detection
+        # is a few dict lookups; the first listed language still wins, as with endswith
+        by_suffix = {}
+        other = []
+        for order, (language, extensions) in enumerate(self.language_extensions.items()):
+            for extension in extensions:
+                if extension.startswith('.') and '/' not in extension:
+                    by_suffix.setdefault(extension, (order, language))
+                else:
+                    other.append((order, language, extension))
+        return by_suffix, other
+
+    def is_included_file(self, file):
+        return file.endswith(self._include_suffixes) or file in self._key_files
 
-    def exclude_directories(self, dirs):
-        exclude_set = set(self.avoid_folders)
-        return [d for d in dirs if d not in exclude_set]
+    def walk_directories(self, root_dir, directories=None):
+        # Top-down scandir traversal yielding the same (root, files) sequence
+        # as os.walk, minus ignored files; ignored folders are pruned before descending.
+        # `directories`, when given, receives root -> (relative root, IgnoreRules) in walk order.
+        if self.git_source is not None:
+            yield from self.walk_git_tree(root_dir, directories)
+            return
+        stack = [(root_dir, '', self.ignore.base_rules(root_dir))]
+        while stack:
+            root, relative_root, rules = stack.pop()
+            try:
+                with os.scandir(root) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+            dirs = []
+            files = []
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    dirs.append(entry)
+                else:
+                    files.append(entry.name)
+            rules = self.ignore.child_rules(rules, root, relative_root, GITIGNORE_FILE in files)
+            if directories is not None:
+                directories[root] = (relative_root, rules)
+            if rules.ignores_files:
+                files = [file for file in files if not rules.ignored(relative_child(relative_root, file), False)]
+            yield root, files
+            for entry in reversed(dirs):
+                relative_path = relative_child(relative_root, entry.name)
+                if not entry.is_symlink() and not rules.ignored(relative_path, True):
+                    stack.append((os.path.join(root, entry.name), relative_path, rules))
+
+    def walk_git_tree(self, root_dir, directories=None):
+        # walk_directories over the git ref's tree: the same top-down (root, files)
+        # sequence, with roots under root_dir as if the tree were checked out there.
+        # Each directory's .gitignore is read from its blob.
+        tree = {'files': [], 'dirs': {}}
+        self.git_files = {}
+        for path, mode, oid, size in self.git_source.entries():
+            node = tree
+            parts = path.split('/')
+            for part in parts[:-1]:
+                node = node['dirs'].setdefault(part, {'files': [], 'dirs': {}})
+            node['files'].append(parts[-1])
+            self.git_files[path] = (oid, size)
+
+        stack = [(root_dir, '', tree, self.ignore.base_rules(root_dir, self.git_source.git_dir))]
+        while stack:
+            root, relative_root, node, rules = stack.pop()
+            files = node['files']
+            if GITIGNORE_FILE in files:
+                oid, size = self.git_files[relative_child(relative_root, GITIGNORE_FILE)]
+                lines = self.git_source.read_blob(oid).decode('utf-8', 'surrogateescape').splitlines()
+                rules = self.ignore.rules_with_lines(rules, relative_root, lines)
+            if directories is not None:
+                directories[root] = (relative_root, rules)
+            if rules.ignores_files:
+                files = [file for file in files if not rules.ignored(relative_child(relative_root, file), False)]
+            yield root, files
+            for name, child in reversed(list(node['dirs'].items())):
+                relative_path = relative_child(relative_root, name)
+                if not rules.ignored(relative_path, True):
+                    stack.append((os.path.join(root, name), relative_path, child, rules))
+
+    def new_tree_index(self, root_dir):
+        tree = {"directory_name": os.path.basename(root_dir), "children": []}
+        return tree, {(): tree}
+
+    def tree_node(self, index, root):
+        # Directory nodes are keyed by their split path so each lookup is O(1)
+        # instead of rescanning children from the top of the tree.
+        path = tuple(root.split(os.sep))
+        node = index.get(path)
+        if node is None:
+            parent = self.tree_node(index, os.sep.join(path[:-1])) if len(path) > 1 else index[()]
+            node = {"directory_name": path[-1], "children": []}
+            parent["children"].append(node)
+            index[path] = node
+        return node
 
     def detect_programming_language(self, file):
-        for language, extensions in self.language_extensions.items():
-            if file.endswith(tuple(extensions)):
-                return language
-        return None
+        best = None
+        start = file.find('.')
+        while start != -1:
+            match = self._language_by_suffix.get(file[start:])
+            if match and (best is None or match < best):
+                best = match
+            start = file.find('.', start + 1)
+        for order, language, extension in self._language_other_suffixes:
+            if (best is None or order < best[0]) and file.endswith(extension):
+                best = (order, language)
+        return best[1] if best else None
 
     def build_tree_structure(self, root_dir):
-        tree = {"directory_name": os.path.basename(root_dir), "children": []}
-        for root, dirs, files in os.walk(root_dir):
-            dirs[:] = self.exclude_directories(dirs)
-            path = root.split(os.sep)
-            subdir = tree
-            for part in path:
-                for child in subdir["children"]:
-                    if child.get("directory_name") == part:
-                        subdir = child
-                        break
-                else:
-                    new_dir = {"directory_name": part, "children": []}
-                    subdir["children"].append(new_dir)
-                    subdir = new_dir
-            for file in files:
-                if file.endswith(tuple(self.include_extensions)) or file in self.key_files:
-                    subdir["children"].append({"file_name": file})
+        tree, index = self.new_tree_index(root_dir)
+        for _ in self.included_files(root_dir, index):
+            pass
         return tree
 
     def extract_imports(self, content, extension):
-        patterns = {
-            ".py": r"^\s*(?:import|from)\s+([\w\.]+)",
-            ".js": r"^\s*import\s+.*?\s+from\s+['\"]([\w\-\/]+)['\"]",
-            ".java": r"^\s*import\s+([\w\.]+)",
-            ".cpp": r"^\s*#\s*include\s*<([\w\.\/]+)>",
-            ".c": r"^\s*#\s*include\s*<([\w\.\/]+)>",
-            ".cs": r"^\s*using\s+([\w\.]+)",
-            ".rb": r"^\s*require\s+['\"]([\w\/]+)['\"]",
-            ".php": r"^\s*use\s+([\w\\]+)",
-            ".go": r"^\s*import\s+['\"]([\w\/]+)['\"]",
-            ".rs": r"^\s*extern\s+crate\s+([\w_]+)",
-            ".dart": r"^\s*import\s+['\"]([\w\/]+)['\"]",
-            ".ts": r"^\s*import\s+.*?\s+from\s+['\"]([\w\-\/]+)['\"]",
-            ".swift": r"^\s*import\s+([\w]+)",
-            ".kt": r"^\s*import\s+([\w\.]+)"
-        }
-
-        pattern = patterns.get(extension)
-        if not pattern:
-            return []
-
-        regex = re.compile(pattern, re.MULTILINE)
-        matches = regex.findall(content)
+        matches = find_imports(content, extension, self.full_import_scan)
         for match in matches:
             self.imports[match] += 1
         return matches
 
-    def generate_context_file(self):
-        print(f"Generating context file: {self.output_file}")
-        project_data = {
-            'project_name': self.project_name,
-            'programming_language': '',  # Will be detected later
-            'project_tree_structure': self.build_tree_structure(self.root_dir),
-            'project_sources': [],
-            'external_libraries': [],
-            'observations': []
+    def cache_key(self, root, file):
+        return os.path.relpath(os.path.join(root, file), self.root_dir)
+
+    def ingest_job(self, root, file):
+        # ingest_source_file arguments for one file; called in traversal order
+        cached = self.cache.get(self.cache_key(root, file)) if self.cache is not None else None
+        if self.git_source is None:
+            return self.root_dir, root, file, cached, self.hash_files, self.full_import_scan, self.policy, self.over_budget(root, file), self.blob_store, METRICS.enabled
+
+        # Blobs are read here, in order, from the one cat-file process; the workers
+        # only decode and scan them. A blob id the cache already knows is not read at all.
+        oid, size = self.git_files[self.cache_key(root, file).replace(os.sep, '/')]
+        over_budget = self.over_budget(root, file, size)
+        git_blob = {'oid': oid, 'size': size, 'mtime': self.git_source.commit_time, 'data': None}
+        if over_budget or cache_answer(cached, {'oid': oid}, self.blob_store, over_budget) is None:
+            git_blob['data'] = self.git_source.read_blob(oid)
+        return self.root_dir, root, file, cached, self.hash_files, self.full_import_scan, self.policy, over_budget, self.blob_store, METRICS.enabled, git_blob
+
+    def ingest_files(self, files, job=None):
+        # Yields ((root, file), ingest_source_file result) in the same order as `files`,
+        # so the snapshot is identical whatever the number of workers
+        job = job or self.ingest_job
+        if self.workers <= 1:
+            for root, file in files:
+                yield (root, file), ingest_source_file(*job(root, file))
+            return
+
+        if self.worker_mode == 'process':
+            # multiprocessing is only loaded for runs that use it
+            from concurrent.futures import ProcessPoolExecutor as executor_class
+        else:
+            executor_class = ThreadPoolExecutor
+        with executor_class(max_workers=self.workers) as executor:
+            pending = deque()
+            for root, file in files:
+                pending.append(((root, file), executor.submit(ingest_source_file, *job(root, file))))
+                # Bound the number of in-flight files so memory stays flat on large projects
+                if len(pending) >= self.workers * 4:
+                    key, future = pending.popleft()
+                    yield key, future.result()
+            while pending:
+                key, future = pending.popleft()
+                yield key, future.result()
+
+    def over_budget(self, root, file, size=None):
+        # The project budget is charged here, in traversal order, so which files
+        # fit does not depend on the number of workers
+        if not self.policy.max_project_bytes:
+            return False
+        if size is None:
+            try:
+                size = os.stat(os.path.join(root, file)).st_size
+            except OSError:
+                return False
+        admitted = self.policy.admitted_bytes(size)
+        if self.project_bytes + admitted > self.policy.max_project_bytes:
+            return True
+        self.project_bytes += admitted
+        return False
+
+    def ingestion_observations(self, skipped, placeholders):
+        # One line per kind of skipped or shortened file, naming the first few of them
+        def listed(paths):
+            shown = ', '.join(paths[:10])
+            return f"{shown} and {len(paths) - 10} more" if len(paths) > 10 else shown
+
+        observations = []
+        descriptions = {
+            'binary': "Skipped {count} binary or non UTF-8 files: {files}",
+            'unreadable': "Skipped {count} unreadable files: {files}",
+        }
+        for kind, paths in sorted(skipped.items()):
+            observations.append(descriptions[kind].format(count=len(paths), files=listed(paths)))
+        descriptions = {
+            ('truncated', 'max_file_bytes'): f"Truncated {{count}} files larger than {self.policy.max_file_bytes} bytes: {{files}}",
+            ('hashed', 'max_file_bytes'): f"Replaced {{count}} files larger than {self.policy.max_file_bytes} bytes with a hash: {{files}}",
+            ('hashed', 'minified'): "Replaced {count} minified files with a hash: {files}",
+            ('omitted', 'max_project_bytes'): f"Omitted the source of {{count}} files after the {self.policy.max_project_bytes} byte project budget ran out: {{files}}",
         }
+        for key, paths in sorted(placeholders.items()):
+            observations.append(descriptions[key].format(count=len(paths), files=listed(paths)))
+        return observations
+
+    def included_files(self, root_dir, index):
+        for root, files in self.walk_directories(root_dir):
+            node = self.tree_node(index, root)
+            for file in files:
+                if self.is_included_file(file):
+                    node["children"].append({"file_name": file})
+                    yield root, file
+
+    def project_fingerprint(self, tree, file_stats):
+        digest = hashlib.sha1()
+        digest.update(json.dumps(self.settings()).encode('utf-8'))
+        digest.update(json.dumps(tree).encode('utf-8'))
+        for relative_path, size, mtime_ns in file_stats:
+            digest.update(f"{relative_path}\0{size}\0{mtime_ns}\n".encode('utf-8', 'surrogateescape'))
+        return digest.hexdigest()
+
+    def scan_fingerprint(self):
+        # Stat-only pass over the project, matching what generate_context_file records
+        if self.git_source is not None:
+            # The tree id covers every path and blob; .git/info/exclude is the only input outside it
+            base_rules = self.ignore.base_rules(self.root_dir, self.git_source.git_dir)
+            return self.project_fingerprint([self.git_source.tree_id, base_rules.key], [])
+        tree, index = self.new_tree_index(self.root_dir)
+        file_stats = []
+        for root, file in self.included_files(self.root_dir, index):
+            try:
+                file_info = os.stat(os.path.join(root, file))
+                file_stats.append((self.cache_key(root, file), file_info.st_size, file_info.st_mtime_ns))
+            except OSError:
+                file_stats.append((self.cache_key(root, file), -1, -1))
+        return self.project_fingerprint(tree, file_stats)
+
+    def is_up_to_date(self):
+        return self.cache is not None and self.cache.is_current(self.scan_fingerprint())
 
-        for root, dirs, files in os.walk(self.root_dir, topdown=True):
-            dirs[:] = self.exclude_directories(dirs)
-            if files:
-                for file in files:
-                    if file.endswith(tuple(self.include_extensions)) or file in self.key_files:
-                        file_path = os.path.join(root, file)
-                        try:
-                            with open(file_path, 'r', encoding='utf-8') as f_in:
-                                content = f_in.read()
-                                file_info = os.stat(file_path)
-                                source_data = {
-                                    'file': {
-                                        'File': file,
-                                        'Full Path': file_path,
-                                        'Relative Path': os.path.relpath(file_path, self.root_dir),
-                                        'Size': file_info.st_size,
-                                        'Last Modified': datetime.fromtimestamp(file_info.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
-                                        'Lines': len(content.splitlines()),
-                                        'Source_Code': content
-                                    }
-                                }
-                                project_data['project_sources'].append(source_data)
-
-                                extension = os.path.splitext(file)[1]
-                                self.extract_imports(content, extension)
-
-                                # Detect programming language
-                                if not self.detected_language:
-                                    self.detected_language = self.detect_programming_language(file)
-
-                        except UnicodeDecodeError as e:
-                            print(f"Skipping file {file_path} due to decoding error: {e}")
-                        except Exception as e:
-                            print(f"Skipping file {file_path} due to an unexpected error: {e}")
-
-        project_data['programming_language'] = self.detected_language or 'unknown'
-        project_data['external_libraries'] = [{"import_name": imp, "count": count} for imp, count in self.imports.items()]
+    def open_writer(self):
+        if self.output_format == 'packed':
+            return PackedSnapshotWriter(self.output_file)
+        return SnapshotWriter(self.output_file, compact=self.compact, compression=self.compression, frame_size=self.frame_size)
 
+    def record_timings(self, entry):
+        # Moves the worker-side read/import timings of an ingested file into METRICS
+        if entry is not None and 'timings' in entry:
+            timings = entry.pop('timings')
+            METRICS.add_time('read', timings['read'], self.project_name)
+            METRICS.add_bytes('read', read=entry['size'], project=self.project_name)
+            if timings['imports']:
+                METRICS.add_time('imports', timings['imports'], self.project_name)
+
+    def track_source(self, file, source_data, placeholders, catalog_files):
+        # Bookkeeping for every source record written to the snapshot
+        ingestion = source_data['file'].get('Ingestion')
+        if ingestion:
+            placeholders[(ingestion['status'], ingestion['rule'])].append(source_data['file']['Relative Path'])
+        if self.catalog_file:
+            file_data = source_data['file']
+            catalog_files.append((file_data['Relative Path'], file_data['Size'], file_data['Lines']))
+
+        # Detect programming language
+        if not self.detected_language:
+            self.detected_language = self.detect_programming_language(file)
+
+    def finish_snapshot(self, writer, tree, skipped, placeholders, written_files, catalog_files):
+        # Writes the summary keys from self.imports, then records the finished snapshot
+        project = self.project_name
+        external_libraries = [{"import_name": imp, "count": count} for imp, count in self.imports.items()]
+
+        observations = []
         if not self.imports:
-            project_data['observations'].append("No external libraries or imports were detected in the source code.")
+            observations.append("No external libraries or imports were detected in the source code.")
+        observations.extend(self.ingestion_observations(skipped, placeholders))
 
-        with open(self.output_file, 'w', encoding='utf-8') as f_out:
-            json.dump(project_data, f_out, indent=4)
+        with METRICS.timer('write', project):
+            writer.finish(self.detected_language or 'unknown', tree, external_libraries, observations)
 
-        os.chmod(self.output_file, 0o666)
-        print(f"Context file generated at: {self.output_file}")
+        METRICS.add_bytes('write', written=os.path.getsize(writer.path), project=project)
+        METRICS.count('write', 'files', written_files, project)
+        for reason, paths in skipped.items():
+            METRICS.count('read', f"skipped_{reason}", len(paths), project)
+        if self.catalog_file:
+            with METRICS.timer('catalog', project), SnapshotCatalog(self.catalog_file) as catalog:
+                catalog.record_snapshot(self.project_name, writer.path, self.detected_language or 'unknown',
+                                        catalog_files, external_libraries, root_dir=os.path.abspath(self.root_dir))
 
-    def split_file(self, file_path, num_chunks=None, chunk_size=None):
-        output_dir = f"{os.path.splitext(file_path)[0]}_parts"
-        os.makedirs(output_dir, exist_ok=True)
-        print(f"Splitting file {file_path} into parts in directory {output_dir}")
+        self.snapshot_file = writer.path
+        os.chmod(self.snapshot_file, 0o666)
+        print(f"Context file generated at: {self.snapshot_file}")
+
+    def generate_context_file(self):
+        print(f"Generating context file: {self.output_file}")
+        tree, index = self.new_tree_index(self.root_dir)
+        file_stats = []
+        catalog_files = []
+        skipped = defaultdict(list)
+        placeholders = defaultdict(list)
+        written_files = 0
+        self.project_bytes = 0
 
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        with self.open_writer() as writer:
+            writer.begin(self.project_name)
 
-        if num_chunks:
-            chunk_size = len(content) // num_chunks + (len(content) % num_chunks > 0)
+            # Single pass: the tree is built from the same traversal that feeds file ingestion,
+            # and each source record is written out as soon as it has been read
+            project = self.project_name
+            included_files = METRICS.timed_iter('tree', self.included_files(self.root_dir, index), project)
+            for (root, file), (source_data, matches, error, entry) in self.ingest_files(included_files):
+                self.record_timings(entry)
+                if self.cache is not None:
+                    relative_path = self.cache_key(root, file)
+                    if entry is None:
+                        file_stats.append((relative_path, -1, -1))
+                    else:
+                        file_stats.append((relative_path, entry['size'], entry['mtime_ns']))
+                        self.cache.record(relative_path, entry)
 
-        chunk_size = chunk_size or len(content)
-        part_num = 0
+                if error:
+                    print(error)
+                    if entry is not None:
+                        skipped[entry.get('skipped', 'unreadable')].append(self.cache_key(root, file))
+                    continue
+                with METRICS.timer('write', project):
+                    writer.write_source(source_data, matches)
+                written_files += 1
+                self.track_source(file, source_data, placeholders, catalog_files)
+                for match in matches:
+                    self.imports[match] += 1
 
-        for i in range(0, len(content), chunk_size):
-            part_filename = os.path.join(output_dir, f"{os.path.basename(file_path)}.part{part_num}")
-            with open(part_filename, 'w', encoding='utf-8') as part_file:
-                part_file.write(content[i:i + chunk_size])
-            os.chmod(part_filename, 0o666)
-            print(f"Created part file: {part_filename}")
-            part_num += 1
+            self.finish_snapshot(writer, tree, skipped, placeholders, written_files, catalog_files)
 
-        new_output_file_path = os.path.join(output_dir, os.path.basename(file_path))
-        os.rename(file_path, new_output_file_path)
-        os.chmod(new_output_file_path, 0o666)
-        print(f"Moved original context file to: {new_output_file_path}")
+        if self.git_source is not None:
+            print(f"Read {self.git_source.blobs_read} blobs ({self.git_source.bytes_read} bytes) from {self.git_source.ref} ({self.git_source.commit[:12]})")
+            self.git_source.close()
+        if self.cache is not None:
+            fingerprint = self.scan_fingerprint() if self.git_source is not None else self.project_fingerprint(tree, file_stats)
+            self.cache.save(fingerprint, os.path.dirname(os.path.abspath(self.output_file)))
+            print(f"Snapshot cache: {self.cache.hits} unchanged files reused, {self.cache.misses} files rescanned")
+            METRICS.count('cache', 'hits', self.cache.hits, project)
+            METRICS.count('cache', 'misses', self.cache.misses, project)
 
-        return output_dir
+    def split_file(self, file_path, num_chunks=None, chunk_size=None, output_dir=None):
+        # The splitter moves the original file, so its size is taken first
+        METRICS.add_bytes('split', read=os.path.getsize(file_path) if METRICS.enabled else 0, project=self.project_name)
+        with METRICS.timer('split', self.project_name):
+            return SnapshotSplitter(file_path).split(num_chunks=num_chunks, chunk_size=chunk_size, output_dir=output_dir)
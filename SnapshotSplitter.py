@@ -0,0 +1,166 @@
+import os
+import json
+from SnapshotWriter import COMPRESSION_SUFFIXES, load_snapshot_index, decompress_frame
+
+COPY_BLOCK_SIZE = 1024 * 1024
+FALLBACK_BLOCK_SIZE = 64 * 1024
+
+
+class SnapshotSplitter:
+    # Splits a snapshot into parts without loading it into memory. Parts are cut
+    # on real byte budgets and only between source-file records (or between whole
+    # compressed frames), using the "<path>.index" written by SnapshotWriter.
+    # Files without an index fall back to line boundaries. A manifest maps every
+    # Relative Path to the part holding it and the record's byte offset inside
+    # that part's (decompressed) content.
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.index = load_snapshot_index(file_path)
+        self.compression = self.index['compression'] if self.index else None
+        self.file_size = os.path.getsize(file_path)
+
+    def parts_dir(self):
+        base_path = self.file_path
+        for suffix in COMPRESSION_SUFFIXES.values():
+            if base_path.endswith(suffix):
+                base_path = base_path[:-len(suffix)]
+        return f"{os.path.splitext(base_path)[0]}_parts"
+
+    def line_breaks(self):
+        breaks = []
+        position = 0
+        with open(self.file_path, 'rb') as f:
+            while True:
+                block = f.read(FALLBACK_BLOCK_SIZE)
+                if not block:
+                    break
+                cut = block.rfind(b'\n') + 1
+                if cut == 0:
+                    # No line end in this block: cut before the last UTF-8 lead byte
+                    cut = len(block)
+                    for i in range(len(block) - 1, 0, -1):
+                        if block[i] & 0xC0 != 0x80:
+                            cut = i
+                            break
+                position += cut
+                f.seek(position)
+                if position < self.file_size:
+                    breaks.append(position)
+        return breaks
+
+    def units(self):
+        # The smallest pieces a part can be made of: their byte range in the file
+        # and the raw (decompressed) byte range of the document they cover
+        if self.compression:
+            return [
+                {'offset': frame['offset'], 'length': frame['length'], 'raw_offset': frame['raw_offset'], 'raw_length': frame['raw_length']}
+                for frame in self.index['frames']
+            ]
+
+        if self.index is not None and self.index['raw_bytes'] == self.file_size:
+            breaks = [record['raw_offset'] + record['raw_length'] for record in self.index['records']]
+        else:
+            breaks = self.line_breaks()
+
+        units = []
+        start = 0
+        for end in breaks + [self.file_size]:
+            if end > start:
+                units.append({'offset': start, 'length': end - start, 'raw_offset': start, 'raw_length': end - start})
+                start = end
+        return units
+
+    def group_units(self, units, num_chunks=None, chunk_size=None):
+        # A byte budget closes a part before it would overflow it (a single unit
+        # larger than the budget gets a part of its own); a part count closes a
+        # part once it holds its share of the bytes
+        total = sum(unit['length'] for unit in units)
+        share = total // num_chunks + (total % num_chunks > 0) if num_chunks else None
+        parts = [[]]
+        part_length = 0
+        for unit in units:
+            if chunk_size and not share and parts[-1] and part_length + unit['length'] > chunk_size:
+                parts.append([])
+                part_length = 0
+            parts[-1].append(unit)
+            part_length += unit['length']
+            if share and part_length >= share:
+                parts.append([])
+                part_length = 0
+        if not parts[-1] and len(parts) > 1:
+            parts.pop()
+        return parts
+
+    def split(self, num_chunks=None, chunk_size=None, output_dir=None):
+        output_dir = output_dir or self.parts_dir()
+        os.makedirs(output_dir, exist_ok=True)
+        print(f"Splitting file {self.file_path} into parts in directory {output_dir}")
+
+        basename = os.path.basename(self.file_path)
+        parts = self.group_units(self.units(), num_chunks=num_chunks, chunk_size=chunk_size)
+        manifest = {
+            'source': basename,
+            'compression': self.compression,
+            'parts': [],
+            'files': {},
+        }
+
+        with open(self.file_path, 'rb') as f_in:
+            for part_num, part_units in enumerate(parts):
+                part_filename = os.path.join(output_dir, f"{basename}.part{part_num}")
+                with open(part_filename, 'wb') as part_file:
+                    for unit in part_units:
+                        f_in.seek(unit['offset'])
+                        remaining = unit['length']
+                        while remaining:
+                            block = f_in.read(min(remaining, COPY_BLOCK_SIZE))
+                            part_file.write(block)
+                            remaining -= len(block)
+                os.chmod(part_filename, 0o666)
+                print(f"Created part file: {part_filename}")
+                manifest['parts'].append({
+                    'part': part_num,
+                    'file': os.path.basename(part_filename),
+                    'offset': part_units[0]['offset'] if part_units else 0,
+                    'length': sum(unit['length'] for unit in part_units),
+                    'raw_offset': part_units[0]['raw_offset'] if part_units else 0,
+                    'raw_length': sum(unit['raw_length'] for unit in part_units),
+                })
+
+        records = self.index['records'] if self.index is not None else []
+        part_num = 0
+        for record in records:
+            while part_num < len(manifest['parts']) - 1 and record['raw_offset'] >= manifest['parts'][part_num + 1]['raw_offset']:
+                part_num += 1
+            manifest['files'][record['path']] = {
+                'part': part_num,
+                'offset': record['raw_offset'] - manifest['parts'][part_num]['raw_offset'],
+                'length': record['raw_length'],
+            }
+
+        manifest_file = os.path.join(output_dir, f"{basename}.manifest")
+        with open(manifest_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=4)
+        os.chmod(manifest_file, 0o666)
+        print(f"Wrote manifest: {manifest_file}")
+
+        new_output_file_path = os.path.join(output_dir, basename)
+        os.rename(self.file_path, new_output_file_path)
+        os.chmod(new_output_file_path, 0o666)
+        if self.index is not None:
+            os.rename(f"{self.file_path}.index", f"{new_output_file_path}.index")
+        print(f"Moved original context file to: {new_output_file_path}")
+
+        return output_dir
+
+
+def read_part_record(parts_dir, manifest, relative_path):
+    # Loads a single source record using only the part that holds it
+    location = manifest['files'][relative_path]
+    part = manifest['parts'][location['part']]
+    with open(os.path.join(parts_dir, part['file']), 'rb') as f:
+        data = f.read()
+    if manifest['compression']:
+        data = decompress_frame(data, manifest['compression'])
+    return json.loads(data[location['offset']:location['offset'] + location['length']])
@@ -0,0 +1,375 @@
+import os
+import time
+from collections import defaultdict
+from IgnoreMatcher import GITIGNORE_FILE, relative_child
+from Metrics import METRICS
+
+# A burst of changes that never goes quiet for `debounce` seconds is still
+# written out after this many seconds
+MAX_DEBOUNCE_WAIT = 10.0
+
+
+def stat_key(path):
+    try:
+        file_info = os.stat(path)
+    except OSError:
+        return None
+    return file_info.st_size, file_info.st_mtime_ns
+
+
+def directory_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class PollingEvents:
+    # Fallback event source: every `interval` seconds it stats the watched
+    # directories and files. A directory whose mtime changed had entries
+    # added, removed or renamed, which asks the watcher for a resync; a file
+    # whose size or mtime changed is reported by path.
+
+    def __init__(self, watcher, interval=1.0):
+        self.watcher = watcher
+        self.interval = interval
+        self.directories = {}
+        self.stats = {}
+
+    def sync(self):
+        # New baseline after the watcher listed the project again. Files are
+        # compared against the stats they were ingested with, so an edit made
+        # during the resync still shows up on the next poll.
+        self.directories = {root: directory_mtime(root) for root in self.watcher.directories}
+        self.stats = {}
+        for root in self.watcher.directories:
+            self.stats[os.path.join(root, GITIGNORE_FILE)] = stat_key(os.path.join(root, GITIGNORE_FILE))
+        for path, entry in self.watcher.watched_files():
+            self.stats[path] = (entry['size'], entry['mtime_ns']) if entry is not None else None
+
+    def poll(self):
+        paths = set()
+        resync = False
+        for root, mtime in self.directories.items():
+            current = directory_mtime(root)
+            if current != mtime:
+                self.directories[root] = current
+                resync = True
+        for path, known in self.stats.items():
+            current = stat_key(path)
+            if current != known:
+                self.stats[path] = current
+                paths.add(path)
+        return paths, resync
+
+    def changes(self, timeout=None):
+        # Waits up to `timeout` seconds (forever with None) for a change
+        waited = 0.0
+        while True:
+            delay = self.interval if timeout is None else min(self.interval, timeout - waited)
+            time.sleep(max(delay, 0.0))
+            waited += delay
+            paths, resync = self.poll()
+            if paths or resync or (timeout is not None and waited >= timeout):
+                return paths, resync
+
+    def close(self):
+        pass
+
+
+class InotifyEvents:
+    # inotify event source (Linux, needs the inotify_simple package). Every
+    # directory the walk lists gets a watch; created, written, removed and
+    # renamed files are reported by path. A directory event or a queue
+    # overflow asks the watcher for a resync.
+
+    def __init__(self, watcher):
+        from inotify_simple import INotify, flags
+        self.watcher = watcher
+        self.flags = flags
+        self.inotify = INotify()
+        self.mask = (flags.CREATE | flags.DELETE | flags.MODIFY | flags.CLOSE_WRITE | flags.ATTRIB
+                     | flags.MOVED_FROM | flags.MOVED_TO | flags.DELETE_SELF | flags.MOVE_SELF)
+        self.roots = {}
+        self.watches = {}
+
+    def sync(self):
+        for root in list(self.roots):
+            if root not in self.watcher.directories:
+                wd = self.roots.pop(root)
+                self.watches.pop(wd, None)
+                try:
+                    self.inotify.rm_watch(wd)
+                except OSError:
+                    # Already gone with its directory
+                    pass
+        for root in self.watcher.directories:
+            if root not in self.roots:
+                try:
+                    wd = self.inotify.add_watch(root, self.mask)
+                except OSError:
+                    continue
+                self.roots[root] = wd
+                self.watches[wd] = root
+
+    def changes(self, timeout=None):
+        flags = self.flags
+        events = self.inotify.read(timeout=None if timeout is None else int(timeout * 1000))
+        paths = set()
+        resync = False
+        for event in events:
+            if event.mask & flags.Q_OVERFLOW:
+                resync = True
+                continue
+            if event.mask & flags.IGNORED:
+                continue
+            root = self.watches.get(event.wd)
+            if root is None:
+                continue
+            if event.mask & (flags.ISDIR | flags.DELETE_SELF | flags.MOVE_SELF):
+                resync = True
+            else:
+                paths.add(os.path.join(root, event.name))
+        return paths, resync
+
+    def close(self):
+        self.inotify.close()
+
+
+def open_event_source(watcher, backend='auto', poll_interval=1.0):
+    if backend in ('auto', 'inotify'):
+        try:
+            return InotifyEvents(watcher)
+        except ImportError:
+            if backend == 'inotify':
+                raise ValueError("--watch-backend inotify requires the inotify_simple package (pip install inotify_simple)")
+        except OSError as e:
+            if backend == 'inotify':
+                raise
+            print(f"inotify is not available ({e})")
+        print(f"Watching by polling every {poll_interval}s")
+    return PollingEvents(watcher, poll_interval)
+
+
+class SnapshotWatcher:
+    # Keeps a project's snapshot up to date from a long-running process. The
+    # generator's records, import counts and directory listing stay in memory:
+    # file system events are coalesced until the project has been quiet for
+    # `debounce` seconds, only the files they name are read again, and the
+    # snapshot is rewritten from memory (atomically, through the generator's
+    # writer). New or removed directories, .gitignore edits and projects with
+    # a byte budget go through a resync instead, a stat-only walk that still
+    # re-reads just the files whose size or mtime changed.
+
+    def __init__(self, generator, debounce=0.5, poll_interval=1.0, backend='auto', on_update=None):
+        # on_update(generator) runs after every rewrite, e.g. to split the snapshot into parts
+        self.generator = generator
+        self.root_dir = generator.root_dir
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.backend = backend
+        self.on_update = on_update
+        # root -> (relative root, IgnoreRules) and root -> included files, both in walk order
+        self.directories = {}
+        self.files = {}
+        # relative path -> the ingest_source_file result for that file
+        self.records = {}
+        self.updates = 0
+        self.resyncs = 0
+
+    def watched_files(self):
+        for root, files in self.files.items():
+            for file in files:
+                record = self.records.get(self.generator.cache_key(root, file))
+                yield os.path.join(root, file), record['entry'] if record else None
+
+    def changed(self, root, file, record):
+        entry = record['entry']
+        return entry is None or stat_key(os.path.join(root, file)) != (entry['size'], entry['mtime_ns'])
+
+    def listing_order(self, root, files):
+        # `files` in the order a fresh walk lists them (scandir order), so a watched
+        # snapshot lists files like a full run does
+        try:
+            with os.scandir(root) as it:
+                position = {entry.name: index for index, entry in enumerate(it)}
+        except OSError:
+            return files
+        return sorted(files, key=lambda name: position.get(name, len(position)))
+
+    def add_imports(self, record, sign):
+        if record['error']:
+            return
+        imports = self.generator.imports
+        for match in record['matches']:
+            imports[match] += sign
+            if not imports[match]:
+                del imports[match]
+
+    def drop(self, relative_path):
+        record = self.records.pop(relative_path, None)
+        if record is not None:
+            self.add_imports(record, -1)
+
+    def ingest(self, files, over_budget):
+        # Reads `files` again (with the generator's workers) and swaps their records in
+        generator = self.generator
+
+        def job(root, file):
+            record = self.records.get(generator.cache_key(root, file))
+            return (generator.root_dir, root, file, record['entry'] if record else None, generator.hash_files,
+                    generator.full_import_scan, generator.policy, over_budget.get((root, file), False),
+                    generator.blob_store, METRICS.enabled)
+
+        for (root, file), (source_data, matches, error, entry) in generator.ingest_files(files, job):
+            generator.record_timings(entry)
+            if error:
+                print(error)
+            relative_path = generator.cache_key(root, file)
+            self.drop(relative_path)
+            record = {'source_data': source_data, 'matches': matches, 'error': error, 'entry': entry,
+                      'over_budget': over_budget.get((root, file), False)}
+            self.records[relative_path] = record
+            self.add_imports(record, 1)
+
+    def resync(self):
+        # Lists the whole project again; returns whether anything changed
+        generator = self.generator
+        directories = {}
+        files = {}
+        pending = []
+        over_budget = {}
+        generator.project_bytes = 0
+        for root, names in generator.walk_directories(self.root_dir, directories):
+            files[root] = [name for name in names if generator.is_included_file(name)]
+            for file in files[root]:
+                over_budget[(root, file)] = generator.over_budget(root, file)
+                record = self.records.get(generator.cache_key(root, file))
+                if record is None or record['over_budget'] != over_budget[(root, file)] or self.changed(root, file, record):
+                    pending.append((root, file))
+
+        listed = {generator.cache_key(root, file) for root in files for file in files[root]}
+        removed = [relative_path for relative_path in self.records if relative_path not in listed]
+        for relative_path in removed:
+            self.drop(relative_path)
+        changed = bool(pending or removed) or list(directories) != list(self.directories) or files != self.files
+        self.directories = directories
+        self.files = files
+        self.resyncs += 1
+        self.ingest(pending, over_budget)
+        return changed
+
+    def apply(self, paths, resync=False):
+        # Brings the records up to date with the changed paths; returns whether the snapshot changed
+        generator = self.generator
+        # The byte budget is charged in traversal order, so one file can change what fits after it
+        if resync or generator.policy.max_project_bytes:
+            return self.resync()
+        pending = []
+        added_to = set()
+        changed = False
+        for path in sorted(paths):
+            root, file = os.path.split(path)
+            if root not in self.directories:
+                # Inside an ignored directory, or one the next resync will list
+                continue
+            if file == GITIGNORE_FILE:
+                return self.resync()
+            relative_root, rules = self.directories[root]
+            listed = self.files[root]
+            wanted = (
+                generator.is_included_file(file)
+                and os.path.lexists(path) and not os.path.isdir(path)
+                and not (rules.ignores_files and rules.ignored(relative_child(relative_root, file), False))
+            )
+            relative_path = generator.cache_key(root, file)
+            if wanted:
+                if file not in listed:
+                    listed.append(file)
+                    added_to.add(root)
+                    changed = True
+                record = self.records.get(relative_path)
+                if record is None or self.changed(root, file, record):
+                    pending.append((root, file))
+            elif file in listed:
+                listed.remove(file)
+                self.drop(relative_path)
+                changed = True
+        for root in added_to:
+            self.files[root] = self.listing_order(root, self.files[root])
+        self.ingest(pending, {})
+        return changed or bool(pending)
+
+    def write(self):
+        # Rewrites the snapshot from the in-memory records, in walk order
+        generator = self.generator
+        tree, index = generator.new_tree_index(self.root_dir)
+        catalog_files = []
+        skipped = defaultdict(list)
+        placeholders = defaultdict(list)
+        written_files = 0
+        generator.detected_language = None
+
+        with generator.open_writer() as writer:
+            writer.begin(generator.project_name)
+            for root, files in self.files.items():
+                node = generator.tree_node(index, root)
+                for file in files:
+                    node["children"].append({"file_name": file})
+                    relative_path = generator.cache_key(root, file)
+                    record = self.records[relative_path]
+                    if record['error']:
+                        if record['entry'] is not None:
+                            skipped[record['entry'].get('skipped', 'unreadable')].append(relative_path)
+                        continue
+                    with METRICS.timer('write', generator.project_name):
+                        writer.write_source(record['source_data'], record['matches'])
+                    written_files += 1
+                    generator.track_source(file, record['source_data'], placeholders, catalog_files)
+            generator.finish_snapshot(writer, tree, skipped, placeholders, written_files, catalog_files)
+
+        self.updates += 1
+        if self.on_update is not None:
+            self.on_update(generator)
+
+    def wait_for_changes(self, events):
+        # Blocks until something changes, then keeps collecting until the project
+        # has been quiet for `debounce` seconds (or MAX_DEBOUNCE_WAIT has passed)
+        paths, resync = events.changes()
+        started = time.monotonic()
+        while time.monotonic() - started < MAX_DEBOUNCE_WAIT:
+            more_paths, more_resync = events.changes(self.debounce)
+            if not more_paths and not more_resync:
+                break
+            paths |= more_paths
+            resync = resync or more_resync
+        return paths, resync
+
+    def run(self, max_updates=None):
+        # Writes the initial snapshot, then rewrites it after every change until
+        # interrupted (or after max_updates snapshots, counting the first one)
+        events = open_event_source(self, self.backend, self.poll_interval)
+        print(f"Watching {self.root_dir}")
+        self.resync()
+        self.write()
+        events.sync()
+        try:
+            while max_updates is None or self.updates < max_updates:
+                paths, resync = self.wait_for_changes(events)
+                started = time.perf_counter()
+                resyncs = self.resyncs
+                with METRICS.timer('watch', self.generator.project_name):
+                    changed = self.apply(paths, resync)
+                    if self.resyncs != resyncs:
+                        # Watch the directories as they are listed now
+                        events.sync()
+                    if not changed:
+                        continue
+                    self.write()
+                METRICS.count('watch', 'updates', 1, self.generator.project_name)
+                print(f"Snapshot updated in {time.perf_counter() - started:.2f}s after {len(paths)} changed paths"
+                      f"{' and a resync' if self.resyncs != resyncs else ''}")
+        except KeyboardInterrupt:
+            print("Stopped watching")
+        finally:
+            events.close()
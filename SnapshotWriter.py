@@ -0,0 +1,214 @@
+import io
+import os
+import json
+import gzip
+import time
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULT_FRAME_SIZE = 256 * 1024
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+
+
+def resolve_compression(compression):
+    if compression in (None, '', 'none'):
+        return None
+    if compression == 'auto':
+        return 'zstd' if zstandard is not None else 'gzip'
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"Unknown compression format: {compression}")
+    if compression == 'zstd' and zstandard is None:
+        raise ValueError("zstd compression requires the zstandard package (pip install zstandard)")
+    return compression
+
+
+def compress_frame(data, compression):
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, mtime=0)
+
+
+def decompress_frame(data, compression):
+    # Also accepts several concatenated frames, e.g. a whole part file
+    if compression == 'zstd':
+        with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data), read_across_frames=True) as reader:
+            return reader.read()
+    return gzip.decompress(data)
+
+
+def open_snapshot(path):
+    # Text stream over a plain, gzip or zstd snapshot. Compressed snapshots are a
+    # sequence of frames, and both formats decode concatenated frames as one stream.
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise ValueError("Reading zstd snapshots requires the zstandard package (pip install zstandard)")
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True, closefd=True)
+        return io.TextIOWrapper(reader, encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def load_snapshot_index(path):
+    index_file = f"{path}.index"
+    if not os.path.exists(index_file):
+        return None
+    with open(index_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class SnapshotWriter:
+    # Streams a snapshot document to disk one source record at a time, so peak
+    # memory is bounded by the largest single file instead of the whole project.
+    # The result is the same JSON schema json.dump produced for project_data;
+    # only the key order differs (project_sources comes before the summary keys).
+    #
+    # Alongside the snapshot the writer leaves a "<path>.index" file listing the
+    # raw byte range of every source record, which lets the splitter cut parts
+    # between records without parsing the document.
+    #
+    # With compression enabled the text is cut into frames at source-record
+    # boundaries and every frame is written as a complete gzip member or zstd
+    # frame, so any frame listed in the index can be fetched and decompressed
+    # on its own, while the whole file still decodes as one stream.
+
+    def __init__(self, output_file, compact=False, compression=None, frame_size=DEFAULT_FRAME_SIZE):
+        self.output_file = output_file
+        self.compact = compact
+        self.indent = None if compact else 4
+        self.separators = (',', ':') if compact else None
+        self.compression = resolve_compression(compression)
+        self.frame_size = frame_size or DEFAULT_FRAME_SIZE
+        self.path = output_file + COMPRESSION_SUFFIXES.get(self.compression, '')
+        self.sources_written = 0
+        self.bytes_written = 0
+        self.compressed_bytes = 0
+        self.compress_seconds = 0.0
+        self.frames = []
+        self.records = []
+        self._frame = []
+        self._frame_length = 0
+        self._tmp_file = f"{self.path}.tmp"
+        self._f_out = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+
+    def _dumps(self, value, level):
+        text = json.dumps(value, indent=self.indent, separators=self.separators)
+        if self.indent:
+            text = text.replace('\n', '\n' + ' ' * (self.indent * level))
+        return text
+
+    def _newline(self, level):
+        return '' if self.compact else '\n' + ' ' * (self.indent * level)
+
+    def _key(self, key):
+        return f"{json.dumps(key)}:" if self.compact else f"{json.dumps(key)}: "
+
+    def _write(self, text):
+        # json.dumps escapes non-ASCII characters, so characters == bytes here
+        if self.compression:
+            self._frame.append(text)
+            self._frame_length += len(text)
+        else:
+            self._f_out.write(text)
+        self.bytes_written += len(text)
+
+    def _flush_frame(self):
+        if not self._frame:
+            return
+        data = ''.join(self._frame).encode('utf-8')
+        started = time.perf_counter()
+        compressed = compress_frame(data, self.compression)
+        self.compress_seconds += time.perf_counter() - started
+        self.frames.append({
+            'offset': self.compressed_bytes,
+            'length': len(compressed),
+            'raw_offset': self.bytes_written - len(data),
+            'raw_length': len(data),
+        })
+        self._f_out.write(compressed)
+        self.compressed_bytes += len(compressed)
+        self._frame = []
+        self._frame_length = 0
+
+    def open(self):
+        if self.compression:
+            self._f_out = open(self._tmp_file, 'wb')
+        else:
+            self._f_out = open(self._tmp_file, 'w', encoding='utf-8')
+        return self
+
+    def begin(self, project_name):
+        self._write('{' + self._newline(1) + self._key('project_name') + self._dumps(project_name, 1) + ',')
+        self._write(self._newline(1) + self._key('project_sources') + '[')
+
+    def write_source(self, source_data, imports=None):
+        separator = ',' if self.sources_written else ''
+        self._write(separator + self._newline(2))
+        text = self._dumps(source_data, 2)
+        self.records.append({
+            'path': source_data['file']['Relative Path'],
+            'raw_offset': self.bytes_written,
+            'raw_length': len(text),
+        })
+        self._write(text)
+        self.sources_written += 1
+        # Frames only end between source records
+        if self.compression and self._frame_length >= self.frame_size:
+            self._flush_frame()
+
+    def finish(self, programming_language, tree, external_libraries, observations):
+        self._write((self._newline(1) if self.sources_written else '') + '],')
+        summary = [
+            ('programming_language', programming_language),
+            ('project_tree_structure', tree),
+            ('external_libraries', external_libraries),
+            ('observations', observations),
+        ]
+        for position, (key, value) in enumerate(summary):
+            self._write(self._newline(1) + self._key(key) + self._dumps(value, 1))
+            if position < len(summary) - 1:
+                self._write(',')
+        self._write(self._newline(0) + '}')
+        if self.compression:
+            self._flush_frame()
+        self._f_out.close()
+        self._f_out = None
+        os.replace(self._tmp_file, self.path)
+        self.write_index()
+
+        if self.compression:
+            ratio = self.bytes_written / self.compressed_bytes if self.compressed_bytes else 0
+            throughput = self.bytes_written / self.compress_seconds / 1e6 if self.compress_seconds else 0
+            print(f"Compressed {self.bytes_written} bytes to {self.compressed_bytes} bytes with {self.compression} "
+                  f"in {len(self.frames)} frames (ratio {ratio:.2f}x, {throughput:.1f} MB/s)")
+
+    def write_index(self):
+        index = {
+            'compression': self.compression,
+            'raw_bytes': self.bytes_written,
+            'compressed_bytes': self.compressed_bytes if self.compression else self.bytes_written,
+            'frames': self.frames,
+            'records': self.records,
+        }
+        index_file = f"{self.path}.index"
+        with open(index_file, 'w', encoding='utf-8') as f:
+            json.dump(index, f, separators=(',', ':'))
+        os.chmod(index_file, 0o666)
+
+    def abort(self):
+        if self._f_out is not None:
+            self._f_out.close()
+            self._f_out = None
+        if os.path.exists(self._tmp_file):
+            os.remove(self._tmp_file)
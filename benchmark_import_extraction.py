@@ -0,0 +1,129 @@
+import re
+import json
+import time
+import random
+import argparse
+from SnapshotGenerator import SnapshotGenerator
+from ImportExtractor import find_imports
+
+# Micro-benchmark for import extraction and language detection: the previous
+# per-call implementation (patterns dict and re.compile on every file, whole
+# body scanned) against the precompiled, header-bounded ImportExtractor registry.
+
+SAMPLES = {
+    '.py': ("import {name}\nfrom {name}.sub import thing\n", "def f_{i}(x):\n    return x * {i}  # import nothing here\n"),
+    '.js': ("import {name} from '{name}'\n", "function f{i}(x) {{ return x * {i}; }}\n"),
+    '.java': ("import org.{name}.Thing;\n", "public class C{i} {{ int f() {{ return {i}; }} }}\n"),
+    '.cpp': ("#include <{name}.h>\n", "int f{i}(int x) {{ return x * {i}; }}\n"),
+    '.go': ("import \"{name}\"\n", "func f{i}(x int) int {{ return x * {i} }}\n"),
+}
+
+
+def legacy_extract_imports(content, extension):
+    patterns = {
+        ".py": r"^\s*(?:import|from)\s+([\w\.]+)",
+        ".js": r"^\s*import\s+.*?\s+from\s+['\"]([\w\-\/]+)['\"]",
+        ".java": r"^\s*import\s+([\w\.]+)",
+        ".cpp": r"^\s*#\s*include\s*<([\w\.\/]+)>",
+        ".c": r"^\s*#\s*include\s*<([\w\.\/]+)>",
+        ".cs": r"^\s*using\s+([\w\.]+)",
+        ".rb": r"^\s*require\s+['\"]([\w\/]+)['\"]",
+        ".php": r"^\s*use\s+([\w\\]+)",
+        ".go": r"^\s*import\s+['\"]([\w\/]+)['\"]",
+        ".rs": r"^\s*extern\s+crate\s+([\w_]+)",
+        ".dart": r"^\s*import\s+['\"]([\w\/]+)['\"]",
+        ".ts": r"^\s*import\s+.*?\s+from\s+['\"]([\w\-\/]+)['\"]",
+        ".swift": r"^\s*import\s+([\w]+)",
+        ".kt": r"^\s*import\s+([\w\.]+)"
+    }
+    pattern = patterns.get(extension)
+    if not pattern:
+        return []
+    return re.compile(pattern, re.MULTILINE).findall(content)
+
+
+def legacy_detect_programming_language(language_extensions, file):
+    for language, extensions in language_extensions.items():
+        if file.endswith(tuple(extensions)):
+            return language
+    return None
+
+
+def make_files(count, imports, body_lines, seed):
+    rng = random.Random(seed)
+    files = []
+    for i in range(count):
+        extension = rng.choice(sorted(SAMPLES))
+        header, body = SAMPLES[extension]
+        content = ''.join(header.format(name=f"lib{rng.randrange(50)}") for _ in range(imports))
+        content += ''.join(body.format(i=j) for j in range(body_lines))
+        files.append((f"file_{i}{extension}", extension, content))
+    return files
+
+
+def files_per_second(function, files, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for item in files:
+            function(item)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return len(files) / best if best else 0.0
+
+
+def main(count, imports, body_lines, repeat, output_path):
+    files = make_files(count, imports, body_lines, seed=42)
+    generator = SnapshotGenerator({
+        "root_dir": ".", "avoid_folders": [], "include_extensions": [], "key_files": [],
+        "output_file": "", "compress": 0, "amount_of_chunks": 0, "size_of_chunk": 0,
+    })
+    language_extensions = generator.language_extensions
+
+    def before(item):
+        name, extension, content = item
+        legacy_detect_programming_language(language_extensions, name)
+        legacy_extract_imports(content, extension)
+
+    def after(item):
+        name, extension, content = item
+        generator.detect_programming_language(name)
+        find_imports(content, extension)
+
+    def after_full_scan(item):
+        name, extension, content = item
+        generator.detect_programming_language(name)
+        find_imports(content, extension, full_scan=True)
+
+    results = {
+        'files': count,
+        'imports_per_file': imports,
+        'body_lines_per_file': body_lines,
+        'before_files_per_sec': files_per_second(before, files, repeat),
+        'after_files_per_sec': files_per_second(after, files, repeat),
+        'after_full_scan_files_per_sec': files_per_second(after_full_scan, files, repeat),
+    }
+    results['speedup'] = results['after_files_per_sec'] / results['before_files_per_sec']
+
+    print(f"Files: {count} ({imports} imports + {body_lines} body lines each)")
+    print(f"Before (per-call compile, full scan): {results['before_files_per_sec']:,.0f} files/sec")
+    print(f"After (precompiled, header-bounded):  {results['after_files_per_sec']:,.0f} files/sec")
+    print(f"After (precompiled, full scan):       {results['after_full_scan_files_per_sec']:,.0f} files/sec")
+    print(f"Speedup: {results['speedup']:.2f}x")
+
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4)
+        print(f"Results saved in {output_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark import extraction before and after the precompiled extractor registry.")
+    parser.add_argument("--files", type=int, default=2000, help="Number of synthetic files")
+    parser.add_argument("--imports", type=int, default=15, help="Import lines at the top of each file")
+    parser.add_argument("--body-lines", type=int, default=400, help="Code lines after the imports")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions; the best run is reported")
+    parser.add_argument("--output", default="", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    main(args.files, args.imports, args.body_lines, args.repeat, args.output)
@@ -0,0 +1,221 @@
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+from synthetic_repo import generate_synthetic_repo
+
+# End-to-end benchmarks over synthetic repositories at several scales. Every
+# (benchmark, scale) case runs in its own interpreter so its peak RSS is its
+# own, and the results are written as JSON that --compare can diff against a
+# run from another commit. Nothing touches the network.
+
+SCALES = {
+    'small': {'depth': 2, 'fan_out': 4, 'files': 200},
+    'medium': {'depth': 3, 'fan_out': 5, 'files': 2000},
+    'large': {'depth': 4, 'fan_out': 6, 'files': 10000},
+}
+
+BENCHMARKS = [
+    'build_tree_structure', 'generate_context_file', 'extract_imports',
+    'split_file', 'aggregate_imports', 'find_source_code_directories',
+]
+
+INCLUDE_EXTENSIONS = ['.py', '.js', '.ts', '.java', '.go', '.cpp', '.rb', '.rs']
+RESULT_MARKER = 'BENCHMARK_RESULT '
+
+
+def peak_rss_mb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def source_files(repo):
+    for root, dirs, files in os.walk(repo):
+        for file in files:
+            yield root, file
+
+
+def make_generator(repo, output_file, **extra):
+    from SnapshotGenerator import SnapshotGenerator
+    config = {
+        'root_dir': repo, 'avoid_folders': [], 'include_extensions': INCLUDE_EXTENSIONS, 'key_files': [],
+        'output_file': output_file, 'compress': 0, 'amount_of_chunks': None, 'size_of_chunk': None,
+    }
+    config.update(extra)
+    return SnapshotGenerator(config)
+
+
+def run_case(benchmark, repo, work_dir):
+    # Runs one benchmark and returns (seconds, files, bytes) for the measured part only
+    repo_files = list(source_files(repo))
+    repo_bytes = sum(os.path.getsize(os.path.join(root, file)) for root, file in repo_files)
+    snapshot_file = os.path.join(work_dir, 'snapshot.json')
+
+    if benchmark == 'build_tree_structure':
+        generator = make_generator(repo, snapshot_file)
+        started = time.perf_counter()
+        generator.build_tree_structure(repo)
+        return time.perf_counter() - started, len(repo_files), 0
+
+    if benchmark == 'generate_context_file':
+        generator = make_generator(repo, snapshot_file)
+        started = time.perf_counter()
+        generator.generate_context_file()
+        return time.perf_counter() - started, len(repo_files), repo_bytes
+
+    if benchmark == 'extract_imports':
+        generator = make_generator(repo, snapshot_file)
+        contents = []
+        for root, file in repo_files:
+            with open(os.path.join(root, file), 'r', encoding='utf-8') as f:
+                contents.append((f.read(), os.path.splitext(file)[1]))
+        started = time.perf_counter()
+        for content, extension in contents:
+            generator.extract_imports(content, extension)
+        return time.perf_counter() - started, len(contents), repo_bytes
+
+    if benchmark == 'split_file':
+        generator = make_generator(repo, snapshot_file, compress=1, compression='gzip')
+        generator.generate_context_file()
+        snapshot_bytes = os.path.getsize(generator.snapshot_file)
+        started = time.perf_counter()
+        generator.split_file(generator.snapshot_file, num_chunks=8)
+        return time.perf_counter() - started, len(repo_files), snapshot_bytes
+
+    if benchmark == 'aggregate_imports':
+        # Ten projects with three historical snapshots each, aggregated from a cold catalog
+        import tech_report
+        snapshots_dir = os.path.join(work_dir, 'snapshots')
+        generator = make_generator(repo, snapshot_file)
+        generator.generate_context_file()
+        for project in range(10):
+            for timestamp in ('202601010000', '202601020000', '202601030000'):
+                target = os.path.join(snapshots_dir, f"project_{project}", timestamp)
+                os.makedirs(target)
+                shutil.copy(generator.snapshot_file, target)
+        started = time.perf_counter()
+        tech_report.aggregate_imports(snapshots_dir)
+        return time.perf_counter() - started, 30, 30 * os.path.getsize(generator.snapshot_file)
+
+    if benchmark == 'find_source_code_directories':
+        from list_source_code_directories import find_source_code_directories
+        started = time.perf_counter()
+        find_source_code_directories(repo, os.path.join(work_dir, 'directories.txt'), incremental=False)
+        return time.perf_counter() - started, len(repo_files), 0
+
+    raise ValueError(f"Unknown benchmark {benchmark}")
+
+
+def child_main(benchmark, repo):
+    # Entry point of the per-case interpreter; prints are moved to stderr so the
+    # result line is the only thing on stdout
+    real_stdout = sys.stdout
+    sys.stdout = sys.stderr
+    work_dir = tempfile.mkdtemp(prefix='bench_')
+    try:
+        seconds, files, processed_bytes = run_case(benchmark, repo, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        sys.stdout = real_stdout
+    print(RESULT_MARKER + json.dumps({'seconds': seconds, 'files': files, 'bytes': processed_bytes, 'peak_rss_mb': peak_rss_mb()}))
+
+
+def run_in_child(benchmark, repo):
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', benchmark, '--repo', repo],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True,
+    )
+    for line in result.stdout.splitlines():
+        if line.startswith(RESULT_MARKER):
+            return json.loads(line[len(RESULT_MARKER):])
+    raise RuntimeError(f"Benchmark {benchmark} failed:\n{result.stderr[-2000:]}")
+
+
+def current_commit():
+    result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {(r['benchmark'], r['scale']): r for r in json.load(f)['results']}
+    print(f"Compared with {baseline_path} (ratio > 1 means slower now):")
+    for result in results:
+        before = baseline.get((result['benchmark'], result['scale']))
+        if before and before['seconds']:
+            ratio = result['seconds'] / before['seconds']
+            print(f"  {result['benchmark']:30} {result['scale']:7} {before['seconds']:8.3f}s -> {result['seconds']:8.3f}s  x{ratio:.2f}")
+
+
+def main(scales, benchmarks, repeat, output_path, baseline_path, keep_repos):
+    results = []
+    repo_root = tempfile.mkdtemp(prefix='bench_repos_')
+    try:
+        for scale in scales:
+            repo = os.path.join(repo_root, scale)
+            summary = generate_synthetic_repo(repo, **SCALES[scale])
+            print(f"Scale {scale}: {summary['files']} files in {summary['directories']} directories, {summary['bytes'] / (1024 * 1024):.1f} MB")
+            for benchmark in benchmarks:
+                runs = [run_in_child(benchmark, repo) for _ in range(repeat)]
+                best = min(runs, key=lambda run: run['seconds'])
+                seconds = best['seconds']
+                result = {
+                    'benchmark': benchmark,
+                    'scale': scale,
+                    'seconds': seconds,
+                    'peak_rss_mb': max(run['peak_rss_mb'] for run in runs),
+                    'files': best['files'],
+                    'bytes': best['bytes'],
+                    'files_per_sec': best['files'] / seconds if seconds else 0.0,
+                    'mb_per_sec': best['bytes'] / (1024 * 1024) / seconds if seconds else 0.0,
+                }
+                results.append(result)
+                print(f"  {benchmark:30} {seconds:8.3f}s  {result['files_per_sec']:10,.0f} files/s  "
+                      f"{result['mb_per_sec']:8.1f} MB/s  {result['peak_rss_mb']:7.1f} MB peak RSS")
+    finally:
+        if keep_repos:
+            print(f"Synthetic repositories kept in {repo_root}")
+        else:
+            shutil.rmtree(repo_root, ignore_errors=True)
+
+    report = {
+        'commit': current_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'scales': {scale: SCALES[scale] for scale in scales},
+        'results': results,
+    }
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=4)
+    print(f"Results saved in {output_path}")
+
+    if baseline_path:
+        compare(results, baseline_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the snapshot pipeline on synthetic repositories.")
+    parser.add_argument("--scales", default="small,medium", help=f"Comma separated scales ({', '.join(SCALES)})")
+    parser.add_argument("--benchmarks", default=','.join(BENCHMARKS), help="Comma separated benchmarks to run")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the fastest one is reported")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file for the results")
+    parser.add_argument("--compare", default="", help="Earlier results file to compare against")
+    parser.add_argument("--keep-repos", type=int, choices=[0, 1], default=0, help="Keep the generated repositories (0 or 1)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--repo", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child_main(args.child, args.repo)
+    else:
+        main(args.scales.split(','), args.benchmarks.split(','), args.repeat, args.output, args.compare, args.keep_repos)
@@ -0,0 +1,98 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# Import-time budget for every CLI entry point, measured with python -X importtime.
+# tests/test_import_time.py runs the same checks under pytest; run this script
+# by hand for a readable table: it exits with status 1 when an entry point
+# takes longer than its budget to import, or when it pulls in one of the heavy
+# dependencies that only specific code paths are supposed to load.
+
+IMPORT_BUDGETS_MS = {
+    'tech_report': 60,
+    'generate_context': 50,
+    'list_source_code_directories': 15,
+    'PackedSnapshot': 30,
+}
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Loaded lazily by the code paths that need them (charts, PDF, GitHub API, progress bar, process pools, library matrices)
+LAZY_MODULES = ['matplotlib', 'reportlab', 'requests', 'alive_progress', 'multiprocessing', 'svglib', 'pdfrw', 'numpy', 'scipy']
+
+
+def measure_import(module, cwd):
+    # Cumulative import time of `module` in microseconds, plus every module it loaded
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+        cwd=cwd, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    # Modules imported by interpreter startup (site and friends) are not the entry point's cost
+    baseline = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'pass'], capture_output=True, text=True)
+    startup = {line.split('|')[-1].strip() for line in baseline.stderr.splitlines() if line.startswith('import time:')}
+
+    cumulative = None
+    loaded = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        if name not in startup:
+            loaded.append(name)
+        if name == module:
+            cumulative = int(cumulative_us)
+    return cumulative, loaded
+
+
+def check_import(module, repeat=5, cwd=REPO_DIR):
+    # (import time in ms, heavy modules loaded) for one entry point; the time is
+    # the best of several runs, so a busy machine does not fail the check on its own
+    best_us = None
+    loaded = []
+    for _ in range(repeat):
+        cumulative_us, loaded = measure_import(module, cwd)
+        best_us = cumulative_us if best_us is None else min(best_us, cumulative_us)
+    heavy = sorted({name.split('.')[0] for name in loaded} & set(LAZY_MODULES))
+    return best_us / 1000, heavy
+
+
+def main(repeat, output_path):
+    results = {}
+    failures = []
+
+    for module, budget_ms in IMPORT_BUDGETS_MS.items():
+        elapsed_ms, heavy = check_import(module, repeat)
+        results[module] = {'import_ms': elapsed_ms, 'budget_ms': budget_ms, 'eager_heavy_modules': heavy}
+
+        status = 'ok'
+        if elapsed_ms > budget_ms:
+            status = 'OVER BUDGET'
+            failures.append(f"{module} imports in {elapsed_ms:.1f} ms (budget {budget_ms} ms)")
+        if heavy:
+            status = 'EAGER IMPORTS'
+            failures.append(f"{module} imports {', '.join(heavy)} at startup")
+        print(f"{module:32} {elapsed_ms:8.1f} ms / {budget_ms} ms  {status}")
+
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4)
+        print(f"Results saved in {output_path}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the import time of every CLI entry point against its budget.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per entry point; the fastest one is compared with the budget")
+    parser.add_argument("--output", default="", help="Optional JSON file for the measurements")
+    args = parser.parse_args()
+
+    sys.exit(main(args.repeat, args.output))
@@ -1,6 +1,11 @@
 import os
+import shutil
 import argparse
 from SnapshotGenerator import SnapshotGenerator
+from IngestionPolicy import DEFAULT_MAX_FILE_BYTES
+from Metrics import METRICS
+from SnapshotSplitter import SnapshotSplitter
+from SnapshotWatcher import SnapshotWatcher
 
 # Common folders to avoid
 COMMON_AVOID_FOLDERS = [
@@ -8,7 +13,39 @@ COMMON_AVOID_FOLDERS = [
     "target", "bin", "build", "obj", "vendor"
 ]
 
-def main(root_dir, additional_avoid_folders, output_file, output_folder, compress, amount_of_chunks, size_of_chunk):
+def replace_directory(source, target):
+    # Swaps a finished parts directory in; the old one is only missing between the two renames
+    if os.path.exists(target):
+        previous = f"{target}.old"
+        shutil.rmtree(previous, ignore_errors=True)
+        os.rename(target, previous)
+        os.rename(source, target)
+        shutil.rmtree(previous, ignore_errors=True)
+    else:
+        os.rename(source, target)
+
+
+def publish_parts(generator, output_folder, amount_of_chunks, size_of_chunk):
+    # Use the specified output folder or default to /brainboost/brainboost_context
+    output_folder = output_folder or '/brainboost/brainboost_context'
+    os.makedirs(output_folder, exist_ok=True)
+    new_parts_dir = os.path.join(output_folder, os.path.basename(SnapshotSplitter(generator.snapshot_file).parts_dir()))
+    # The parts are written next to their final place and swapped in whole, so a
+    # reader never sees a mix of old and new parts
+    staging_dir = f"{new_parts_dir}.tmp"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    if amount_of_chunks:
+        generator.split_file(generator.snapshot_file, num_chunks=amount_of_chunks, output_dir=staging_dir)
+    else:
+        generator.split_file(generator.snapshot_file, chunk_size=size_of_chunk, output_dir=staging_dir)
+    replace_directory(staging_dir, new_parts_dir)
+    print(f"Parts directory moved to: {new_parts_dir}")
+
+
+def main(root_dir, additional_avoid_folders, output_file, output_folder, compress, amount_of_chunks, size_of_chunk, compact=0, workers=1, worker_mode='thread', compression='auto', output_format='json', full_import_scan=0, max_file_bytes=DEFAULT_MAX_FILE_BYTES, max_project_bytes=None, oversize_policy='truncate', blob_store=None, metrics_json=None, metrics_prom=None, ignore_patterns=None, use_gitignore=1, watch=0, debounce=0.5, poll_interval=1.0, watch_backend='auto', git_ref=None):
+    if metrics_json or metrics_prom:
+        METRICS.enable()
+
     # Combine common avoid folders with additional avoid folders
     avoid_folders = COMMON_AVOID_FOLDERS + additional_avoid_folders
 
@@ -37,23 +74,35 @@ def main(root_dir, additional_avoid_folders, output_file, output_folder, compres
         "compress": compress,
         "amount_of_chunks": amount_of_chunks,
         "size_of_chunk": size_of_chunk,
+        "compact": compact,
+        "workers": workers,
+        "worker_mode": worker_mode,
+        "compression": compression,
+        "output_format": output_format,
+        "full_import_scan": full_import_scan,
+        "max_file_bytes": max_file_bytes,
+        "max_project_bytes": max_project_bytes,
+        "oversize_policy": oversize_policy,
+        "blob_store": blob_store,
+        "ignore_patterns": ignore_patterns,
+        "use_gitignore": use_gitignore,
+        "git_ref": git_ref,
     }
 
     generator = SnapshotGenerator(config)
-    generator.generate_context_file()
 
-    if compress:
-        if amount_of_chunks:
-            parts_dir = generator.split_file(output_file, num_chunks=amount_of_chunks)
-        elif size_of_chunk:
-            parts_dir = generator.split_file(output_file, chunk_size=size_of_chunk)
+    def publish(generator):
+        # Splitting does not need --compress: plain snapshots are cut between records
+        if amount_of_chunks or size_of_chunk:
+            publish_parts(generator, output_folder, amount_of_chunks, size_of_chunk)
+        METRICS.export(metrics_json, metrics_prom)
 
-        # Use the specified output folder or default to /brainboost/brainboost_context
-        output_folder = output_folder or '/brainboost/brainboost_context'
-        os.makedirs(output_folder, exist_ok=True)
-        new_parts_dir = os.path.join(output_folder, os.path.basename(parts_dir))
-        os.rename(parts_dir, new_parts_dir)
-        print(f"Parts directory moved to: {new_parts_dir}")
+    if watch:
+        SnapshotWatcher(generator, debounce=debounce, poll_interval=poll_interval, backend=watch_backend, on_update=publish).run()
+        return
+
+    generator.generate_context_file()
+    publish(generator)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generate a single context for a project.")
@@ -62,10 +111,33 @@ if __name__ == "__main__":
     parser.add_argument("--output_folder", required=False, default="", help="Output folder for the parts directory")
     parser.add_argument("--additional-avoid-folders", required=False, default="", help="Comma separated list of additional folders to avoid")
     parser.add_argument("--compress", type=int, choices=[0, 1], default=0, help="Whether to compress the output (0 or 1)")
+    parser.add_argument("--compression", choices=["auto", "gzip", "zstd"], default="auto", help="Compression format used with --compress 1 (auto picks zstd when installed, gzip otherwise)")
+    parser.add_argument("--format", choices=["json", "packed"], default="json", help="Snapshot format: JSON, or a packed binary file with a random-access index")
+    parser.add_argument("--full-import-scan", type=int, choices=[0, 1], default=0, help="Scan whole files for imports instead of stopping after the import header (0 or 1)")
+    parser.add_argument("--max-file-bytes", type=int, default=DEFAULT_MAX_FILE_BYTES, help="Files larger than this get a truncated or hashed placeholder (0 for no limit)")
+    parser.add_argument("--max-project-bytes", type=int, help="Byte budget for a project's sources; files past it are recorded without their source")
+    parser.add_argument("--oversize-policy", choices=["truncate", "hash"], default="truncate", help="Placeholder for files over --max-file-bytes: keep the first bytes, or only a SHA-1")
+    parser.add_argument("--blob-store", help="Store sources in this shared, content-addressed blob store and reference them from the snapshot")
+    parser.add_argument("--ignore-patterns", default="", help="Comma separated .gitignore-style patterns of files and folders to leave out of the snapshot")
+    parser.add_argument("--use-gitignore", type=int, choices=[0, 1], default=1, help="Skip what the project's .gitignore files and .git/info/exclude ignore, and .git itself (0 or 1)")
+    parser.add_argument("--metrics-json", help="Write per-phase timings, counters and bytes to this JSON file")
+    parser.add_argument("--metrics-prom", help="Write the same metrics as a Prometheus textfile (e.g. for the node exporter's textfile collector)")
+    parser.add_argument("--watch", type=int, choices=[0, 1], default=0, help="Keep running and rewrite the snapshot whenever the project changes (0 or 1)")
+    parser.add_argument("--debounce", type=float, default=0.5, help="With --watch, seconds without changes before the snapshot is rewritten")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="With --watch, seconds between checks when polling")
+    parser.add_argument("--watch-backend", choices=["auto", "inotify", "poll"], default="auto", help="With --watch, use inotify (needs inotify_simple) or poll the file system; auto falls back to polling")
+    parser.add_argument("--git-ref", help="Snapshot this ref (branch, tag or commit) from the git objects of --root_dir, which may be a bare or --no-checkout clone, instead of the files on disk")
     parser.add_argument("--amount-of-chunks", type=int, help="Number of chunks to split the file into")
     parser.add_argument("--size-of-chunk", type=int, help="Size of each chunk in bytes")
+    parser.add_argument("--compact", type=int, choices=[0, 1], default=0, help="Write the snapshot as compact (non-indented) JSON (0 or 1)")
+    parser.add_argument("--workers", type=int, default=1, help="Number of workers used to ingest files concurrently")
+    parser.add_argument("--worker-mode", choices=["thread", "process"], default="thread", help="Use threads (I/O bound) or processes (regex heavy) for ingestion workers")
 
     args = parser.parse_args()
+    if args.watch and args.git_ref:
+        parser.error("--watch follows the files on disk and cannot be combined with --git-ref")
+    if args.format == 'packed' and (args.compress or args.amount_of_chunks or args.size_of_chunk):
+        parser.error("--format packed is neither compressed nor split; drop --compress, --amount-of-chunks and --size-of-chunk")
 
     main(
         args.root_dir,
@@ -74,5 +146,24 @@ if __name__ == "__main__":
         args.output_folder,
         args.compress,
         args.amount_of_chunks,
-        args.size_of_chunk
+        args.size_of_chunk,
+        args.compact,
+        args.workers,
+        args.worker_mode,
+        args.compression,
+        args.format,
+        args.full_import_scan,
+        args.max_file_bytes,
+        args.max_project_bytes,
+        args.oversize_policy,
+        args.blob_store,
+        args.metrics_json,
+        args.metrics_prom,
+        args.ignore_patterns.split(',') if args.ignore_patterns else [],
+        args.use_gitignore,
+        args.watch,
+        args.debounce,
+        args.poll_interval,
+        args.watch_backend,
+        args.git_ref
     )
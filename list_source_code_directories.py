@@ -1,6 +1,12 @@
 import os
+import json
+import time
 import argparse
-from alive_progress import alive_bar
+import threading
+from collections import deque
+from datetime import datetime
+from Metrics import METRICS
+from IgnoreMatcher import IgnoreMatcher, GITIGNORE_FILE, relative_child
 
 INCLUDE_EXTENSIONS = [
     ".js", ".mjs", ".jsx", ".ts", ".tsx", ".py", ".java", ".cs", ".csproj",
@@ -15,24 +21,383 @@ INCLUDE_EXTENSIONS = [
     ".pas", ".dpr", ".dfm", ".ml", ".mli", ".vue", ".ipynb", ".json"
 ]
 
-def find_source_code_directories(start_path, output_path):
-    with open(output_path, 'a') as output_file:
-        with alive_bar(title="Scanning directories") as bar:
-            for dirpath, _, filenames in os.walk(start_path):
-                for file in filenames:
-                    if any(file.endswith(ext) for ext in INCLUDE_EXTENSIONS):
-                        print(f"Source code directory found: {dirpath}")
-                        output_file.write(f"{dirpath}\n")
-                        break  # Found a source code file, move to next directory
-                bar()
+# One set lookup per file name instead of an endswith() loop over every extension
+SOURCE_SUFFIXES = frozenset(INCLUDE_EXTENSIONS)
 
-def main(start_path, output_path):
-    find_source_code_directories(start_path, output_path)
+
+def has_source_suffix(name):
+    dot = name.rfind('.')
+    return dot >= 0 and name[dot:] in SOURCE_SUFFIXES
+
+
+class ScanJournal:
+    # Append-only JSON lines checkpoint of a scan. A run starts with a header,
+    # then records every directory it visited (mtime, whether it holds source
+    # code, its subdirectory names) and marks each subtree once all of it has
+    # been recorded; a "finished" line closes the run.
+    #
+    # After a crash the next run resumes: completed subtrees are taken from the
+    # journal as they are. After a finished run the next one is incremental: a
+    # directory whose mtime did not change reuses its recorded listing instead
+    # of being listed again (its subdirectories are still stat()ed, since a
+    # change deeper down does not touch the parent's mtime). A journal written
+    # with other ignore patterns is not reused.
+
+    def __init__(self, journal_path, start_path, flush_every=1000, ignore_key=None):
+        self.journal_path = journal_path
+        self.start_path = os.path.abspath(start_path)
+        self.ignore_key = ignore_key
+        self.flush_every = flush_every
+        self.entries = {}
+        self.completed = set()
+        self.resuming = False
+        self.buffer = []
+        self.lock = threading.Lock()
+        self.file = None
+
+    def load(self):
+        if not os.path.exists(self.journal_path):
+            return
+        entries = {}
+        completed = set()
+        finished = False
+        start_path = None
+        ignore_key = None
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn last line of an interrupted run
+                if 'run' in record:
+                    start_path = record.get('start_path')
+                    ignore_key = record.get('ignore')
+                    completed = set()
+                    finished = False
+                elif 'dir' in record:
+                    entries[record['dir']] = record
+                elif 'complete' in record:
+                    completed.add(record['complete'])
+                elif record.get('finished'):
+                    finished = True
+        if start_path != self.start_path:
+            print(f"Ignoring journal {self.journal_path}: it was written for {start_path}")
+            return
+        if ignore_key != self.ignore_key:
+            print(f"Ignoring journal {self.journal_path}: it was written with other ignore patterns")
+            return
+        self.entries = entries
+        if not finished:
+            self.completed = completed
+            self.resuming = True
+
+    def header(self):
+        return {'run': datetime.now().isoformat(timespec='seconds'), 'start_path': self.start_path, 'ignore': self.ignore_key}
+
+    def open(self):
+        self.file = open(self.journal_path, 'a', encoding='utf-8')
+        self.append(self.header())
+        self.flush()
+
+    def append(self, record):
+        with self.lock:
+            self.buffer.append(json.dumps(record, separators=(',', ':')))
+            if len(self.buffer) >= self.flush_every:
+                self.flush_locked()
+
+    def flush(self):
+        with self.lock:
+            self.flush_locked()
+
+    def flush_locked(self):
+        if self.buffer:
+            self.file.write(''.join(f"{line}\n" for line in self.buffer))
+            self.file.flush()
+            self.buffer.clear()
+
+    def close(self):
+        # Leaves the journal in place, so the next run resumes from it
+        if self.file is not None:
+            try:
+                self.flush()
+            finally:
+                self.file.close()
+                self.file = None
+
+    def finish(self, entries):
+        # Rewrite the journal with just this run, so it does not grow with every rescan
+        self.flush()
+        self.file.close()
+        self.file = None
+        tmp_path = f"{self.journal_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(self.header()) + "\n")
+            for path in sorted(entries):
+                f.write(json.dumps(entries[path], separators=(',', ':')) + "\n")
+            f.write(json.dumps({'finished': True}) + "\n")
+        os.replace(tmp_path, self.journal_path)
+
+
+class ParallelDirectoryScanner:
+    # Work-stealing directory walk over os.scandir. Every worker thread keeps
+    # its own deque of directories: it pops the newest entry (depth first, warm
+    # dentry cache) and, when empty, steals the oldest entry of another worker,
+    # which tends to be the root of a large untouched subtree. scandir releases
+    # the GIL while it waits on the filesystem, so threads overlap the I/O.
+    # Work items carry the ignore rules of the parent directory, so ignored
+    # subtrees are dropped before they are queued.
+
+    def __init__(self, workers=8, progress_interval=1.0, verbose=False, journal=None, ignore=None):
+        self.workers = max(workers, 1)
+        self.ignore = ignore or IgnoreMatcher(use_gitignore=False)
+        self.progress_interval = progress_interval
+        self.verbose = verbose
+        self.journal = journal
+        self.previous = journal.entries if journal is not None else {}
+        self.completed = journal.completed if journal is not None else set()
+        self.lock = threading.Lock()
+        self.deques = [deque() for _ in range(self.workers)]
+        self.pending = 0
+        self.parent_of = {}
+        self.remaining = {}
+        self.entries = {}
+        self.source_directories = set()
+        self.directories_scanned = 0
+        self.directories_reused = 0
+        # First exception raised by a worker; the other workers stop when it is set
+        self.error = None
+
+    def scan_directory(self, path, relative_path, rules):
+        # Returns the names of the subdirectories to visit, whether `path` holds
+        # source code, whether it has a .gitignore and the rules in force in it
+        subdirs = []
+        files = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.name)
+                        else:
+                            files.append(entry.name)
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        has_gitignore = GITIGNORE_FILE in files
+        rules = self.ignore.child_rules(rules, path, relative_path, has_gitignore)
+        subdirs = [name for name in subdirs if not rules.ignored(relative_child(relative_path, name), True)]
+        if rules.ignores_files:
+            has_source = any(has_source_suffix(name) and not rules.ignored(relative_child(relative_path, name), False) for name in files)
+        else:
+            has_source = any(has_source_suffix(name) for name in files)
+        return subdirs, has_source, has_gitignore, rules
+
+    def record(self, entry, reused):
+        path = entry['dir']
+        self.entries[path] = entry
+        if entry['source']:
+            self.source_directories.add(path)
+            if self.verbose and not reused:
+                print(f"Source code directory found: {path}")
+        if self.journal is not None and not reused:
+            self.journal.append(entry)
+
+    def reuse_subtree(self, path):
+        # A subtree the interrupted run completed: its directories come straight from the journal
+        stack = [path]
+        reused = 0
+        while stack:
+            entry = self.previous.get(stack.pop())
+            if entry is None:
+                continue
+            self.record(entry, reused=True)
+            reused += 1
+            stack.extend(os.path.join(entry['dir'], name) for name in entry['subdirs'])
+        with self.lock:
+            self.directories_reused += reused
+
+    def visit(self, path, relative_path, rules):
+        # Returns the work items of the subdirectories to visit next
+        if path in self.completed:
+            self.reuse_subtree(path)
+            return []
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return []
+        entry = self.previous.get(path)
+        reusable = entry is not None and entry['mtime_ns'] == mtime_ns
+        if reusable:
+            # The listing is only reused if the same ignore rules applied to it;
+            # an edited .gitignore does not always change the directory's mtime
+            own_rules = self.ignore.child_rules(rules, path, relative_path, entry.get('gitignore', False))
+            reusable = entry.get('rules') == own_rules.key
+        if reusable:
+            rules = own_rules
+            self.record(entry, reused=True)
+            with self.lock:
+                self.directories_reused += 1
+        else:
+            subdirs, has_source, has_gitignore, rules = self.scan_directory(path, relative_path, rules)
+            entry = {'dir': path, 'mtime_ns': mtime_ns, 'source': has_source, 'subdirs': subdirs, 'rules': rules.key}
+            if has_gitignore:
+                entry['gitignore'] = True
+            self.record(entry, reused=False)
+        return [(os.path.join(path, name), relative_child(relative_path, name), rules) for name in entry['subdirs']]
+
+    def complete(self, path):
+        # Called with self.lock held once `path` and everything below it has been recorded
+        while True:
+            if self.journal is not None:
+                self.journal.append({'complete': path})
+            self.remaining.pop(path, None)
+            parent = self.parent_of.pop(path, None)
+            if parent is None:
+                return
+            self.remaining[parent] -= 1
+            if self.remaining[parent]:
+                return
+            path = parent
+
+    def steal(self, worker_id):
+        for offset in range(1, self.workers):
+            victim = self.deques[(worker_id + offset) % self.workers]
+            try:
+                return victim.popleft()
+            except IndexError:
+                continue
+        return None
+
+    def worker(self, worker_id):
+        own = self.deques[worker_id]
+        idle = 0.0001
+        while self.error is None:
+            try:
+                item = own.pop()
+            except IndexError:
+                item = self.steal(worker_id)
+            if item is None:
+                if self.pending == 0:
+                    break
+                time.sleep(idle)
+                idle = min(idle * 2, 0.01)
+                continue
+            idle = 0.0001
+
+            path = item[0]
+            try:
+                subdirs = self.visit(*item)
+                # Children are counted before they are published, so pending only
+                # reaches zero once every directory has been visited
+                with self.lock:
+                    self.pending += len(subdirs)
+                    for subdir in subdirs:
+                        self.parent_of[subdir[0]] = path
+                    if subdirs:
+                        self.remaining[path] = len(subdirs)
+                    else:
+                        self.complete(path)
+                own.extend(subdirs)
+            except BaseException as e:
+                with self.lock:
+                    if self.error is None:
+                        self.error = e
+            finally:
+                # Always counted down, so the other workers never wait on a dead one
+                with self.lock:
+                    self.pending -= 1
+                    self.directories_scanned += 1
+
+    def report_progress(self, done, bar):
+        reported = 0
+        while not done.wait(self.progress_interval):
+            scanned = self.directories_scanned
+            bar(scanned - reported)
+            reported = scanned
+        bar(self.directories_scanned - reported)
+
+    def scan(self, start_path, bar):
+        self.pending = 1
+        self.deques[0].append((start_path, '', self.ignore.base_rules(start_path)))
+        done = threading.Event()
+        progress = threading.Thread(target=self.report_progress, args=(done, bar), daemon=True)
+        progress.start()
+        threads = [threading.Thread(target=self.worker, args=(i,)) for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        done.set()
+        progress.join()
+
+
+def write_directory_list(output_path, directories):
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, 'w') as output_file:
+        output_file.write(''.join(f"{path}\n" for path in sorted(directories)))
+    os.replace(tmp_path, output_path)
+
+
+def find_source_code_directories(start_path, output_path, workers=8, verbose=False, journal_path=None, incremental=True, ignore_patterns=None, use_gitignore=True):
+    # Imported here so --help and imports of this module do not pay for it
+    from alive_progress import alive_bar
+
+    ignore = IgnoreMatcher(ignore_patterns or [], use_gitignore)
+    journal = ScanJournal(journal_path or f"{output_path}.journal", start_path, ignore_key=ignore.base_rules(start_path).key)
+    if incremental:
+        journal.load()
+        if journal.resuming:
+            print(f"Resuming the interrupted scan recorded in {journal.journal_path}")
+    elif os.path.exists(journal.journal_path):
+        os.remove(journal.journal_path)
+    journal.open()
+
+    scanner = ParallelDirectoryScanner(workers=workers, verbose=verbose, journal=journal, ignore=ignore)
+    started = time.perf_counter()
+    with alive_bar(title="Scanning directories") as bar:
+        scanner.scan(start_path, bar)
+    if scanner.error is not None:
+        try:
+            journal.close()
+        except OSError:
+            # The journal may be what failed; the scan's own error is the one to report
+            pass
+        raise scanner.error
+    elapsed = time.perf_counter() - started
+    METRICS.add_time('scan', elapsed)
+    METRICS.count('scan', 'directories', scanner.directories_scanned)
+    METRICS.count('scan', 'reused', scanner.directories_reused)
+    METRICS.count('scan', 'source_directories', len(scanner.source_directories))
+
+    # The list is rewritten as a whole, so reruns replace it instead of appending duplicates
+    write_directory_list(output_path, scanner.source_directories)
+    journal.finish(scanner.entries)
+
+    rate = scanner.directories_scanned / elapsed if elapsed else 0.0
+    print(f"Scanned {scanner.directories_scanned} directories in {elapsed:.1f}s ({rate:,.0f} directories/sec, "
+          f"{scanner.directories_reused} unchanged since the last run), {len(scanner.source_directories)} contain source code")
+    return scanner
+
+def main(start_path, output_path, workers=8, verbose=0, journal_path=None, incremental=1, metrics_json=None, metrics_prom=None, ignore_patterns=None, use_gitignore=1):
+    if metrics_json or metrics_prom:
+        METRICS.enable()
+    find_source_code_directories(start_path, output_path, workers, verbose, journal_path, incremental, ignore_patterns, use_gitignore)
+    METRICS.export(metrics_json, metrics_prom)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='List directories containing source code files.')
     parser.add_argument('--start-path', type=str, required=True, help='Path to start scanning')
     parser.add_argument('--output-path', type=str, required=True, help='Path to save the output file')
+    parser.add_argument('--workers', type=int, default=8, help='Number of threads scanning directories')
+    parser.add_argument('--verbose', type=int, choices=[0, 1], default=0, help='Print every directory found (0 or 1)')
+    parser.add_argument('--journal-path', type=str, help='Checkpoint journal (default: <output-path>.journal)')
+    parser.add_argument('--incremental', type=int, choices=[0, 1], default=1, help='Resume or incrementally update from the journal (0 or 1)')
+    parser.add_argument('--ignore-patterns', type=str, default='', help='Comma separated .gitignore-style patterns of directories and files to skip')
+    parser.add_argument('--use-gitignore', type=int, choices=[0, 1], default=1, help='Skip what .gitignore files and .git/info/exclude ignore, and .git itself (0 or 1)')
+    parser.add_argument('--metrics-json', type=str, help='Write scan timings and counters to this JSON file')
+    parser.add_argument('--metrics-prom', type=str, help='Write the same metrics as a Prometheus textfile')
     args = parser.parse_args()
     
-    main(args.start_path, args.output_path)
+    main(args.start_path, args.output_path, args.workers, args.verbose, args.journal_path, args.incremental, args.metrics_json, args.metrics_prom,
+         args.ignore_patterns.split(',') if args.ignore_patterns else [], args.use_gitignore)
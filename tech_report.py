@@ -2,13 +2,24 @@ import os
 import argparse
 from datetime import datetime
 import json
-import matplotlib.pyplot as plt
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
 from SnapshotGenerator import SnapshotGenerator
+from IngestionPolicy import DEFAULT_MAX_FILE_BYTES
+from SnapshotCatalog import SnapshotCatalog, CATALOG_FILENAME
+from ChartRenderer import ChartRenderer, draw_chart_on_canvas, DEFAULT_TOP_N
 from GitHubBatchCloner import GitHubBatchCloner
-from collections import defaultdict
+from GitHubListingClient import GitHubListingClient, DEFAULT_BASE_URL
+from Metrics import METRICS
+from ReportPipeline import ImportAggregator, ReportPipeline
+from BatchReport import BatchReport, key_directory
+
+# Shared blob store of deduplicated snapshots (kept outside snapshots/, which only holds project directories)
+BLOB_STORE_DIR = 'snapshot_blobs'
+# Per-user summaries and reports of batch runs go to reports/<user>/
+BATCH_REPORTS_DIR = 'reports'
+# Repo and user x library matrices and job spec rankings (see LibraryMatrix.py)
+REPO_MATRIX_FILE = 'repo_library_matrix.npz'
+USER_MATRIX_FILE = 'user_library_matrix.npz'
+JOB_MATCHES_FILE = 'job_matches.json'
 
 # List of file extensions to include
 INCLUDE_EXTENSIONS = [
@@ -87,7 +98,7 @@ KEY_FILES = [
 # Common folders to avoid
 COMMON_AVOID_FOLDERS = [
     "node_modules",
-    "venv", "env", "__pycache__", "site-packages", "myenv,"
+    "venv", "env", "__pycache__", "site-packages", "myenv",
     "target", "bin", "build",
     "obj",
     "vendor",
@@ -110,59 +121,44 @@ def is_external_library(lib_name):
             return False
     return True
 
-def aggregate_imports(snapshots_dir):
-    imports_agg = defaultdict(lambda: defaultdict(int))
-    file_counts = defaultdict(int)
-
-    for root, dirs, files in os.walk(snapshots_dir):
-        for file in files:
-            if file.endswith(".json"):
-                file_path = os.path.join(root, file)
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    programming_language = data.get('programming_language', '').lower()
-                    if programming_language:  # Only process if programming_language is not empty
-                        file_counts[programming_language] += 1
-                        for lib in data.get('external_libraries', []):
-                            if isinstance(lib, dict) and 'import_name' in lib and 'count' in lib and is_external_library(lib['import_name']):
-                                imports_agg[programming_language][lib['import_name']] += lib['count']
-                            else:
-                                print(f"Skipping malformed or non-external library entry in {file_path}: {lib}")
-
-    overall_data = []
-    for lang, libs in imports_agg.items():
-        libs_list = [{'library_name': lib, 'times_imported': count} for lib, count in sorted(libs.items(), key=lambda item: item[1], reverse=True)]
-        overall_data.append({'programming_language': lang, 'libraries_used': libs_list, 'file_count': file_counts[lang]})
-
-    overall_data.sort(key=lambda x: x['file_count'], reverse=True)
-    return overall_data
-
-def draw_pie_chart(data, title, file_path):
-    labels = [item['library_name'] for item in data]
-    sizes = [item['times_imported'] for item in data]
-    
-    plt.figure(figsize=(10, 6))
-    plt.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=140)
-    plt.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
-    plt.title(title)
-    plt.savefig(file_path)
-    plt.close()
-
-def draw_bar_chart(data, title, file_path):
-    labels = [item['library_name'] for item in data]
-    sizes = [item['times_imported'] for item in data]
-    
-    plt.figure(figsize=(12, 8))
-    plt.bar(labels, sizes, color='skyblue')
-    plt.xlabel('Libraries')
-    plt.ylabel('Number of Imports')
-    plt.title(title)
-    plt.xticks(rotation=90)
-    plt.tight_layout()
-    plt.savefig(file_path)
-    plt.close()
-
-def generate_pdf_report(json_data, pdf_output_path):
+def aggregate_imports(snapshots_dir, top_n=None):
+    # Latest snapshot per project, read from the catalog; snapshots it has not seen yet are added first
+    with SnapshotCatalog(os.path.join(snapshots_dir, CATALOG_FILENAME)) as catalog:
+        catalog.sync(snapshots_dir)
+        return catalog.aggregate_imports(EXCLUDE_SUBSTRINGS, top_n)
+
+def write_library_matrices(aggregators, output_dir='', job_specs_file=None, top_matches=10):
+    # Saves the repo x library and user x library matrices of {username: ImportAggregator}
+    # and, with a job specs file, ranks users and repositories against every spec at once.
+    # numpy and scipy are only loaded here. Single-user and batch runs share one
+    # vocabulary, so all their matrices have the same columns.
+    from LibraryMatrix import LibraryMatrix, LibraryVocabulary, load_job_specs, DEFAULT_VOCABULARY_FILE
+    vocabulary = LibraryVocabulary(DEFAULT_VOCABULARY_FILE)
+    user_repos = {username: aggregator.import_counts() for username, aggregator in aggregators.items()}
+    repos = {}
+    for counts in user_repos.values():
+        repos.update(counts)
+    repo_matrix = LibraryMatrix.from_counts(repos.items(), vocabulary, EXCLUDE_SUBSTRINGS)
+    user_matrix = repo_matrix.group({username: list(counts) for username, counts in user_repos.items()})
+    repo_matrix.save(os.path.join(output_dir, REPO_MATRIX_FILE))
+    user_matrix.save(os.path.join(output_dir, USER_MATRIX_FILE))
+
+    if job_specs_file:
+        specs = load_job_specs(job_specs_file)
+        matches = {
+            'users': user_matrix.rank(specs, top_matches),
+            'repositories': repo_matrix.rank(specs, top_matches),
+        }
+        matches_file = os.path.join(output_dir, JOB_MATCHES_FILE)
+        with open(matches_file, 'w', encoding='utf-8') as f:
+            json.dump(matches, f, indent=4)
+        print(f"Job spec matches for {len(specs)} specs saved in {matches_file}")
+
+def generate_pdf_report(json_data, pdf_output_path, chart_format='png', top_n=DEFAULT_TOP_N, chart_workers=None, chart_dir='./tmp'):
+    # reportlab is only loaded when a report is actually written
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
     pdf = canvas.Canvas(pdf_output_path, pagesize=letter)
     width, height = letter
 
@@ -171,6 +167,13 @@ def generate_pdf_report(json_data, pdf_output_path):
 
     current_y = height - 60
 
+    # All charts are rendered (or reused from chart_dir) up front, in parallel
+    renderer = ChartRenderer(chart_dir, chart_format=chart_format, top_n=top_n, workers=chart_workers)
+    charts = renderer.render([
+        (lang_data['programming_language'].capitalize(), lang_data['libraries_used'])
+        for lang_data in json_data['programming_languages'] if lang_data['libraries_used']
+    ])
+
     for lang_data in json_data['programming_languages']:
         programming_language = lang_data['programming_language'].capitalize()
         file_count = lang_data['file_count']
@@ -181,14 +184,10 @@ def generate_pdf_report(json_data, pdf_output_path):
         current_y -= 20
 
         if libraries_used:
-            pie_chart_path = f"./tmp/pie_chart_{programming_language}.png"
-            bar_chart_path = f"./tmp/bar_chart_{programming_language}.png"
-
-            draw_pie_chart(libraries_used, f"Library Usage for {programming_language}", pie_chart_path)
-            draw_bar_chart(libraries_used, f"Library Usage for {programming_language}", bar_chart_path)
+            pie_chart_path, bar_chart_path = charts[programming_language]
 
-            pdf.drawImage(pie_chart_path, 30, current_y - 200, width=200, height=200)
-            pdf.drawImage(bar_chart_path, 250, current_y - 200, width=300, height=200)
+            draw_chart_on_canvas(pdf, pie_chart_path, 30, current_y - 200, 200, 200)
+            draw_chart_on_canvas(pdf, bar_chart_path, 250, current_y - 200, 300, 200)
 
             current_y -= 220
 
@@ -205,90 +204,282 @@ def generate_pdf_report(json_data, pdf_output_path):
 
     pdf.save()
 
-def main(github_username, additional_avoid_folders, compress, amount_of_chunks, size_of_chunk):
-    # Step 1: Clone or update repositories
-    github_clone_client = GitHubBatchCloner()
+def snapshot_project(project_path, settings, incremental=1, project_name=None):
+    # Snapshots one checkout into snapshots/<project>/<timestamp> and returns
+    # (programming_language, {import_name: count}) for the aggregator.
+    # Batch runs name projects "owner/name", stored as snapshots/owner__name
+    project = project_name or os.path.basename(project_path)
+    snapshot_dir = os.path.join('snapshots', key_directory(project))
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    timestamp = datetime.now().strftime("%Y%m%d%H%M")
+    snapshot_output_dir = os.path.join(snapshot_dir, timestamp)
+    output_file_path = os.path.join(snapshot_output_dir, "snapshot.pack" if settings['output_format'] == 'packed' else "snapshot.json")
+
+    config = dict(settings)
+    config.update({
+        "root_dir": project_path,
+        "output_file": output_file_path,
+        "cache_file": os.path.join(snapshot_dir, ".snapshot_cache") if incremental else None,
+        "project_name": project,
+    })
+
+    generator = SnapshotGenerator(config)
+    if generator.is_up_to_date():
+        # The imports of an unchanged project come from its latest cataloged snapshot
+        with SnapshotCatalog(settings['catalog_file']) as catalog:
+            latest = catalog.latest_imports(generator.project_name)
+        if latest is not None:
+            print(f"Project {project} has not changed since its last snapshot, skipping")
+            METRICS.count('snapshot', 'up_to_date', project=project)
+            return latest
+
+    os.makedirs(snapshot_output_dir, exist_ok=True)
+    generator.generate_context_file()
+
+    amount_of_chunks = settings['amount_of_chunks']
+    size_of_chunk = settings['size_of_chunk']
+    if amount_of_chunks or size_of_chunk:
+        if amount_of_chunks:
+            parts_dir = generator.split_file(generator.snapshot_file, num_chunks=amount_of_chunks)
+        elif size_of_chunk:
+            parts_dir = generator.split_file(generator.snapshot_file, chunk_size=size_of_chunk)
+
+        new_parts_dir = os.path.join(snapshot_output_dir, os.path.basename(parts_dir))
+        os.rename(parts_dir, new_parts_dir)
+        print(f"Parts directory moved to: {new_parts_dir}")
+
+    print(f"Snapshot for project {project} saved in {snapshot_output_dir}")
+    return generator.detected_language or 'unknown', dict(generator.imports)
+
+def write_user_report(github_username, overall_data, output_dir='', chart_format='png', chart_top_n=DEFAULT_TOP_N, chart_workers=None, chart_dir='./tmp'):
+    # overall_summary.json and github_user_report.pdf for one user
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    overall_summary = {
+        'github_user_name': github_username,
+        'programming_languages': overall_data
+    }
+
+    overall_output_file = os.path.join(output_dir, 'overall_summary.json')
+    with open(overall_output_file, 'w', encoding='utf-8') as f:
+        json.dump(overall_summary, f, indent=4)
+
+    print(f"Overall summary saved in {overall_output_file}")
+
+    pdf_output_file = os.path.join(output_dir, 'github_user_report.pdf')
+    generate_pdf_report(overall_summary, pdf_output_file, chart_format, chart_top_n, chart_workers, chart_dir)
+    print(f"PDF report generated at: {pdf_output_file}")
+    return pdf_output_file
+
+def run_batch(usernames, github_clone_client, source_code_dir, snapshot_settings, incremental, clone_workers, snapshot_workers, pipeline_queue_size, top_libraries, chart_format, chart_top_n, report_workers, library_matrix=0, job_specs=None, top_matches=10):
+    # Repositories are cloned under source_code_for_analysis/<owner>/ and snapshotted
+    # under snapshots/<owner>__<name>/, so users never overwrite each other's repositories
+    batch = BatchReport(
+        github_clone_client,
+        lambda result: snapshot_project(result['path'], snapshot_settings, incremental, project_name=result['repo']),
+        source_code_dir,
+        EXCLUDE_SUBSTRINGS,
+        clone_workers=clone_workers,
+        snapshot_workers=snapshot_workers,
+        queue_size=pipeline_queue_size,
+    )
+    aggregators = batch.run(usernames)
+
+    with METRICS.timer('aggregate'):
+        summaries = {username: aggregators[username].summary(top_libraries) for username in usernames}
+
+    if library_matrix or job_specs:
+        with METRICS.timer('library_matrix'):
+            write_library_matrices(aggregators, BATCH_REPORTS_DIR, job_specs, top_matches)
+
+    # One process per report; each renders its own charts serially, into its own
+    # directory, since a renderer removes the stale charts of the languages it draws
+    from concurrent.futures import ProcessPoolExecutor
+    with METRICS.timer('pdf_report'), ProcessPoolExecutor(max_workers=report_workers) as executor:
+        futures = {
+            username: executor.submit(write_user_report, username, summaries[username], os.path.join(BATCH_REPORTS_DIR, username), chart_format, chart_top_n, 1, os.path.join('./tmp', username))
+            for username in usernames
+        }
+        for username, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Report for {username} failed: {e}")
+
+def main(github_username, additional_avoid_folders, compress, amount_of_chunks, size_of_chunk, compact=0, workers=1, worker_mode='thread', incremental=1, hash_files=0, compression='auto', output_format='json', full_import_scan=0, clone_workers=1, clone_depth=None, partial_clone=0, github_api_url=DEFAULT_BASE_URL, top_libraries=None, chart_format='png', chart_top_n=DEFAULT_TOP_N, chart_workers=None, max_file_bytes=DEFAULT_MAX_FILE_BYTES, max_project_bytes=None, oversize_policy='truncate', dedup=0, metrics_json=None, metrics_prom=None, ignore_patterns=None, use_gitignore=1, snapshot_workers=1, pipeline_queue_size=None, batch_users=None, report_workers=None, no_checkout=0, library_matrix=0, job_specs=None, top_matches=10):
+    if metrics_json or metrics_prom:
+        METRICS.enable()
+
+    github_clone_client = GitHubBatchCloner(
+        max_workers=clone_workers,
+        depth=clone_depth,
+        blob_filter='blob:none' if partial_clone else None,
+        listing_client=GitHubListingClient(base_url=github_api_url, cache_file='.github_listing_cache'),
+        bare=bool(no_checkout),
+    )
+    source_code_dir = 'source_code_for_analysis'
+
+    # Combine common avoid folders with additional avoid folders
+    avoid_folders = COMMON_AVOID_FOLDERS + additional_avoid_folders
+
+    # Everything but the project-specific paths, which snapshot_project fills in
+    snapshot_settings = {
+        "avoid_folders": avoid_folders,
+        "include_extensions": INCLUDE_EXTENSIONS,
+        "key_files": KEY_FILES,
+        "compress": compress,
+        "amount_of_chunks": amount_of_chunks,
+        "size_of_chunk": size_of_chunk,
+        "compact": compact,
+        "workers": workers,
+        "worker_mode": worker_mode,
+        "hash_files": hash_files,
+        "compression": compression,
+        "output_format": output_format,
+        "full_import_scan": full_import_scan,
+        "catalog_file": os.path.join('snapshots', CATALOG_FILENAME),
+        "max_file_bytes": max_file_bytes,
+        "max_project_bytes": max_project_bytes,
+        "oversize_policy": oversize_policy,
+        "blob_store": BLOB_STORE_DIR if dedup else None,
+        "ignore_patterns": ignore_patterns,
+        "use_gitignore": use_gitignore,
+        # Bare clones are snapshotted from HEAD's tree and blobs
+        "git_ref": 'HEAD' if no_checkout else None,
+    }
+
+    if batch_users:
+        usernames = list(dict.fromkeys(([github_username] if github_username else []) + list(batch_users)))
+        run_batch(usernames, github_clone_client, source_code_dir, snapshot_settings, incremental, clone_workers,
+                  snapshot_workers, pipeline_queue_size, top_libraries, chart_format, chart_top_n, report_workers,
+                  library_matrix, job_specs, top_matches)
+        METRICS.export(metrics_json, metrics_prom)
+        return
+
+    # Step 1: List the user's repositories
     usernames = [github_username]
     repo_count, clone_urls = github_clone_client.get_github_repos(usernames)
 
     if repo_count > 0:
-        source_code_dir = 'source_code_for_analysis'
-        github_clone_client.clone_repos(clone_urls, source_code_dir)
-
-        # Combine common avoid folders with additional avoid folders
-        avoid_folders = COMMON_AVOID_FOLDERS + additional_avoid_folders
-
-        # Step 2: Generate snapshots
-        projects = [d for d in os.listdir(source_code_dir) if os.path.isdir(os.path.join(source_code_dir, d))]
-        for project in projects:
-            project_path = os.path.join(source_code_dir, project)
-            snapshot_dir = os.path.join('snapshots', project)
-            os.makedirs(snapshot_dir, exist_ok=True)
-
-            timestamp = datetime.now().strftime("%Y%m%d%H%M")
-            snapshot_output_dir = os.path.join(snapshot_dir, timestamp)
-            os.makedirs(snapshot_output_dir, exist_ok=True)
-
-            output_file_path = os.path.join(snapshot_output_dir, "snapshot.json")
-
-            config = {
-                "root_dir": project_path,
-                "avoid_folders": avoid_folders,
-                "include_extensions": INCLUDE_EXTENSIONS,
-                "key_files": KEY_FILES,
-                "output_file": output_file_path,
-                "compress": compress,
-                "amount_of_chunks": amount_of_chunks,
-                "size_of_chunk": size_of_chunk,
-            }
-
-            generator = SnapshotGenerator(config)
-            generator.generate_context_file()
-
-            if compress:
-                if amount_of_chunks:
-                    parts_dir = generator.split_file(output_file_path, num_chunks=amount_of_chunks)
-                elif size_of_chunk:
-                    parts_dir = generator.split_file(output_file_path, chunk_size=size_of_chunk)
-                
-                new_parts_dir = os.path.join(snapshot_output_dir, os.path.basename(parts_dir))
-                os.rename(parts_dir, new_parts_dir)
-                print(f"Parts directory moved to: {new_parts_dir}")
-
-            print(f"Snapshot for project {project} saved in {snapshot_output_dir}")
-
-        # Step 3: Generate overall JSON file
-        overall_data = aggregate_imports('snapshots')
-        overall_summary = {
-            'github_user_name': github_username,
-            'programming_languages': overall_data
-        }
+        os.makedirs(source_code_dir, exist_ok=True)
 
-        overall_output_file = 'overall_summary.json'
-        with open(overall_output_file, 'w', encoding='utf-8') as f:
-            json.dump(overall_summary, f, indent=4)
+        # Step 2: Clone, snapshot and aggregate as a pipeline: each repo is snapshotted as soon
+        # as its clone or update finishes, and its imports are aggregated in memory right away
+        aggregator = ImportAggregator(EXCLUDE_SUBSTRINGS)
+        pipeline = ReportPipeline(
+            lambda url: github_clone_client.clone_or_update_repo(url, source_code_dir),
+            lambda result: snapshot_project(result['path'], snapshot_settings, incremental, project_name=result['repo']),
+            aggregator,
+            clone_workers=clone_workers,
+            snapshot_workers=snapshot_workers,
+            queue_size=pipeline_queue_size,
+        )
+        pipeline.run(clone_urls)
 
-        print(f"Overall summary saved in {overall_output_file}")
+        with METRICS.timer('aggregate'):
+            overall_data = aggregator.summary(top_libraries)
 
-        # Step 4: Generate PDF report
-        generate_pdf_report(overall_summary, 'github_user_report.pdf')
-        print(f"PDF report generated at: github_user_report.pdf")
+        if library_matrix or job_specs:
+            with METRICS.timer('library_matrix'):
+                write_library_matrices({github_username: aggregator}, '', job_specs, top_matches)
+
+        # Steps 3 and 4: Generate overall JSON file and PDF report
+        with METRICS.timer('pdf_report'):
+            pdf_output_file = write_user_report(github_username, overall_data, '', chart_format, chart_top_n, chart_workers)
+        METRICS.add_bytes('pdf_report', written=os.path.getsize(pdf_output_file))
+
+    METRICS.export(metrics_json, metrics_prom)
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generate a tech report for a GitHub user's repositories.")
-    parser.add_argument("github_username", help="GitHub username to fetch repositories for")
+    parser.add_argument("github_username", nargs="?", help="GitHub username to fetch repositories for")
+    parser.add_argument("--batch-users", default="", help=f"Comma separated GitHub usernames to report on in one run, sharing clones and snapshots (reports go to {BATCH_REPORTS_DIR}/<user>/)")
+    parser.add_argument("--batch-users-file", help="File with one GitHub username per line, added to --batch-users")
+    parser.add_argument("--report-workers", type=int, help="Processes writing batch reports in parallel (default: one per CPU)")
     parser.add_argument("--additional-avoid-folders", required=False, default="", help="Comma separated list of additional folders to avoid")
     parser.add_argument("--compress", type=int, choices=[0, 1], default=0, help="Whether to compress the output (0 or 1)")
+    parser.add_argument("--compression", choices=["auto", "gzip", "zstd"], default="auto", help="Compression format used with --compress 1 (auto picks zstd when installed, gzip otherwise)")
+    parser.add_argument("--format", choices=["json", "packed"], default="json", help="Snapshot format: JSON, or a packed binary file with a random-access index")
+    parser.add_argument("--full-import-scan", type=int, choices=[0, 1], default=0, help="Scan whole files for imports instead of stopping after the import header (0 or 1)")
+    parser.add_argument("--clone-workers", type=int, default=1, help="Number of repositories cloned or updated concurrently")
+    parser.add_argument("--clone-depth", type=int, help="Create shallow clones with this history depth (e.g. 1)")
+    parser.add_argument("--partial-clone", type=int, choices=[0, 1], default=0, help="Clone with --filter=blob:none so blobs are only fetched for checkout (0 or 1)")
+    parser.add_argument("--no-checkout", type=int, choices=[0, 1], default=0, help="Keep bare clones and snapshot HEAD straight from git objects instead of a checked-out working tree (0 or 1)")
+    parser.add_argument("--github-api-url", default=DEFAULT_BASE_URL, help="GitHub API base URL used to list repositories")
+    parser.add_argument("--top-libraries", type=int, help="Only report the N most imported libraries per language")
+    parser.add_argument("--chart-format", choices=["png", "svg", "pdf"], default="png", help="Chart format embedded in the PDF report; svg needs svglib and pdf needs pdfrw")
+    parser.add_argument("--chart-top-n", type=int, default=DEFAULT_TOP_N, help="Libraries drawn per chart; the rest are grouped as 'other' (0 draws all)")
+    parser.add_argument("--chart-workers", type=int, help="Processes used to render charts (default: one per CPU)")
+    parser.add_argument("--max-file-bytes", type=int, default=DEFAULT_MAX_FILE_BYTES, help="Files larger than this get a truncated or hashed placeholder (0 for no limit)")
+    parser.add_argument("--max-project-bytes", type=int, help="Byte budget for a project's sources; files past it are recorded without their source")
+    parser.add_argument("--oversize-policy", choices=["truncate", "hash"], default="truncate", help="Placeholder for files over --max-file-bytes: keep the first bytes, or only a SHA-1")
+    parser.add_argument("--dedup", type=int, choices=[0, 1], default=0, help=f"Reference sources by content hash in the shared {BLOB_STORE_DIR} blob store instead of copying them into every snapshot (0 or 1)")
+    parser.add_argument("--snapshot-workers", type=int, default=1, help="Number of repositories snapshotted concurrently while the others are still cloning")
+    parser.add_argument("--pipeline-queue-size", type=int, help="Cloned repositories allowed to wait for a snapshot worker before cloning pauses (default: twice --snapshot-workers)")
+    parser.add_argument("--ignore-patterns", default="", help="Comma separated .gitignore-style patterns of files and folders to leave out of snapshots")
+    parser.add_argument("--use-gitignore", type=int, choices=[0, 1], default=1, help="Skip what the project's .gitignore files and .git/info/exclude ignore, and .git itself (0 or 1)")
+    parser.add_argument("--library-matrix", type=int, choices=[0, 1], default=0, help=f"Save sparse repo x library and user x library import matrices ({REPO_MATRIX_FILE}, {USER_MATRIX_FILE}); needs numpy and scipy (0 or 1)")
+    parser.add_argument("--job-specs", help=f"JSON file of job specs ({{spec: {{library: weight}}}}) to rank users and repositories against, written to {JOB_MATCHES_FILE}; implies --library-matrix 1")
+    parser.add_argument("--top-matches", type=int, default=10, help="Users and repositories listed per job spec")
+    parser.add_argument("--metrics-json", help="Write per-phase timings, counters and bytes to this JSON file")
+    parser.add_argument("--metrics-prom", help="Write the same metrics as a Prometheus textfile (e.g. for the node exporter's textfile collector)")
     parser.add_argument("--amount-of-chunks", type=int, help="Number of chunks to split the file into")
     parser.add_argument("--size-of-chunk", type=int, help="Size of each chunk in bytes")
+    parser.add_argument("--compact", type=int, choices=[0, 1], default=0, help="Write snapshots as compact (non-indented) JSON (0 or 1)")
+    parser.add_argument("--workers", type=int, default=1, help="Number of workers used to ingest files concurrently")
+    parser.add_argument("--worker-mode", choices=["thread", "process"], default="thread", help="Use threads (I/O bound) or processes (regex heavy) for ingestion workers")
+    parser.add_argument("--incremental", type=int, choices=[0, 1], default=1, help="Reuse the per-file snapshot cache and skip unchanged projects (0 or 1)")
+    parser.add_argument("--hash-files", type=int, choices=[0, 1], default=0, help="Also compare content hashes when a file's size or mtime changed (0 or 1)")
 
     args = parser.parse_args()
 
+    batch_users = args.batch_users.split(',') if args.batch_users else []
+    if args.batch_users_file:
+        with open(args.batch_users_file, 'r', encoding='utf-8') as f:
+            batch_users.extend(line.strip() for line in f if line.strip() and not line.startswith('#'))
+    if not args.github_username and not batch_users:
+        parser.error("a GitHub username or --batch-users/--batch-users-file is required")
+    if args.format == 'packed' and (args.compress or args.amount_of_chunks or args.size_of_chunk):
+        parser.error("--format packed is neither compressed nor split; drop --compress, --amount-of-chunks and --size-of-chunk")
+
     main(
         args.github_username,
         args.additional_avoid_folders.split(',') if args.additional_avoid_folders else [],
         args.compress,
         args.amount_of_chunks,
-        args.size_of_chunk
+        args.size_of_chunk,
+        args.compact,
+        args.workers,
+        args.worker_mode,
+        args.incremental,
+        args.hash_files,
+        args.compression,
+        args.format,
+        args.full_import_scan,
+        args.clone_workers,
+        args.clone_depth,
+        args.partial_clone,
+        args.github_api_url,
+        args.top_libraries,
+        args.chart_format,
+        args.chart_top_n,
+        args.chart_workers,
+        args.max_file_bytes,
+        args.max_project_bytes,
+        args.oversize_policy,
+        args.dedup,
+        args.metrics_json,
+        args.metrics_prom,
+        args.ignore_patterns.split(',') if args.ignore_patterns else [],
+        args.use_gitignore,
+        args.snapshot_workers,
+        args.pipeline_queue_size,
+        batch_users,
+        args.report_workers,
+        args.no_checkout,
+        args.library_matrix,
+        args.job_specs,
+        args.top_matches
     )
@@ -0,0 +1,64 @@
+import json
+import pytest
+from BlobStore import BlobStore
+from SnapshotWriter import SnapshotWriter, zstandard
+
+COMPRESSIONS = [None, 'gzip'] + (['zstd'] if zstandard is not None else [])
+
+
+def write_snapshot(output_file, digests, compression=None):
+    with SnapshotWriter(str(output_file), compression=compression) as writer:
+        writer.begin('project')
+        for i, digest in enumerate(digests):
+            writer.write_source({'file': {'File': f'f{i}.py', 'Relative Path': f'f{i}.py', 'Source_Blob': digest}})
+        writer.finish('python', {'name': 'project', 'children': []}, [], [])
+    return writer.path
+
+
+@pytest.mark.parametrize('compression', COMPRESSIONS)
+def test_gc_removes_only_unreferenced_blobs(tmp_path, compression):
+    # References are read from plain and compressed snapshots alike
+    store = BlobStore(str(tmp_path / 'blobs'))
+    kept = [store.put('import os\n'), store.put('import json\n')]
+    dropped = store.put('import sys\n')
+    snapshots = tmp_path / 'snapshots' / 'project' / '202601011200'
+    snapshots.mkdir(parents=True)
+    write_snapshot(snapshots / 'snapshot.json', kept[:1], compression)
+    write_snapshot(snapshots / 'other.json', kept[1:], compression)
+
+    assert store.gc([str(tmp_path / 'snapshots')], min_age=0, dry_run=True)[0] == 1
+    assert store.has(dropped)
+
+    removed, freed = store.gc([str(tmp_path / 'snapshots')], min_age=0)
+    assert removed == 1 and freed > 0
+    assert not store.has(dropped)
+    assert [store.get(digest) for digest in kept] == ['import os\n', 'import json\n']
+
+
+def test_gc_keeps_recent_blobs(tmp_path):
+    store = BlobStore(str(tmp_path / 'blobs'))
+    digest = store.put('import os\n')
+    (tmp_path / 'snapshots').mkdir()
+    assert store.gc([str(tmp_path / 'snapshots')]) == (0, 0)
+    assert store.has(digest)
+
+
+def test_gc_refuses_to_run_with_an_unreadable_snapshot(tmp_path):
+    store = BlobStore(str(tmp_path / 'blobs'))
+    digest = store.put('import os\n')
+    (tmp_path / 'snapshots').mkdir()
+    (tmp_path / 'snapshots' / 'snapshot.json').write_text('{"project_sources": [', encoding='utf-8')
+    with pytest.raises(ValueError):
+        store.gc([str(tmp_path / 'snapshots')], min_age=0)
+    assert store.has(digest)
+
+
+def test_materialize_inlines_every_source(tmp_path):
+    store = BlobStore(str(tmp_path / 'blobs'))
+    digests = [store.put('import os\n'), store.put('import json\n')]
+    snapshot = write_snapshot(tmp_path / 'snapshot.json', digests)
+    output = store.materialize(snapshot, str(tmp_path / 'full.json'))
+    with open(output, 'r', encoding='utf-8') as f:
+        sources = [source['file'] for source in json.load(f)['project_sources']]
+    assert [source['Source_Code'] for source in sources] == ['import os\n', 'import json\n']
+    assert not any('Source_Blob' in source for source in sources)
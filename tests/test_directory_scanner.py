@@ -0,0 +1,54 @@
+import os
+import threading
+import pytest
+from list_source_code_directories import ParallelDirectoryScanner, find_source_code_directories
+
+
+def make_tree(root):
+    for path in ['a/b/c', 'a/d', 'e/f', 'g']:
+        os.makedirs(os.path.join(root, path), exist_ok=True)
+    for path in ['a/b/c/main.py', 'e/app.js', 'g/notes.txt']:
+        with open(os.path.join(root, path), 'w', encoding='utf-8') as f:
+            f.write('x\n')
+
+
+def run_with_timeout(target, timeout=10):
+    # Runs target() in a thread; returns (finished, exception raised)
+    outcome = {}
+
+    def run():
+        try:
+            target()
+        except BaseException as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return not thread.is_alive(), outcome.get('error')
+
+
+def test_lists_source_directories_sorted(tmp_path):
+    make_tree(tmp_path / 'tree')
+    output = tmp_path / 'dirs.txt'
+    find_source_code_directories(str(tmp_path / 'tree'), str(output), workers=4, use_gitignore=False)
+    assert output.read_text().splitlines() == [str(tmp_path / 'tree' / 'a' / 'b' / 'c'), str(tmp_path / 'tree' / 'e')]
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_failing_visit_stops_the_scan(tmp_path, monkeypatch, workers):
+    make_tree(tmp_path / 'tree')
+    visit = ParallelDirectoryScanner.visit
+
+    def failing_visit(self, path, relative_path, rules):
+        if path.endswith('d'):
+            raise RuntimeError('disk gone')
+        return visit(self, path, relative_path, rules)
+
+    monkeypatch.setattr(ParallelDirectoryScanner, 'visit', failing_visit)
+    output = tmp_path / 'dirs.txt'
+    finished, error = run_with_timeout(
+        lambda: find_source_code_directories(str(tmp_path / 'tree'), str(output), workers=workers, use_gitignore=False))
+    assert finished
+    assert isinstance(error, RuntimeError) and str(error) == 'disk gone'
+    assert not output.exists()
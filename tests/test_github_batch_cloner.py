@@ -0,0 +1,104 @@
+import os
+import subprocess
+import pytest
+from GitHubBatchCloner import GitHubBatchCloner
+from GitHubListingClient import GitHubListingClient
+
+GIT_ENV = dict(os.environ, GIT_AUTHOR_NAME='test', GIT_AUTHOR_EMAIL='test@example.com',
+               GIT_COMMITTER_NAME='test', GIT_COMMITTER_EMAIL='test@example.com')
+
+
+def git(*args, cwd=None):
+    return subprocess.run(['git'] + list(args), cwd=cwd, env=GIT_ENV, check=True, capture_output=True, text=True).stdout.strip()
+
+
+def commit(work_dir, name, content):
+    with open(os.path.join(work_dir, name), 'w', encoding='utf-8') as f:
+        f.write(content)
+    git('add', '-A', cwd=work_dir)
+    git('commit', '-q', '-m', f'Update {name}', cwd=work_dir)
+    git('push', '-q', 'origin', 'HEAD', cwd=work_dir)
+    return git('rev-parse', 'HEAD', cwd=work_dir)
+
+
+@pytest.fixture
+def remote(tmp_path):
+    # A bare "remote" served over file://, plus a working copy that pushes to it
+    bare = tmp_path / 'remotes' / 'project.git'
+    git('init', '-q', '--bare', '-b', 'main', str(bare))
+    work_dir = str(tmp_path / 'work')
+    git('clone', '-q', str(bare), work_dir)
+    git('checkout', '-q', '-b', 'main', cwd=work_dir)
+    commit(work_dir, 'app.py', 'import os\n')
+    return f'file://{bare}', work_dir
+
+
+def cloner(**kwargs):
+    # The listing client is never asked for anything; it only has to exist
+    return GitHubBatchCloner(listing_client=GitHubListingClient(base_url='http://127.0.0.1:9'), **kwargs)
+
+
+def test_clone_then_up_to_date_then_updated(remote, tmp_path):
+    url, work_dir = remote
+    dest = str(tmp_path / 'clones')
+    client = cloner()
+
+    result = client.clone_or_update_repo(url, dest)
+    assert result['status'] == 'cloned'
+    assert result['repo'] == 'project'
+    assert os.path.isfile(os.path.join(dest, 'project', 'app.py'))
+    assert result['bytes'] > 0
+
+    assert client.clone_or_update_repo(url, dest)['status'] == 'up_to_date'
+
+    head = commit(work_dir, 'lib.py', 'import json\n')
+    result = client.clone_or_update_repo(url, dest)
+    assert result['status'] == 'updated'
+    assert client.head_revision(result['path']) == head
+    assert os.path.isfile(os.path.join(dest, 'project', 'lib.py'))
+
+
+def test_bare_clone_and_fetch(remote, tmp_path):
+    url, work_dir = remote
+    dest = str(tmp_path / 'clones')
+    client = cloner(bare=True)
+
+    result = client.clone_or_update_repo(url, dest)
+    assert result['status'] == 'cloned'
+    assert result['path'] == os.path.join(dest, 'project.git')
+    assert not os.path.exists(os.path.join(result['path'], 'app.py'))
+
+    assert client.clone_or_update_repo(url, dest)['status'] == 'up_to_date'
+    head = commit(work_dir, 'lib.py', 'import json\n')
+    result = client.clone_or_update_repo(url, dest)
+    assert result['status'] == 'updated'
+    assert client.head_revision(result['path']) == head
+
+
+def test_shallow_clone(remote, tmp_path):
+    url, work_dir = remote
+    commit(work_dir, 'lib.py', 'import json\n')
+    result = cloner(depth=1).clone_or_update_repo(url, str(tmp_path / 'clones'))
+    assert result['status'] == 'cloned'
+    assert git('rev-list', '--count', 'HEAD', cwd=result['path']) == '1'
+
+
+def test_identical_trees_share_a_tree_id(remote, tmp_path):
+    url, work_dir = remote
+    client = cloner()
+    first = client.clone_or_update_repo(url, str(tmp_path / 'a'))
+    second = client.clone_or_update_repo(url, str(tmp_path / 'b'), reference=first['path'])
+    assert second['status'] == 'cloned'
+    assert client.tree_id(first['path']) == client.tree_id(second['path']) is not None
+
+
+def test_failed_clone_is_reported(tmp_path):
+    result = cloner().clone_or_update_repo(f'file://{tmp_path}/missing.git', str(tmp_path / 'clones'))
+    assert result['status'] == 'failed'
+    assert result['error']
+
+
+def test_clone_repos_runs_concurrently_and_summarizes(remote, tmp_path):
+    url, work_dir = remote
+    results = cloner(max_workers=2).clone_repos([url, f'file://{tmp_path}/missing.git'], str(tmp_path / 'clones'))
+    assert sorted(result['status'] for result in results) == ['cloned', 'failed']
@@ -0,0 +1,166 @@
+import json
+import time
+import threading
+from email.utils import formatdate
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import pytest
+import GitHubListingClient as listing
+from GitHubListingClient import GitHubListingClient
+
+
+class StubGitHub:
+    # Serves /users/<user>/repos in pages of `per_page` with ETags and Link
+    # headers. `rate_limits` lists the headers of 429 responses sent before
+    # the next successful one.
+
+    def __init__(self, repos, per_page=2):
+        self.repos = repos
+        self.per_page = per_page
+        self.rate_limits = []
+        self.requests = []
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stub.handle(self)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def handle(self, handler):
+        url = urlparse(handler.path)
+        page = int(parse_qs(url.query).get('page', ['1'])[0])
+        with self.lock:
+            self.requests.append((page, handler.headers.get('If-None-Match')))
+            rate_limit = self.rate_limits.pop(0) if self.rate_limits else None
+        if rate_limit is not None:
+            self.send(handler, 429, b'', rate_limit)
+            return
+
+        user = url.path.split('/')[2]
+        repos = self.repos.get(user, [])
+        last_page = max((len(repos) + self.per_page - 1) // self.per_page, 1)
+        body = json.dumps(repos[(page - 1) * self.per_page:page * self.per_page]).encode()
+        etag = f'"{user}-{page}-{len(repos)}"'
+        if handler.headers.get('If-None-Match') == etag:
+            self.send(handler, 304, b'', {'ETag': etag})
+            return
+        headers = {'ETag': etag, 'Content-Type': 'application/json'}
+        if last_page > 1:
+            headers['Link'] = f'<{self.url}{url.path}?page={last_page}&per_page=100>; rel="last"'
+        self.send(handler, 200, body, headers)
+
+    def send(self, handler, status, body, headers):
+        handler.send_response(status)
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def make_repos(owner, count):
+    return [{'full_name': f'{owner}/repo{i}', 'clone_url': f'https://example.com/{owner}/repo{i}.git'} for i in range(count)]
+
+
+@pytest.fixture
+def stub():
+    server = StubGitHub({'alice': make_repos('alice', 5), 'bob': make_repos('bob', 1)})
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    waits = []
+    monkeypatch.setattr(listing.time, 'sleep', waits.append)
+    return waits
+
+
+def test_lists_every_page(stub):
+    client = GitHubListingClient(base_url=stub.url)
+    repos = client.list_repositories('alice')
+    assert [repo['full_name'] for repo in repos] == [f'alice/repo{i}' for i in range(5)]
+    assert sorted(page for page, etag in stub.requests) == [1, 2, 3]
+    assert client.requests_made == 3
+
+
+def test_single_page_without_link_header(stub):
+    client = GitHubListingClient(base_url=stub.url)
+    assert [repo['full_name'] for repo in client.list_repositories('bob')] == ['bob/repo0']
+    assert client.requests_made == 1
+
+
+def test_unchanged_listing_is_answered_from_the_etag_cache(stub, tmp_path):
+    cache_file = str(tmp_path / 'listing_cache')
+    first = GitHubListingClient(base_url=stub.url, cache_file=cache_file).list_repositories_for_usernames(['alice'])
+
+    stub.requests.clear()
+    client = GitHubListingClient(base_url=stub.url, cache_file=cache_file)
+    assert client.list_repositories_for_usernames(['alice']) == first
+    assert client.not_modified == 3
+    assert all(etag is not None for page, etag in stub.requests)
+
+
+def test_changed_listing_is_fetched_again(stub, tmp_path):
+    cache_file = str(tmp_path / 'listing_cache')
+    GitHubListingClient(base_url=stub.url, cache_file=cache_file).list_repositories_for_usernames(['alice'])
+
+    stub.repos['alice'] = make_repos('alice', 6)
+    client = GitHubListingClient(base_url=stub.url, cache_file=cache_file)
+    assert len(client.list_repositories('alice')) == 6
+    assert client.not_modified == 0
+
+
+def test_retry_after_seconds(stub, sleeps):
+    stub.rate_limits = [{'Retry-After': '7'}]
+    client = GitHubListingClient(base_url=stub.url)
+    assert len(client.list_repositories('bob')) == 1
+    assert sleeps == [7.0]
+    assert client.requests_made == 2
+
+
+def test_retry_after_http_date(stub, sleeps):
+    stub.rate_limits = [{'Retry-After': formatdate(time.time() + 30, usegmt=True)}]
+    client = GitHubListingClient(base_url=stub.url)
+    assert len(client.list_repositories('bob')) == 1
+    assert len(sleeps) == 1 and 25 <= sleeps[0] <= 30
+
+
+def test_rate_limit_reset(stub, sleeps):
+    stub.rate_limits = [{'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(int(time.time()) + 20)}]
+    client = GitHubListingClient(base_url=stub.url)
+    assert len(client.list_repositories('bob')) == 1
+    assert len(sleeps) == 1 and 15 <= sleeps[0] <= 20
+
+
+def test_unparseable_rate_limit_reset_falls_back(stub, sleeps):
+    stub.rate_limits = [{'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': 'soon'}]
+    client = GitHubListingClient(base_url=stub.url, max_wait=10)
+    assert len(client.list_repositories('bob')) == 1
+    assert sleeps == [10]
+
+
+def test_unparseable_retry_after_falls_back(stub, sleeps):
+    stub.rate_limits = [{'Retry-After': 'later'}]
+    client = GitHubListingClient(base_url=stub.url, max_wait=10)
+    assert len(client.list_repositories('bob')) == 1
+    assert sleeps == [10]
+
+
+def test_gives_up_after_max_retries(stub, sleeps):
+    stub.rate_limits = [{'Retry-After': '1'}] * 3
+    client = GitHubListingClient(base_url=stub.url, max_retries=2)
+    assert client.list_repositories('bob') == []
+    assert sleeps == [1.0, 1.0]
+    assert client.requests_made == 3
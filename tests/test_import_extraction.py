@@ -0,0 +1,88 @@
+import os
+from collections import Counter
+from ImportExtractor import find_imports
+from SnapshotGenerator import SnapshotGenerator
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FUNCTION_LOCAL_IMPORTS = '''import os
+from collections import defaultdict
+
+
+@decorator
+def render(path):
+    import matplotlib.pyplot as plt
+    from reportlab.pdfgen import canvas
+    return plt, canvas
+
+
+class Client:
+    def get(self):
+        import requests
+        return requests
+
+
+import json
+
+if __name__ == "__main__":
+    from concurrent.futures import ThreadPoolExecutor
+'''
+
+
+def generator_imports(tmp_path, full_import_scan):
+    generator = SnapshotGenerator({
+        "root_dir": str(tmp_path / "project"),
+        "output_file": str(tmp_path / f"snapshot_{full_import_scan}.json"),
+        "avoid_folders": [],
+        "include_extensions": [".py"],
+        "key_files": [],
+        "compress": 0,
+        "amount_of_chunks": None,
+        "size_of_chunk": None,
+        "full_import_scan": full_import_scan,
+    })
+    generator.generate_context_file()
+    assert generator.imports["requests"] == 1
+    return dict(generator.imports)
+
+
+def test_function_local_python_imports_are_found():
+    assert find_imports(FUNCTION_LOCAL_IMPORTS, ".py") == [
+        "os", "collections", "matplotlib.pyplot", "reportlab.pdfgen", "requests", "json", "concurrent.futures",
+    ]
+
+
+def test_default_scan_matches_full_scan(tmp_path):
+    (tmp_path / "project").mkdir()
+    (tmp_path / "project" / "app.py").write_text(FUNCTION_LOCAL_IMPORTS)
+    assert generator_imports(tmp_path, 0) == generator_imports(tmp_path, 1)
+
+
+def test_default_scan_matches_full_scan_on_repository_sources():
+    default = Counter()
+    full = Counter()
+    for name in sorted(os.listdir(REPO_DIR)):
+        if name.endswith(".py"):
+            with open(os.path.join(REPO_DIR, name), "r", encoding="utf-8") as f:
+                content = f.read()
+            default.update(find_imports(content, ".py"))
+            full.update(find_imports(content, ".py", full_scan=True))
+    assert default == full
+    assert default["requests"] > 0
+
+
+ANNOTATED_HEADERS = {
+    ".kt": ('@file:JvmName("Utils")\n\npackage com.example\n\nimport kotlinx.coroutines.launch\n'
+            'import org.slf4j.Logger\n\nfun main() {}\n',
+            ["kotlinx.coroutines.launch", "org.slf4j.Logger"]),
+    ".java": ('@ParametersAreNonnullByDefault\npackage com.example;\n\nimport com.google.Foo;\n',
+              ["com.google.Foo"]),
+    ".swift": ('import XCTest\n@testable import MyApp\nimport Foundation\n\nfinal class AppTests: XCTestCase {}\n',
+               ["XCTest", "MyApp", "Foundation"]),
+}
+
+
+def test_annotations_do_not_end_the_header():
+    for extension, (content, imports) in ANNOTATED_HEADERS.items():
+        assert find_imports(content, extension, full_scan=True) == imports
+        assert find_imports(content, extension) == imports
@@ -0,0 +1,29 @@
+import sys
+import json
+import subprocess
+import pytest
+from check_import_time import IMPORT_BUDGETS_MS, LAZY_MODULES, REPO_DIR, check_import
+
+# Must never be loaded just by importing an entry point
+HEAVY_MODULES = ['matplotlib', 'reportlab', 'requests']
+
+
+def modules_after_import(module):
+    # sys.modules of a fresh interpreter right after `import module`
+    code = f"import sys, json, {module}; print(json.dumps(sorted(sys.modules)))"
+    result = subprocess.run([sys.executable, '-c', code], cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    return {name.split('.')[0] for name in json.loads(result.stdout)}
+
+
+@pytest.mark.parametrize('module', sorted(IMPORT_BUDGETS_MS))
+def test_entry_point_does_not_load_heavy_modules(module):
+    loaded = modules_after_import(module)
+    assert not loaded & set(HEAVY_MODULES)
+    assert not loaded & set(LAZY_MODULES)
+
+
+@pytest.mark.parametrize('module', sorted(IMPORT_BUDGETS_MS))
+def test_entry_point_import_time_is_within_budget(module):
+    elapsed_ms, heavy = check_import(module, repeat=3)
+    assert heavy == []
+    assert elapsed_ms <= IMPORT_BUDGETS_MS[module], f"{module} imports in {elapsed_ms:.1f} ms"
@@ -0,0 +1,69 @@
+import json
+import hashlib
+import pytest
+from IngestionPolicy import BinaryContentError, IngestionPolicy
+from SnapshotGenerator import SnapshotGenerator
+
+LARGE_SOURCE = 'import os\n' + 'x = 1\n' * 100
+
+
+def snapshot_sources(tmp_path, **config):
+    project = tmp_path / 'project'
+    project.mkdir()
+    (project / 'large.py').write_text(LARGE_SOURCE, encoding='utf-8')
+    (project / 'small.py').write_text('import json\n', encoding='utf-8')
+    generator = SnapshotGenerator(dict({
+        'root_dir': str(project),
+        'output_file': str(tmp_path / 'snapshot.json'),
+        'avoid_folders': [],
+        'include_extensions': ['.py'],
+        'key_files': [],
+        'compress': 0,
+        'amount_of_chunks': None,
+        'size_of_chunk': None,
+        'max_file_bytes': 200,
+    }, **config))
+    generator.generate_context_file()
+    with open(generator.snapshot_file, 'r', encoding='utf-8') as f:
+        document = json.load(f)
+    return {source['file']['Relative Path']: source['file'] for source in document['project_sources']}, dict(generator.imports)
+
+
+def test_oversized_file_is_truncated_at_a_line_break(tmp_path):
+    sources, imports = snapshot_sources(tmp_path, oversize_policy='truncate')
+    large = sources['large.py']
+    assert large['Ingestion']['status'] == 'truncated'
+    assert large['Ingestion']['rule'] == 'max_file_bytes'
+    assert large['Ingestion']['kept_bytes'] <= 200
+    assert large['Source_Code'] == LARGE_SOURCE[:large['Ingestion']['kept_bytes']]
+    assert large['Source_Code'].endswith('\n')
+    assert 'Ingestion' not in sources['small.py']
+    assert sources['small.py']['Source_Code'] == 'import json\n'
+    assert imports == {'os': 1, 'json': 1}
+
+
+def test_oversized_file_is_replaced_by_its_hash(tmp_path):
+    sources, imports = snapshot_sources(tmp_path, oversize_policy='hash')
+    large = sources['large.py']
+    assert large['Ingestion']['status'] == 'hashed'
+    assert large['Ingestion']['sha1'] == hashlib.sha1(LARGE_SOURCE.encode('utf-8')).hexdigest()
+    assert large['Source_Code'] == ''
+    assert large['Lines'] == 101
+    # The imports at the top of the file are still found
+    assert imports == {'os': 1, 'json': 1}
+
+
+def test_files_past_the_project_budget_are_omitted(tmp_path):
+    # Only one of the two files fits; whichever comes first in traversal order
+    sources, imports = snapshot_sources(tmp_path, max_file_bytes=0, max_project_bytes=len(LARGE_SOURCE))
+    omitted = [source for source in sources.values() if 'Ingestion' in source]
+    assert len(omitted) == 1
+    assert omitted[0]['Ingestion']['status'] == 'omitted'
+    assert omitted[0]['Source_Code'] == ''
+
+
+def test_binary_content_is_refused(tmp_path):
+    path = tmp_path / 'data.py'
+    path.write_bytes(b'import os\n\x00\x01')
+    with pytest.raises(BinaryContentError):
+        IngestionPolicy().read(str(path), path.stat().st_size)
@@ -0,0 +1,79 @@
+import pytest
+
+# Optional dependencies of LibraryMatrix
+np = pytest.importorskip('numpy')
+pytest.importorskip('scipy')
+
+from LibraryMatrix import LibraryMatrix, LibraryVocabulary, normalize_import
+
+
+@pytest.mark.parametrize('name, library', [
+    ('os.path', 'os'),
+    ('org.springframework.boot.SpringApplication', 'org.springframework'),
+    ('com.google', 'com.google'),
+    ('@angular/core/testing', '@angular/core'),
+    ('github.com/user/repo/pkg', 'github.com/user/repo'),
+    ('boost/asio.hpp', 'boost'),
+    ('Symfony\\Component\\Yaml', 'symfony'),
+    ('Data::Dumper', 'data'),
+    ('.relative', None),
+])
+def test_normalize_import(name, library):
+    assert normalize_import(name) == library
+
+
+def make_matrix(vocabulary):
+    return LibraryMatrix.from_counts([
+        ('a/x', {'os': 3, 'os.path': 2, 'numpy': 50}),
+        ('a/y', {'flask': 4, 'private.tool': 9}),
+        ('b/z', {'django': 10, 'numpy.linalg': 1}),
+    ], vocabulary, ['private'])
+
+
+def test_counts_are_summed_per_library_and_grouped_per_user():
+    vocabulary = LibraryVocabulary()
+    matrix = make_matrix(vocabulary)
+    assert vocabulary.libraries == ['os', 'numpy', 'flask', 'django']
+    assert matrix.matrix.toarray().tolist() == [[5, 50, 0, 0], [0, 0, 4, 0], [0, 1, 0, 10]]
+
+    users = matrix.group({'alice': ['a/x', 'a/y'], 'bob': ['b/z'], 'nobody': []})
+    assert users.rows == ['alice', 'bob', 'nobody']
+    assert users.matrix.toarray().tolist() == [[5, 50, 4, 0], [0, 1, 0, 10], [0, 0, 0, 0]]
+
+
+def test_scores_match_the_per_row_formula():
+    matrix = make_matrix(LibraryVocabulary())
+    specs = {'web': {'flask': 2, 'django': 2, 'os': 1, 'missing': 1}, 'data': ['numpy', 'pandas']}
+    names, scores = matrix.score(specs, saturation=20)
+    assert names == ['web', 'data']
+
+    def evidence(count):
+        return min(1.0, np.log1p(count) / np.log1p(20))
+
+    counts = [{'os': 5, 'numpy': 50}, {'flask': 4}, {'numpy': 1, 'django': 10}]
+    for row, row_counts in enumerate(counts):
+        for column, spec in enumerate([specs['web'], dict.fromkeys(specs['data'], 1)]):
+            expected = sum(weight * evidence(row_counts.get(library, 0)) for library, weight in spec.items()) / sum(spec.values())
+            assert scores[row, column] == pytest.approx(expected)
+
+
+def test_rank_orders_rows_and_leaves_out_zero_scores():
+    matrix = make_matrix(LibraryVocabulary())
+    ranking = matrix.rank({'data': ['numpy'], 'none': ['rails']}, top_k=5)
+    assert [match['name'] for match in ranking['data']] == ['a/x', 'b/z']
+    assert ranking['none'] == []
+    with pytest.raises(ValueError):
+        matrix.rank({'bad': {'numpy': 0}})
+
+
+def test_saved_matrix_survives_a_grown_vocabulary(tmp_path):
+    vocabulary = LibraryVocabulary(str(tmp_path / 'vocabulary.json'))
+    matrix = make_matrix(vocabulary)
+    matrix.save(str(tmp_path / 'matrix.npz'))
+
+    grown = LibraryVocabulary(str(tmp_path / 'vocabulary.json'))
+    grown.column('rails')
+    loaded = LibraryMatrix.load(str(tmp_path / 'matrix.npz'), grown)
+    assert loaded.rows == matrix.rows
+    assert loaded.matrix.shape == (3, 5)
+    assert loaded.matrix[:, :4].toarray().tolist() == matrix.matrix.toarray().tolist()
@@ -0,0 +1,46 @@
+import os
+import json
+import subprocess
+import sys
+from check_import_time import REPO_DIR
+from PackedSnapshot import PackedSnapshotReader, PackedSnapshotWriter, json_to_packed
+
+
+def source_record(index):
+    return {'file': {'File': f'f{index}.py', 'Relative Path': f'pkg/f{index}.py', 'Lines': 1,
+                     'Source_Code': f'import os\n# café {index}\n'}}
+
+
+def test_packed_snapshot_gets_the_pack_suffix(tmp_path):
+    records = [source_record(i) for i in range(3)]
+    with PackedSnapshotWriter(str(tmp_path / 'snapshot.json')) as writer:
+        writer.begin('project')
+        for record in records:
+            writer.write_source(record, ['os'])
+        writer.finish('python', {'name': 'project', 'children': []}, ['os'], [])
+
+    assert writer.path == str(tmp_path / 'snapshot.pack')
+    assert os.listdir(tmp_path) == ['snapshot.pack']
+    with PackedSnapshotReader(writer.path) as reader:
+        assert reader.to_dict()['project_sources'] == records
+        assert reader.source('pkg/f1.py') == records[1]['file']['Source_Code']
+
+
+def test_json_to_packed_returns_the_written_file(tmp_path):
+    json_path = tmp_path / 'snapshot.json'
+    json_path.write_text(json.dumps({
+        'project_name': 'project', 'programming_language': 'python',
+        'project_tree_structure': {'name': 'project', 'children': []},
+        'project_sources': [source_record(0)], 'external_libraries': ['os'], 'observations': [],
+    }), encoding='utf-8')
+    assert json_to_packed(str(json_path), str(tmp_path / 'copy')) == str(tmp_path / 'copy.pack')
+
+
+def test_packed_format_cannot_be_compressed_or_split(tmp_path):
+    result = subprocess.run(
+        [sys.executable, os.path.join(REPO_DIR, 'generate_context.py'), '--root_dir', str(tmp_path),
+         '--output_file', str(tmp_path / 'v.json'), '--format', 'packed', '--compress', '1'],
+        capture_output=True, text=True,
+    )
+    assert result.returncode == 2
+    assert '--format packed' in result.stderr
@@ -0,0 +1,23 @@
+import json
+from SnapshotCatalog import SnapshotCatalog
+
+
+def test_sync_catalogs_split_snapshots_by_their_directory(tmp_path, capsys):
+    # Splitting moves snapshot.json into snapshot_parts/ next to its parts
+    parts_dir = tmp_path / 'snapshots' / 'project' / '202601011200' / 'snapshot_parts'
+    parts_dir.mkdir(parents=True)
+    (parts_dir / 'snapshot.json').write_text(json.dumps({
+        'project_name': 'project', 'programming_language': 'Python',
+        'project_sources': [{'file': {'Relative Path': 'app.py', 'Size': 10, 'Lines': 2}}],
+        'external_libraries': [{'import_name': 'os', 'count': 2}, 'requests'],
+    }), encoding='utf-8')
+
+    with SnapshotCatalog(str(tmp_path / 'snapshots' / 'catalog.db')) as catalog:
+        assert catalog.sync(str(tmp_path / 'snapshots')) == 1
+        assert catalog.has_snapshot(str(parts_dir.parent))
+        assert catalog.latest_imports('project') == ('python', {'os': 2})
+        assert catalog.sync(str(tmp_path / 'snapshots')) == 0
+
+    output = capsys.readouterr().out
+    assert f"Skipping malformed library entry in snapshot {parts_dir.parent}: requests" in output
+    assert 'snapshot_parts' not in output
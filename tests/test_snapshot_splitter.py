@@ -0,0 +1,90 @@
+import os
+import json
+import pytest
+from SnapshotSplitter import SnapshotSplitter, read_part_record
+from SnapshotWriter import SnapshotWriter, decompress_frame, zstandard
+
+COMPRESSIONS = [None, 'gzip'] + (['zstd'] if zstandard is not None else [])
+
+
+def source_record(index):
+    return {'file': {'File': f'f{index}.py', 'Relative Path': f'pkg/f{index}.py', 'Lines': 2,
+                     'Source_Code': f'import os\n# café {index}\n' + 'x = 1\n' * (index % 7 * 30)}}
+
+
+def write_snapshot(output_file, records, compression=None):
+    with SnapshotWriter(str(output_file), compression=compression, frame_size=1024) as writer:
+        writer.begin('project')
+        for record in records:
+            writer.write_source(record, ['os'])
+        writer.finish('python', {'name': 'project', 'children': []}, ['os'], [])
+    return writer.path
+
+
+def split(tmp_path, compression, **kwargs):
+    records = [source_record(i) for i in range(60)]
+    path = write_snapshot(tmp_path / 'snapshot.json', records, compression)
+    with open(path, 'rb') as f:
+        original = f.read()
+    parts_dir = SnapshotSplitter(path).split(output_dir=str(tmp_path / 'parts'), **kwargs)
+    with open(os.path.join(parts_dir, f"{os.path.basename(path)}.manifest"), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    return records, original, parts_dir, manifest
+
+
+def read_part(parts_dir, part):
+    with open(os.path.join(parts_dir, part['file']), 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('compression', COMPRESSIONS)
+@pytest.mark.parametrize('limits', [{'chunk_size': 2000}, {'num_chunks': 4}])
+def test_every_record_is_read_from_its_part(tmp_path, compression, limits):
+    records, original, parts_dir, manifest = split(tmp_path, compression, **limits)
+    assert manifest['compression'] == compression
+    assert len(manifest['parts']) > 1
+    if 'num_chunks' in limits:
+        assert len(manifest['parts']) <= limits['num_chunks']
+
+    # The parts are the original file cut into pieces, and the original is kept beside them
+    assert b''.join(read_part(parts_dir, part) for part in manifest['parts']) == original
+    assert os.path.exists(os.path.join(parts_dir, manifest['source']))
+    assert os.path.exists(os.path.join(parts_dir, f"{manifest['source']}.index"))
+
+    assert len(manifest['files']) == len(records)
+    for record in records:
+        assert read_part_record(parts_dir, manifest, record['file']['Relative Path']) == record
+
+
+@pytest.mark.parametrize('compression', COMPRESSIONS[1:])
+def test_every_compressed_part_decompresses_on_its_own(tmp_path, compression):
+    records, original, parts_dir, manifest = split(tmp_path, compression, chunk_size=2000)
+    decoded = b''
+    for part in manifest['parts']:
+        raw = decompress_frame(read_part(parts_dir, part), compression)
+        assert len(raw) == part['raw_length']
+        assert part['raw_offset'] == len(decoded)
+        decoded += raw
+    assert decoded == decompress_frame(original, compression)
+
+
+def test_plain_parts_respect_the_byte_budget(tmp_path):
+    records, original, parts_dir, manifest = split(tmp_path, None, chunk_size=2000)
+    for part in manifest['parts']:
+        data = read_part(parts_dir, part)
+        assert len(data) == part['length']
+        # Only a single record larger than the budget may overflow it
+        assert len(data) <= 2000 or sum(1 for entry in manifest['files'].values() if entry['part'] == part['part']) <= 1
+
+
+def test_file_without_index_is_cut_at_line_breaks(tmp_path):
+    path = tmp_path / 'notes.txt'
+    path.write_text(''.join(f'line {i} café\n' for i in range(12000)), encoding='utf-8')
+    original = path.read_bytes()
+    parts_dir = SnapshotSplitter(str(path)).split(chunk_size=100000, output_dir=str(tmp_path / 'parts'))
+    with open(os.path.join(parts_dir, 'notes.txt.manifest'), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    parts = [read_part(parts_dir, part) for part in manifest['parts']]
+    assert len(parts) > 1
+    assert b''.join(parts) == original
+    assert all(part.endswith(b'\n') for part in parts)
@@ -0,0 +1,77 @@
+import os
+import json
+from SnapshotGenerator import SnapshotGenerator
+from SnapshotWatcher import SnapshotWatcher
+
+
+def make_generator(root_dir, output_file):
+    return SnapshotGenerator({
+        "root_dir": str(root_dir),
+        "output_file": str(output_file),
+        "avoid_folders": [],
+        "include_extensions": [".py"],
+        "key_files": [],
+        "compress": 0,
+        "amount_of_chunks": None,
+        "size_of_chunk": None,
+        "project_name": "project",
+    })
+
+
+def write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+
+def source_paths(snapshot_file):
+    with open(snapshot_file, 'r', encoding='utf-8') as f:
+        snapshot = json.load(f)
+    return [source['file']['Relative Path'] for source in snapshot['project_sources']]
+
+
+def fresh_snapshot(root_dir, tmp_path):
+    generator = make_generator(root_dir, tmp_path / 'fresh.json')
+    generator.generate_context_file()
+    with open(tmp_path / 'fresh.json', 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_added_files_keep_walk_order(tmp_path):
+    root_dir = tmp_path / 'project'
+    for name in ['m.py', 'c.py', 'x.py']:
+        write_file(str(root_dir / 'pkg' / name), f'import {name[0]}lib\n')
+    watched_file = tmp_path / 'watched.json'
+    watcher = SnapshotWatcher(make_generator(root_dir, watched_file))
+    watcher.resync()
+    watcher.write()
+
+    added = [str(root_dir / 'pkg' / name) for name in ['a.py', 'z.py', 'n.py']]
+    for path in added:
+        write_file(path, 'import json\n')
+    assert watcher.apply(set(added))
+    watcher.write()
+
+    fresh = fresh_snapshot(root_dir, tmp_path)
+    assert source_paths(watched_file) == [source['file']['Relative Path'] for source in fresh['project_sources']]
+
+
+def test_edits_and_removals_match_a_fresh_snapshot(tmp_path):
+    root_dir = tmp_path / 'project'
+    write_file(str(root_dir / 'a.py'), 'import os\n')
+    write_file(str(root_dir / 'b.py'), 'import sys\n')
+    watched_file = tmp_path / 'watched.json'
+    generator = make_generator(root_dir, watched_file)
+    watcher = SnapshotWatcher(generator)
+    watcher.resync()
+    watcher.write()
+
+    write_file(str(root_dir / 'a.py'), 'import os\nimport requests\n')
+    os.remove(root_dir / 'b.py')
+    assert watcher.apply({str(root_dir / 'a.py'), str(root_dir / 'b.py')})
+    watcher.write()
+
+    fresh = fresh_snapshot(root_dir, tmp_path)
+    assert source_paths(watched_file) == ['a.py']
+    assert dict(generator.imports) == {'os': 1, 'requests': 1}
+    assert fresh['external_libraries'] == json.load(open(watched_file, encoding='utf-8'))['external_libraries']
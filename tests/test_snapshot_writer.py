@@ -0,0 +1,70 @@
+import os
+import json
+import pytest
+from SnapshotWriter import SnapshotWriter, decompress_frame, load_snapshot_index, open_snapshot, zstandard
+
+COMPRESSIONS = [None, 'gzip'] + (['zstd'] if zstandard is not None else [])
+
+
+def source_record(index):
+    return {'file': {'File': f'f{index}.py', 'Relative Path': f'pkg/f{index}.py', 'Lines': 2,
+                     'Source_Code': f'import os\n# café {index}\n' + 'x = 1\n' * (index * 40)}}
+
+
+def write_snapshot(output_file, records, compact=False, compression=None, frame_size=2048):
+    with SnapshotWriter(str(output_file), compact=compact, compression=compression, frame_size=frame_size) as writer:
+        writer.begin('project')
+        for record in records:
+            writer.write_source(record, ['os'])
+        writer.finish('python', {'name': 'project', 'children': []}, ['os'], [])
+    return writer
+
+
+@pytest.mark.parametrize('compact', [False, True])
+@pytest.mark.parametrize('compression', COMPRESSIONS)
+def test_streamed_document_and_index(tmp_path, compact, compression):
+    records = [source_record(i) for i in range(8)]
+    writer = write_snapshot(tmp_path / 'snapshot.json', records, compact, compression)
+    assert not os.path.exists(f"{writer.path}.tmp")
+
+    with open_snapshot(writer.path) as f:
+        text = f.read()
+    document = json.loads(text)
+    assert document['project_name'] == 'project'
+    assert document['project_sources'] == records
+    assert document['external_libraries'] == ['os']
+
+    # Every record's raw byte range holds exactly that record
+    index = load_snapshot_index(writer.path)
+    assert index['compression'] == compression
+    assert index['raw_bytes'] == len(text.encode('utf-8'))
+    assert [record['path'] for record in index['records']] == [record['file']['Relative Path'] for record in records]
+    raw = text.encode('utf-8')
+    for entry, record in zip(index['records'], records):
+        assert json.loads(raw[entry['raw_offset']:entry['raw_offset'] + entry['raw_length']]) == record
+
+
+@pytest.mark.parametrize('compression', COMPRESSIONS[1:])
+def test_every_frame_decompresses_on_its_own(tmp_path, compression):
+    writer = write_snapshot(tmp_path / 'snapshot.json', [source_record(i) for i in range(8)], compression=compression)
+    index = load_snapshot_index(writer.path)
+    assert len(index['frames']) > 1
+    with open(writer.path, 'rb') as f:
+        data = f.read()
+    decoded = b''
+    for frame in index['frames']:
+        raw = decompress_frame(data[frame['offset']:frame['offset'] + frame['length']], compression)
+        assert len(raw) == frame['raw_length']
+        assert frame['raw_offset'] == len(decoded)
+        decoded += raw
+    assert decoded == decompress_frame(data, compression)
+
+
+def test_failed_write_leaves_no_snapshot(tmp_path):
+    output_file = tmp_path / 'snapshot.json'
+    with pytest.raises(RuntimeError):
+        with SnapshotWriter(str(output_file)) as writer:
+            writer.begin('project')
+            writer.write_source(source_record(0))
+            raise RuntimeError('interrupted')
+    assert os.listdir(tmp_path) == []